@@ -0,0 +1,181 @@
+"""Per-link click time series.
+
+Flushed click batches are written as `$inc` upserts into hourly buckets
+(`link_clicks_hourly`: one document per link per hour), so write volume
+scales with active links per flush rather than with clicks. A periodic
+compaction rolls hourly buckets older than `hourly_retention_days` into
+daily rollups (`link_clicks_daily`: one document per link per day holding
+that day's per-hour counts in `hours`) and deletes them.
+
+Compaction `$set`s the rolled-up values rather than incrementing them, so a
+run interrupted between writing the rollup and deleting the hourly buckets
+is simply repeated. Range queries read only the buckets in range: the daily
+rollups plus any not yet compacted hourly buckets.
+
+Clicks are bucketed by flush time, so a click may land in the following hour
+when it arrives within one flush interval of the boundary.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Tuple
+
+from pymongo import IndexModel, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ("hour", "day")
+BATCH_SIZE = 1000
+
+
+def naive_utc(at: datetime) -> datetime:
+    """Mongo hands back naive UTC datetimes; normalize query bounds to match."""
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    return at
+
+
+def hour_bucket(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(at: datetime) -> datetime:
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class ClickAnalytics:
+    def __init__(self, db: Callable, hourly_retention_days: int = 2, compaction_interval: float = 3600):
+        self._db = db
+        self.hourly_retention_days = hourly_retention_days
+        self.compaction_interval = compaction_interval
+        self._task = None
+        self.compacted_buckets = 0
+
+    @property
+    def hourly(self):
+        return self._db().link_clicks_hourly
+
+    @property
+    def daily(self):
+        return self._db().link_clicks_daily
+
+    async def ensure_indexes(self):
+        await asyncio.gather(
+            self.hourly.create_indexes([
+                IndexModel([("link_id", 1), ("hour", 1)], unique=True),
+                IndexModel([("page_id", 1), ("hour", 1)]),
+                IndexModel([("hour", 1)]),
+            ]),
+            self.daily.create_indexes([
+                IndexModel([("link_id", 1), ("day", 1)], unique=True),
+                IndexModel([("page_id", 1), ("day", 1)]),
+            ]),
+        )
+
+    async def record(self, batch: Dict[Tuple[str, str], int], at: datetime):
+        if not batch:
+            return
+        hour = hour_bucket(at)
+        operations = [
+            UpdateOne(
+                {"link_id": link_id, "hour": hour},
+                {"$inc": {"clicks": clicks}, "$setOnInsert": {"page_id": page_id}},
+                upsert=True,
+            )
+            for (page_id, link_id), clicks in batch.items()
+        ]
+        await self.hourly.bulk_write(operations, ordered=False)
+
+    async def compact(self, now: datetime = None) -> int:
+        """Roll hourly buckets from whole days older than the retention into daily rollups."""
+        now = now or datetime.utcnow()
+        cutoff = day_bucket(now - timedelta(days=self.hourly_retention_days))
+
+        rollups: Dict[Tuple[str, str, datetime], Dict[str, int]] = defaultdict(dict)
+        compacted = 0
+        async for bucket in self.hourly.find({"hour": {"$lt": cutoff}}, {"_id": 0}):
+            day = day_bucket(bucket["hour"])
+            rollups[(bucket["page_id"], bucket["link_id"], day)][f"{bucket['hour'].hour:02d}"] = bucket["clicks"]
+            compacted += 1
+        if not rollups:
+            return 0
+
+        operations = []
+        for (page_id, link_id, day), hours in rollups.items():
+            update = {f"hours.{hour}": clicks for hour, clicks in hours.items()}
+            operations.append(UpdateOne(
+                {"link_id": link_id, "day": day},
+                {"$set": update, "$setOnInsert": {"page_id": page_id}},
+                upsert=True,
+            ))
+        for start in range(0, len(operations), BATCH_SIZE):
+            await self.daily.bulk_write(operations[start:start + BATCH_SIZE], ordered=False)
+
+        await self.hourly.delete_many({"hour": {"$lt": cutoff}})
+        self.compacted_buckets += compacted
+        return compacted
+
+    async def top_pages(self, since: datetime, limit: int) -> List[str]:
+        """Ids of the pages with the most clicks since `since`, from the (`hour`-indexed) hourly buckets."""
+        pipeline = [
+            {"$match": {"hour": {"$gte": hour_bucket(since)}}},
+            {"$group": {"_id": "$page_id", "clicks": {"$sum": "$clicks"}}},
+            {"$sort": {"clicks": -1}},
+            {"$limit": limit},
+        ]
+        return [row["_id"] async for row in self.hourly.aggregate(pipeline)]
+
+    async def query(self, page_id: str, start: datetime, end: datetime, granularity: str = "day") -> List[dict]:
+        """Clicks per link in [start, end), bucketed by hour or day."""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {GRANULARITIES}")
+        bucket_of = hour_bucket if granularity == "hour" else day_bucket
+        start = hour_bucket(start)
+
+        counts: Dict[Tuple[str, datetime], int] = {}  # (link id, hour) -> clicks
+        async for rollup in self.daily.find(
+            {"page_id": page_id, "day": {"$gte": day_bucket(start), "$lt": end}}, {"_id": 0},
+        ):
+            for hour, clicks in rollup.get("hours", {}).items():
+                at = rollup["day"].replace(hour=int(hour))
+                if start <= at < end:
+                    counts[(rollup["link_id"], at)] = clicks
+        # Hourly buckets win over a rollup of the same hour (an interrupted compaction).
+        async for bucket in self.hourly.find(
+            {"page_id": page_id, "hour": {"$gte": start, "$lt": end}}, {"_id": 0},
+        ):
+            counts[(bucket["link_id"], bucket["hour"])] = bucket["clicks"]
+
+        series: Dict[str, Dict[datetime, int]] = defaultdict(lambda: defaultdict(int))
+        for (link_id, at), clicks in counts.items():
+            series[link_id][bucket_of(at)] += clicks
+        return [
+            {
+                "link_id": link_id,
+                "total": sum(buckets.values()),
+                "series": [{"bucket": at, "clicks": buckets[at]} for at in sorted(buckets)],
+            }
+            for link_id, buckets in sorted(series.items())
+        ]
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.compaction_interval)
+            try:
+                await self.compact()
+            except Exception:
+                logger.exception("Click analytics compaction failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
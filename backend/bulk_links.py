@@ -0,0 +1,63 @@
+"""Update pipeline applying a batch of link operations to a page in one write.
+
+The pipeline (MongoDB 4.2+) runs server-side against the current `links`
+array, so creates, updates, deletes and reorders land atomically in a single
+`find_one_and_update` with no pre-read. Afterwards every link's `order` is
+renumbered to its position, which is how new links get their `order` without
+the server having to know how many links the page already had.
+
+Ordering: ids listed in `order` come first, in that order; the remaining
+existing links keep their relative order; created links are appended last.
+Ids that don't exist on the page are ignored.
+
+Every client-supplied value (ids, fields, new links) enters the pipeline as
+`{"$literal": ...}`; a bare string starting with `$` would otherwise be read
+as a field path or variable, e.g. an id of `"$$l.id"` would match every link.
+"""
+from datetime import datetime
+from typing import Dict, List
+
+
+def build_links_pipeline(create: List[dict], update: Dict[str, dict], delete: List[str],
+                         order: List[str], now: datetime) -> List[dict]:
+    stages = []
+
+    if delete or update:
+        kept = {"$filter": {
+            "input": "$links", "as": "l", "cond": {"$not": [{"$in": ["$$l.id", {"$literal": delete}]}]},
+        }}
+        if update:
+            kept = {"$map": {
+                "input": kept,
+                "as": "l",
+                "in": {"$mergeObjects": ["$$l", {"$switch": {
+                    "branches": [
+                        {"case": {"$eq": ["$$l.id", {"$literal": link_id}]}, "then": {"$literal": fields}}
+                        for link_id, fields in update.items()
+                    ],
+                    "default": {},
+                }}]},
+            }}
+        stages.append({"$set": {"links": kept}})
+
+    if order or create:
+        parts = [
+            {"$filter": {"input": "$links", "as": "l", "cond": {"$eq": ["$$l.id", {"$literal": link_id}]}}}
+            for link_id in order
+        ]
+        parts.append({"$filter": {
+            "input": "$links", "as": "l", "cond": {"$not": [{"$in": ["$$l.id", {"$literal": order}]}]},
+        }})
+        if create:
+            parts.append({"$literal": create})
+        stages.append({"$set": {"links": {"$concatArrays": parts}}})
+
+    stages.append({"$set": {
+        "links": {"$map": {
+            "input": {"$range": [0, {"$size": "$links"}]},
+            "as": "i",
+            "in": {"$mergeObjects": [{"$arrayElemAt": ["$links", "$$i"]}, {"order": "$$i"}]},
+        }},
+        "updated_at": {"$literal": now},
+    }})
+    return stages
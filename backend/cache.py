@@ -0,0 +1,190 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Protocol
+
+
+class LRUCache:
+    """Bounded in-process LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class CacheBackend(Protocol):
+    """Shared second cache tier (e.g. Redis/memcached) holding serialized values."""
+
+    async def get(self, key: str) -> Optional[str]: ...
+
+    async def set(self, key: str, value: str, ttl: float): ...
+
+    async def delete(self, key: str): ...
+
+
+class InMemoryCacheBackend:
+    """Local stand-in for a shared cache server, used in development and tests."""
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: str, ttl: float):
+        self._data[key] = (value, time.monotonic() + ttl)
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+
+class PageCache:
+    """Two-tier read-through cache for public link pages.
+
+    Values are JSON-ready dicts, so a hit can be returned without touching
+    Mongo or re-validating the `LinkPage` model. Concurrent misses for the same
+    key share a single load.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0, shared: Optional[CacheBackend] = None,
+                 namespace: str = "linkpage"):
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.shared = shared
+        self.namespace = namespace
+        self.shared_hits = 0
+        self.loads = 0
+        self.invalidations = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._epoch = 0
+
+    def _shared_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Optional[dict]:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        if self.shared is not None:
+            raw = await self.shared.get(self._shared_key(key))
+            if raw is not None:
+                value = json.loads(raw)
+                self.local.set(key, value)
+                self.shared_hits += 1
+                return value
+        return None
+
+    async def set(self, key: str, value: dict):
+        self.local.set(key, value)
+        if self.shared is not None:
+            await self.shared.set(self._shared_key(key), json.dumps(value), self.local.ttl)
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        value = await self.get(key)
+        if value is not None:
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        epoch = self._epoch
+        try:
+            self.loads += 1
+            value = await loader()
+            # Don't cache a value read before a concurrent invalidation landed.
+            if value is not None and epoch == self._epoch:
+                await self.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def invalidate(self, key: str):
+        self._epoch += 1
+        self.invalidations += 1
+        self._inflight.pop(key, None)
+        self.local.delete(key)
+        if self.shared is not None:
+            await self.shared.delete(self._shared_key(key))
+
+    def invalidate_local(self, key: str):
+        """Drop this worker's copy only, after another worker changed the value."""
+        self._epoch += 1
+        self._inflight.pop(key, None)
+        self.local.delete(key)
+
+    def clear(self):
+        self._epoch += 1
+        self._inflight.clear()
+        self.local.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.local.stats()
+        stats.update({
+            "shared_hits": self.shared_hits,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+            "shared_backend": type(self.shared).__name__ if self.shared is not None else None,
+        })
+        return stats
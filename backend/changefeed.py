@@ -0,0 +1,243 @@
+"""Cross-worker invalidation of per-process linkpage caches.
+
+Writers invalidate their own worker's caches directly; every other worker
+learns about the write from `ChangeFeed`, a background task tailing
+`linkpages` that calls its listeners with the changed page's username (or
+None when that can't be determined, meaning "drop everything").
+
+* Change streams (replica sets and sharded clusters): the resume token is
+  checkpointed to `change_feed_state` every `checkpoint_interval` seconds and
+  on shutdown, and the stream resumes from it after a restart or a dropped
+  connection. Updates that only touch link click counters are ignored, since
+  click flushes don't invalidate caches either.
+  A delete event only carries the page's `_id`. Its username comes from the
+  pre-image (`fullDocumentBeforeChange`, MongoDB 6.0+, enabled on the
+  collection by `ensure_indexes` when permitted), else from the last
+  `known_pages` `_id -> username` pairs seen in events or passed to
+  `remember` by readers of full pages. Only a delete of a page found in
+  neither, or a lost resume token, is dispatched as None.
+* Polling fallback (standalone servers and stand-ins without change
+  streams): every `poll_interval` seconds, pages whose `updated_at` moved are
+  read back by the `updated_at` index. `updated_at` is written with the
+  writer's clock, so each poll looks back `poll_lookback` seconds to tolerate
+  clock skew between workers. Deletes are not visible to polling; deleted
+  pages age out of caches with their TTL.
+"""
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import OperationFailure
+
+from cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+CLICK_FIELD = re.compile(r"^links\.\d+\.clicks$")
+# Server errors meaning change streams can't be used here at all
+# (40573: not a replica set, 136: change streams disabled / unsupported storage engine).
+UNSUPPORTED_CODES = {40573, 136}
+# The stored resume token is no longer in the oplog or is invalid.
+STALE_TOKEN_CODES = {260, 280, 286}
+# The server doesn't know fullDocumentBeforeChange (before MongoDB 6.0).
+UNKNOWN_FIELD_CODES = {40415}
+
+
+class ChangeStreamsUnsupported(Exception):
+    pass
+
+
+def changed_username(change: dict) -> Optional[str]:
+    for field in ("fullDocument", "fullDocumentBeforeChange"):
+        username = (change.get(field) or {}).get("username")
+        if username:
+            return username
+    return None
+
+
+def is_click_only(change: dict) -> bool:
+    if change.get("operationType") != "update":
+        return False
+    description = change.get("updateDescription") or {}
+    if description.get("removedFields") or description.get("truncatedArrays"):
+        return False
+    updated = description.get("updatedFields") or {}
+    return bool(updated) and all(CLICK_FIELD.match(field) for field in updated)
+
+
+class ChangeFeed:
+    def __init__(self, db: Callable, name: str = "linkpages", poll_interval: float = 1.0,
+                 poll_lookback: float = 2.0, checkpoint_interval: float = 5.0, retry_interval: float = 5.0,
+                 known_pages: int = 100000):
+        self._db = db
+        self.name = name
+        self.poll_interval = poll_interval
+        self.poll_lookback = poll_lookback
+        self.checkpoint_interval = checkpoint_interval
+        self.retry_interval = retry_interval
+        self._listeners: List[Callable[[Optional[str]], Awaitable]] = []
+        self._task = None
+        self._token = None
+        self._token_saved = None
+        self._token_loaded = False
+        self._polled_until: Optional[datetime] = None  # newest updated_at seen while polling
+        self._usernames = LRUCache(maxsize=known_pages, ttl=float("inf"))  # document _id -> username
+        self._before_images = True
+        self.mode: Optional[str] = None  # "change_stream" or "polling" once running
+        self.invalidations = 0
+        self.errors = 0
+
+    @property
+    def collection(self):
+        return self._db().linkpages
+
+    @property
+    def state(self):
+        return self._db().change_feed_state
+
+    def on_change(self, callback: Callable[[Optional[str]], Awaitable]):
+        self._listeners.append(callback)
+
+    async def _dispatch(self, username: Optional[str]):
+        self.invalidations += 1
+        for listener in self._listeners:
+            try:
+                await listener(username)
+            except Exception:
+                logger.exception("Change feed listener failed")
+
+    def remember(self, document_id, username: str):
+        """Note a page's `_id`, so a later delete event for it can be resolved."""
+        if document_id is not None:
+            self._usernames.set(document_id, username)
+
+    def username_of(self, change: dict) -> Optional[str]:
+        document_id = (change.get("documentKey") or {}).get("_id")
+        username = changed_username(change)
+        if change.get("operationType") == "delete":
+            if username is None and document_id is not None:
+                username = self._usernames.get(document_id)
+            self._usernames.delete(document_id)
+        elif username is not None:
+            self.remember(document_id, username)
+        return username
+
+    async def _load_token(self):
+        state = await self.state.find_one({"_id": self.name})
+        return state.get("resume_token") if state else None
+
+    async def checkpoint(self):
+        if self._token is None or self._token == self._token_saved:
+            return
+        token = self._token
+        await self.state.update_one(
+            {"_id": self.name},
+            {"$set": {"resume_token": token, "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+        self._token_saved = token
+
+    async def _tail(self):
+        if not self._token_loaded:
+            self._token = self._token_saved = await self._load_token()
+            self._token_loaded = True
+        options = {"full_document_before_change": "whenAvailable"} if self._before_images else {}
+        try:
+            stream = self.collection.watch(full_document="updateLookup", resume_after=self._token, **options)
+        except (AttributeError, NotImplementedError, TypeError):
+            # Stand-ins without watch() (mongomock resolves it to a sub-collection, which isn't callable).
+            raise ChangeStreamsUnsupported()
+        try:
+            async with stream:
+                self.mode = "change_stream"
+                saved_at = time.monotonic()
+                async for change in stream:
+                    username = self.username_of(change)
+                    if not is_click_only(change):
+                        await self._dispatch(username)
+                    self._token = stream.resume_token
+                    if time.monotonic() - saved_at >= self.checkpoint_interval:
+                        await self.checkpoint()
+                        saved_at = time.monotonic()
+        except OperationFailure as e:
+            if e.code in UNSUPPORTED_CODES:
+                raise ChangeStreamsUnsupported()
+            if e.code in UNKNOWN_FIELD_CODES and self._before_images:
+                logger.info("Change stream pre-images unsupported, resolving deletes from known pages only")
+                self._before_images = False
+                return
+            if e.code in STALE_TOKEN_CODES and self._token is not None:
+                logger.warning("Change feed resume token is stale, restarting from now")
+                self._token = None
+                # Events between the token and now were lost; drop everything.
+                await self._dispatch(None)
+                return
+            raise
+
+    async def _poll(self):
+        self.mode = "polling"
+        if self._polled_until is None:
+            self._polled_until = datetime.utcnow()
+        seen: Dict[str, datetime] = {}  # username -> updated_at already dispatched
+        while True:
+            since = self._polled_until - timedelta(seconds=self.poll_lookback)
+            cursor = self.collection.find(
+                {"updated_at": {"$gte": since}}, {"_id": 0, "username": 1, "updated_at": 1},
+            ).sort("updated_at", 1)
+            async for page in cursor:
+                username, updated_at = page.get("username"), page["updated_at"]
+                if seen.get(username) != updated_at:
+                    seen[username] = updated_at
+                    await self._dispatch(username)
+                self._polled_until = max(self._polled_until, updated_at)
+            seen = {username: at for username, at in seen.items() if at >= since}
+            await asyncio.sleep(self.poll_interval)
+
+    async def _run(self):
+        while True:
+            try:
+                if self.mode == "polling":
+                    await self._poll()
+                else:
+                    await self._tail()
+            except ChangeStreamsUnsupported:
+                logger.info("Change streams unavailable, polling %s.updated_at for invalidations", self.name)
+                self.mode = "polling"
+            except Exception:
+                self.errors += 1
+                logger.exception("Change feed failed, retrying in %ss", self.retry_interval)
+                await asyncio.sleep(self.retry_interval)
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("updated_at", 1)])
+        try:
+            await self._db().command("collMod", self.collection.name, changeStreamPreAndPostImages={"enabled": True})
+        except Exception as e:
+            logger.info("Change stream pre-images not enabled on %s (%s)", self.collection.name, e)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.checkpoint()
+        except Exception:
+            logger.exception("Failed to checkpoint change feed resume token")
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
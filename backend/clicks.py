@@ -0,0 +1,136 @@
+"""Buffered click counting.
+
+Clicks are accumulated in memory per (page id, link id) and written to Mongo
+as one unordered `bulk_write` of `$inc` updates per flush. `make_update`
+builds each update; by default it increments the embedded `links.$.clicks`
+of the page, the server passes `LinkCounters.update` instead. A flush runs every
+`flush_interval` seconds, as soon as `flush_size` clicks are pending, and once
+more when the application shuts down.
+
+Bounded loss: a click is only durable once the flush containing it has been
+acknowledged. At any moment at most `flush_size` clicks are waiting in the
+buffer and at most `flush_size` more are in the flush being written (a failed
+flush is merged back and retried, and `add` waits rather than growing the
+buffer past the limit). A crash of the process therefore loses at most
+`2 * flush_size` clicks, and in steady state no more than the clicks received
+during the last `flush_interval` seconds. A graceful shutdown loses none.
+
+Callbacks registered with `on_flush` receive each acknowledged batch as
+`{(page_id, link_id): clicks}` together with the flush time, so derived
+stores (analytics, live updates) see aggregated writes rather than one event
+per click. A failing callback is logged and does not affect the counters.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+
+def embedded_update(page_id: str, link_id: str, clicks: int) -> UpdateOne:
+    return UpdateOne({"id": page_id, "links.id": link_id}, {"$inc": {"links.$.clicks": clicks}})
+
+
+class ClickBuffer:
+    def __init__(self, collection: Callable, flush_interval: float = 1.0, flush_size: int = 1000,
+                 make_update: Callable[[str, str, int], UpdateOne] = embedded_update):
+        self._collection = collection
+        self._make_update = make_update
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._pending: Dict[Tuple[str, str], int] = {}
+        self._pending_clicks = 0
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._listeners: List[Callable[[Dict[Tuple[str, str], int], datetime], Awaitable]] = []
+        self.flushed_clicks = 0
+        self.flushes = 0
+        self.flush_errors = 0
+
+    def on_flush(self, callback: Callable[[Dict[Tuple[str, str], int], datetime], Awaitable]):
+        self._listeners.append(callback)
+
+    @property
+    def pending_clicks(self) -> int:
+        return self._pending_clicks
+
+    async def add(self, page_id: str, link_id: str, count: int = 1):
+        while self._pending_clicks >= self.flush_size:
+            await self.flush()
+        key = (page_id, link_id)
+        self._pending[key] = self._pending.get(key, 0) + count
+        self._pending_clicks += count
+
+    def _merge_back(self, batch: Dict[Tuple[str, str], int]):
+        for key, count in batch.items():
+            self._pending[key] = self._pending.get(key, 0) + count
+            self._pending_clicks += count
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            batch_clicks, self._pending_clicks = self._pending_clicks, 0
+
+            keys = list(batch)
+            operations = [self._make_update(page_id, link_id, batch[(page_id, link_id)]) for page_id, link_id in keys]
+            try:
+                await self._collection().bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                self.flush_errors += 1
+                failed = {keys[error["index"]] for error in e.details.get("writeErrors", [])}
+                self._merge_back({key: batch[key] for key in failed})
+                logger.warning("Click flush: %d of %d updates failed", len(failed), len(keys))
+                batch_clicks -= sum(batch[key] for key in failed)
+                for key in failed:
+                    del batch[key]
+            except Exception:
+                self.flush_errors += 1
+                self._merge_back(batch)
+                raise
+
+            self.flushes += 1
+            self.flushed_clicks += batch_clicks
+            flushed_at = datetime.utcnow()
+            for callback in self._listeners:
+                try:
+                    await callback(batch, flushed_at)
+                except Exception:
+                    logger.exception("Click flush listener failed")
+            return batch_clicks
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Click flush failed; will retry")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending_clicks": self._pending_clicks,
+            "pending_links": len(self._pending),
+            "flushed_clicks": self.flushed_clicks,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+        }
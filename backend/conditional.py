@@ -0,0 +1,60 @@
+"""Conditional GET helpers (ETag / Last-Modified / 304 Not Modified)."""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def page_etag(page: dict) -> str:
+    """Strong ETag for a LinkPage document.
+
+    Derived from the page id and `updated_at`; the click total is mixed in
+    because clicks are part of the body but do not bump `updated_at`.
+    """
+    clicks = sum(link.get("clicks", 0) for link in page.get("links", []))
+    digest = hashlib.sha1(f"{page['id']}:{page['updated_at']}:{clicks}".encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def http_date(value) -> str:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def _parse_http_date(value: str) -> Optional[datetime]:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def is_not_modified(request: Request, etag: str, last_modified: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2).
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        since = _parse_http_date(if_modified_since)
+        modified = _parse_http_date(last_modified)
+        return since is not None and modified is not None and modified <= since
+
+    return False
+
+
+def conditional_response(request: Request, body, cache_control: str, etag: str, last_modified: str,
+                         media_type: str = "application/json") -> Response:
+    headers = {"ETag": etag, "Last-Modified": last_modified, "Cache-Control": cache_control}
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
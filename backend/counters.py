@@ -0,0 +1,123 @@
+"""Link click counters stored outside the linkpages documents.
+
+Click flushes used to `$inc` `links.$.clicks` inside the page document,
+so every flush rewrote the document that public reads serve and contended
+with edits. Counts now live in `link_counters`, one small document per
+(link, shard):
+
+    {"_id": "<link id>:<shard>", "link_id": ..., "page_id": ..., "shard": ..., "clicks": n}
+
+A link's count is the sum of its shards. Links that receive at least
+`hot_threshold` clicks in one flush have them written to one of `shards`
+sub-counters chosen at random, so concurrent flushes from several workers
+don't all queue on the same document; everything else goes to shard 0.
+
+`merge` adds the counters of a whole page (one query by `page_id`) to the
+embedded `clicks`, which hold only historical counts until `migrate` has
+moved them over. The embedded value on public pages is no longer updated.
+
+    python counters.py migrate     # move embedded counts from MONGO_URL/DB_NAME
+
+Migration writes each embedded count to a `<link id>:migrated` counter with
+`$max` before zeroing it in the page, so an interrupted run can be repeated
+without counting anything twice. Run it after all workers write counters.
+"""
+import asyncio
+import random
+from typing import Callable, Dict, List
+
+from pymongo import IndexModel, UpdateOne
+
+BATCH_SIZE = 1000
+
+
+class LinkCounters:
+    def __init__(self, db: Callable, shards: int = 1, hot_threshold: int = 50):
+        self._db = db
+        self.shards = max(1, shards)
+        self.hot_threshold = hot_threshold
+
+    @property
+    def collection(self):
+        return self._db().link_counters
+
+    async def ensure_indexes(self):
+        await self.collection.create_indexes([IndexModel([("page_id", 1)]), IndexModel([("link_id", 1)])])
+
+    def update(self, page_id: str, link_id: str, clicks: int) -> UpdateOne:
+        """Upsert adding `clicks` to one of the link's shards (for ClickBuffer's bulk_write)."""
+        shard = random.randrange(self.shards) if self.shards > 1 and clicks >= self.hot_threshold else 0
+        return UpdateOne(
+            {"_id": f"{link_id}:{shard}"},
+            {"$inc": {"clicks": clicks}, "$setOnInsert": {"link_id": link_id, "page_id": page_id, "shard": shard}},
+            upsert=True,
+        )
+
+    async def totals(self, page_id: str) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        async for counter in self.collection.find({"page_id": page_id}, {"_id": 0, "link_id": 1, "clicks": 1}):
+            totals[counter["link_id"]] = totals.get(counter["link_id"], 0) + counter.get("clicks", 0)
+        return totals
+
+    async def merge(self, page: dict) -> dict:
+        totals = await self.totals(page["id"])
+        for link in page.get("links", []):
+            link["clicks"] = link.get("clicks", 0) + totals.get(link["id"], 0)
+        return page
+
+    async def delete_page(self, page_id: str):
+        await self.collection.delete_many({"page_id": page_id})
+
+    async def delete_links(self, page_id: str, link_ids: List[str]):
+        if link_ids:
+            await self.collection.delete_many({"page_id": page_id, "link_id": {"$in": link_ids}})
+
+    async def migrate(self, batch_size: int = BATCH_SIZE) -> int:
+        """Move embedded `links.clicks` into counters; returns the number of links moved."""
+        linkpages = self._db().linkpages
+        moved = 0
+        counters: List[UpdateOne] = []
+        resets: List[UpdateOne] = []
+
+        async def write():
+            if counters:
+                await self.collection.bulk_write(counters, ordered=False)
+                await linkpages.bulk_write(resets, ordered=False)
+                counters.clear()
+                resets.clear()
+
+        projection = {"_id": 0, "id": 1, "links.id": 1, "links.clicks": 1}
+        async for page in linkpages.find({"links.clicks": {"$gt": 0}}, projection):
+            for link in page.get("links", []):
+                clicks = link.get("clicks", 0)
+                if clicks <= 0:
+                    continue
+                counters.append(UpdateOne(
+                    {"_id": f"{link['id']}:migrated"},
+                    {"$max": {"clicks": clicks},
+                     "$setOnInsert": {"link_id": link["id"], "page_id": page["id"], "shard": "migrated"}},
+                    upsert=True,
+                ))
+                resets.append(UpdateOne({"id": page["id"], "links.id": link["id"]}, {"$set": {"links.$.clicks": 0}}))
+                moved += 1
+                if len(counters) >= batch_size:
+                    await write()
+        await write()
+        return moved
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    from pathlib import Path
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    if sys.argv[1:] != ["migrate"]:
+        sys.exit("usage: python counters.py migrate")
+    load_dotenv(Path(__file__).parent / ".env")
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    database = client[os.environ["DB_NAME"]]
+    moved = asyncio.run(LinkCounters(lambda: database).migrate())
+    print(f"Moved click counts of {moved} links to link_counters")
@@ -0,0 +1,203 @@
+"""HyperLogLog sketches for approximate unique visitors and clickers.
+
+Each sketch is `2**precision` one-byte registers (4 KiB at the default
+precision 12) regardless of how many distinct ids it has seen. Sketches merge
+by taking the register-wise maximum, so per-day sketches combine into ranges
+and sketches from several workers combine into one without double counting.
+
+Error bound: the relative standard error is 1.04 / sqrt(2**precision), i.e.
+about 1.6% at precision 12; roughly 95% of estimates fall within twice that
+(3.3%) of the true count. Small cardinalities use linear counting and are
+close to exact.
+
+`SketchStore` buffers sketches per (page, day, kind) in memory and merges
+them into `page_sketches` documents (registers stored as a binary blob) on
+flush, using a version field so concurrent workers never overwrite each
+other's registers. A flush is also started early once `max_pending` sketches
+are buffered, which caps this worker's sketch memory at about
+`max_pending * 2**precision` bytes.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+from bson import Binary
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRECISION = 12
+
+
+def relative_error(precision: int) -> float:
+    return 1.04 / math.sqrt(1 << precision)
+
+
+def _hash64(item: str) -> int:
+    return int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = DEFAULT_PRECISION, registers: Optional[bytes] = None):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.m = 1 << precision
+        if registers is not None and len(registers) != self.m:
+            raise ValueError("register blob does not match precision")
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    def add(self, item: str):
+        x = _hash64(item)
+        index = x >> (64 - self.precision)
+        rest = (x << self.precision) & ((1 << 64) - 1)
+        rank = min(64 - self.precision, 64 - rest.bit_length()) + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        m = self.m
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        return cls(precision=int(math.log2(len(data))), registers=data)
+
+
+def day_key(at: datetime) -> str:
+    return at.strftime("%Y-%m-%d")
+
+
+class SketchStore:
+    def __init__(self, db: Callable, precision: int = DEFAULT_PRECISION, flush_interval: float = 10.0,
+                 max_pending: int = 10000, max_retries: int = 5):
+        self._db = db
+        self.precision = precision
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self._pending: Dict[Tuple[str, str, str], HyperLogLog] = {}
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._early_flushes: Set[asyncio.Task] = set()
+        self.flush_conflicts = 0
+
+    @property
+    def collection(self):
+        return self._db().page_sketches
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("page_id", 1), ("kind", 1), ("day", 1)], unique=True)
+
+    def add(self, page_id: str, kind: str, visitor: str, at: Optional[datetime] = None):
+        key = (page_id, kind, day_key(at or datetime.utcnow()))
+        sketch = self._pending.get(key)
+        if sketch is None:
+            sketch = self._pending[key] = HyperLogLog(self.precision)
+            if len(self._pending) >= self.max_pending and not self._early_flushes:
+                task = asyncio.create_task(self.flush())
+                self._early_flushes.add(task)
+                task.add_done_callback(self._early_flush_done)
+        sketch.add(visitor)
+
+    def _early_flush_done(self, task: asyncio.Task):
+        self._early_flushes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Early sketch flush failed; will retry", exc_info=task.exception())
+
+    async def _merge_into_store(self, page_id: str, kind: str, day: str, sketch: HyperLogLog):
+        key = {"page_id": page_id, "kind": kind, "day": day}
+        for _ in range(self.max_retries):
+            stored = await self.collection.find_one(key, {"_id": 0, "registers": 1, "version": 1})
+            if stored is None:
+                try:
+                    await self.collection.insert_one({**key, "registers": Binary(sketch.to_bytes()), "version": 1})
+                    return
+                except Exception as e:
+                    if "duplicate key" not in str(e):
+                        raise
+                    self.flush_conflicts += 1
+                    continue
+            merged = HyperLogLog.from_bytes(stored["registers"]).merge(sketch)
+            result = await self.collection.update_one(
+                {**key, "version": stored["version"]},
+                {"$set": {"registers": Binary(merged.to_bytes())}, "$inc": {"version": 1}},
+            )
+            if result.matched_count:
+                return
+            self.flush_conflicts += 1
+        raise RuntimeError(f"Could not merge sketch for {key} after {self.max_retries} attempts")
+
+    async def flush(self) -> int:
+        async with self._lock:
+            items, self._pending = list(self._pending.items()), {}
+            for i, ((page_id, kind, day), sketch) in enumerate(items):
+                try:
+                    await self._merge_into_store(page_id, kind, day, sketch)
+                except Exception:
+                    for key, unflushed in items[i:]:
+                        existing = self._pending.get(key)
+                        self._pending[key] = unflushed.merge(existing) if existing else unflushed
+                    raise
+            return len(items)
+
+    async def count(self, page_id: str, kind: str, days: Iterable[str]) -> int:
+        """Unique ids across `days`, including sketches not yet flushed by this worker."""
+        days = list(days)
+        total = HyperLogLog(self.precision)
+        async for stored in self.collection.find(
+            {"page_id": page_id, "kind": kind, "day": {"$in": days}}, {"_id": 0, "registers": 1},
+        ):
+            total.merge(HyperLogLog.from_bytes(stored["registers"]))
+        for day in days:
+            pending = self._pending.get((page_id, kind, day))
+            if pending is not None:
+                total.merge(pending)
+        return total.count()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Sketch flush failed; will retry")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._early_flushes:
+            await asyncio.gather(*self._early_flushes, return_exceptions=True)
+        await self.flush()
+
+
+def days_between(start: datetime, end: datetime):
+    day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day < end:
+        yield day_key(day)
+        day += timedelta(days=1)
@@ -0,0 +1,179 @@
+"""Pre-fork launcher running the app in several worker processes.
+
+    python launcher.py --workers 4 --port 8001 [--warmup 1000]
+
+The parent imports `server` once (so the workers share its code pages),
+binds the listening socket and then:
+
+1. forks a short-lived leader that connects to Mongo, runs `init_db` and
+   exits, so index builds happen once per launch instead of once per worker;
+2. forks `--workers` workers (default `WEB_CONCURRENCY`, else one per CPU)
+   that accept on the inherited socket with their own uvicorn server. Each
+   creates its own Motor client in the startup hook, after the fork (the
+   parent never connects), and skips `init_db`. With `--warmup N` each
+   worker loads the N most clicked public pages into its page cache before
+   it starts accepting.
+
+Workers share nothing: caches, click buffers, rate-limit buckets and metrics
+are per worker, as with any multi-process deployment (see `PAGE_CACHE_SHARED`
+and `RATE_LIMIT_SHARED`). A worker that exits unexpectedly is replaced.
+SIGTERM or SIGINT stops the workers gracefully (they flush pending clicks on
+shutdown) and kills those still running after `--graceful-timeout` seconds.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Optional
+
+import uvicorn
+
+import server
+
+logger = logging.getLogger("launcher")
+
+RESPAWN_DELAY = 1.0
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+async def initialize():
+    if server.db is None:
+        server.connect_mongo()
+    try:
+        await server.init_db()
+    finally:
+        if server.client is not None:
+            server.client.close()
+
+
+def fork(target) -> int:
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            target()
+            code = 0
+        except BaseException:
+            logger.exception("Process %d failed", os.getpid())
+        finally:
+            os._exit(code)
+    return pid
+
+
+class Launcher:
+    def __init__(self, workers: int, host: str = "0.0.0.0", port: int = 8001, warmup: int = 0,
+                 graceful_timeout: float = 30.0, log_level: str = "info"):
+        self.workers = max(1, workers)
+        self.host = host
+        self.port = port
+        self.warmup = warmup
+        self.graceful_timeout = graceful_timeout
+        self.log_level = log_level
+        self.sock: Optional[socket.socket] = None
+        self._children: Dict[int, int] = {}  # pid -> worker index
+        self._stopping = False
+
+    def _lead(self):
+        asyncio.run(initialize())
+
+    def _serve(self):
+        # Runs in the worker, which creates its Motor client in the startup hook.
+        server.INIT_DB = "off"
+        server.PAGE_WARMUP = self.warmup
+        config = uvicorn.Config(server.app, log_level=self.log_level, lifespan="on")
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def _spawn(self, index: int):
+        pid = fork(self._serve)
+        self._children[pid] = index
+        logger.info("Started worker %d (pid %d)", index, pid)
+
+    def _signal(self, pid: int, signum: int):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _stop(self, signum, frame):
+        self._stopping = True
+        for pid in list(self._children):
+            self._signal(pid, signal.SIGTERM)
+
+    def _supervise(self):
+        """Wait for all workers to exit, replacing the ones that die while not stopping."""
+        deadline = None
+        while self._children:
+            if self._stopping:
+                if deadline is None:
+                    deadline = time.monotonic() + self.graceful_timeout
+                elif time.monotonic() >= deadline:
+                    for pid in self._children:
+                        logger.warning("Killing worker pid %d after the graceful timeout", pid)
+                        self._signal(pid, signal.SIGKILL)
+                    deadline = float("inf")
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.1)
+                continue
+            index = self._children.pop(pid, None)
+            if index is not None and not self._stopping:
+                logger.warning("Worker %d (pid %d) exited with status %d, replacing it", index, pid, status)
+                time.sleep(RESPAWN_DELAY)
+                if not self._stopping:
+                    self._spawn(index)
+
+    def run(self) -> int:
+        self.sock = bind_socket(self.host, self.port)
+        leader = fork(self._lead)
+        _, status = os.waitpid(leader, 0)
+        if status != 0:
+            logger.error("init_db failed in the leader (status %d), not starting workers", status)
+            return 1
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for index in range(self.workers):
+            self._spawn(index)
+        logger.info("Serving on %s:%d with %d workers", self.host, self.port, self.workers)
+        self._supervise()
+        self.sock.close()
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--warmup", type=int, default=server.PAGE_WARMUP, help="top public pages to preload")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    launcher = Launcher(args.workers, host=args.host, port=args.port, warmup=args.warmup,
+                        graceful_timeout=args.graceful_timeout, log_level=args.log_level)
+    sys.exit(launcher.run())
+
+
+if __name__ == "__main__":
+    main()
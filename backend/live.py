@@ -0,0 +1,107 @@
+"""Live click deltas for dashboards over Server-Sent Events.
+
+`track_click` publishes every click to `ClickStream`, which fans it out to
+the streams subscribed to that page in this process (publishing to a page
+nobody watches is a dict miss). Each subscription accumulates
+`{link_id: clicks}` deltas and its stream sends them as one `clicks` event
+at most every `min_interval` seconds, so a viral link costs a subscriber a
+few small events per second rather than one per click. Idle streams get a
+comment line every `heartbeat` seconds to keep proxies from closing them.
+
+Deltas are relative to the moment the stream opened, and clicks still in
+the click buffer are included, so a dashboard adds them to the counts it
+loaded from `/api/linkpage/my`. With several workers each stream only sees
+clicks handled by its own process.
+"""
+import asyncio
+from typing import AsyncIterator, Dict, Set
+
+from responses import dumps
+
+
+class ClickStreamFull(Exception):
+    pass
+
+
+class Subscription:
+    __slots__ = ("page_id", "pending", "event")
+
+    def __init__(self, page_id: str):
+        self.page_id = page_id
+        self.pending: Dict[str, int] = {}
+        self.event = asyncio.Event()
+
+    def add(self, link_id: str, count: int):
+        self.pending[link_id] = self.pending.get(link_id, 0) + count
+        self.event.set()
+
+    def take(self) -> Dict[str, int]:
+        self.event.clear()
+        pending, self.pending = self.pending, {}
+        return pending
+
+
+class ClickStream:
+    def __init__(self, min_interval: float = 0.5, heartbeat: float = 15.0, max_subscribers: int = 10000):
+        self.min_interval = min_interval
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._count = 0
+        self.published = 0
+        self.events_sent = 0
+
+    def publish(self, page_id: str, link_id: str, count: int = 1):
+        subscriptions = self._subscribers.get(page_id)
+        if not subscriptions:
+            return
+        self.published += count
+        for subscription in subscriptions:
+            subscription.add(link_id, count)
+
+    def subscribe(self, page_id: str) -> Subscription:
+        if self._count >= self.max_subscribers:
+            raise ClickStreamFull()
+        subscription = Subscription(page_id)
+        self._subscribers.setdefault(page_id, set()).add(subscription)
+        self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscribers.get(subscription.page_id)
+        if subscriptions is None or subscription not in subscriptions:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscribers[subscription.page_id]
+        self._count -= 1
+
+    async def events(self, subscription: Subscription) -> AsyncIterator[bytes]:
+        """SSE byte stream for `subscription`; unsubscribes when the client goes away."""
+        loop = asyncio.get_running_loop()
+        last_sent = float("-inf")
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    await asyncio.wait_for(subscription.event.wait(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                delay = last_sent + self.min_interval - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                deltas = subscription.take()
+                last_sent = loop.time()
+                self.events_sent += 1
+                yield b"event: clicks\ndata: " + dumps(deltas) + b"\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self):
+        return {
+            "subscribers": self._count,
+            "pages": len(self._subscribers),
+            "published_clicks": self.published,
+            "events_sent": self.events_sent,
+        }
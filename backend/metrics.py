@@ -0,0 +1,208 @@
+"""Latency histograms exposed in Prometheus text format.
+
+Observations are recorded without locks: every thread writes to its own
+shard (Motor runs Mongo operations, and therefore command-monitoring
+callbacks, on worker threads, while handlers run on the event loop thread),
+and shards are only merged when `/metrics` is rendered. Each process (uvicorn
+worker) has its own registry; Prometheus aggregates across workers.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.help: Dict[str, str] = {}
+        self._local = threading.local()
+        self._shards: List[Dict[Tuple[str, Labels], Histogram]] = []
+        self._shards_lock = threading.Lock()  # only taken when a thread records its first observation
+        self._collectors: List[Callable[[], List[Tuple[str, Labels, float]]]] = []
+
+    def describe(self, name: str, text: str):
+        self.help[name] = text
+
+    def _shard(self) -> Dict[Tuple[str, Labels], Histogram]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def observe(self, name: str, value: float, labels: Labels = ()):
+        shard = self._shard()
+        histogram = shard.get((name, labels))
+        if histogram is None:
+            histogram = shard[(name, labels)] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def timer(self, name: str, **labels) -> "Timer":
+        return Timer(self, name, tuple(labels.items()))
+
+    def add_collector(self, collector: Callable[[], List[Tuple[str, Labels, float]]]):
+        """Register a callback returning (gauge name, labels, value) samples at render time."""
+        self._collectors.append(collector)
+
+    def snapshot(self) -> Dict[Tuple[str, Labels], Histogram]:
+        merged: Dict[Tuple[str, Labels], Histogram] = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, histogram in list(shard.items()):
+                total = merged.get(key)
+                if total is None:
+                    total = merged[key] = Histogram(self.buckets)
+                total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+                total.sum += histogram.sum
+                total.count += histogram.count
+        return merged
+
+    def render(self) -> str:
+        lines = []
+        by_name: Dict[str, List[Tuple[Labels, Histogram]]] = {}
+        for (name, labels), histogram in sorted(self.snapshot().items()):
+            by_name.setdefault(name, []).append((labels, histogram))
+
+        for name, series in by_name.items():
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in series:
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum!r}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+        gauges: Dict[str, List[Tuple[Labels, float]]] = {}
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                gauges.setdefault(name, []).append((labels, value))
+        for name, samples in gauges.items():
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels) + "}"
+
+
+class Timer:
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry: MetricsRegistry, name: str, labels: Labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.start, self.labels)
+        return False
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request latency per route template and status."""
+
+    def __init__(self, app, registry: MetricsRegistry, name: str = "http_request_duration_seconds"):
+        self.app = app
+        self.registry = registry
+        self.name = name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            labels = (
+                ("method", scope["method"]),
+                ("route", route.path if route is not None else "unmatched"),
+                ("status", str(status)),
+            )
+            self.registry.observe(self.name, time.perf_counter() - start, labels)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Records every Mongo command's server round-trip by command and collection."""
+
+    def __init__(self, registry: MetricsRegistry, name: str = "mongo_command_duration_seconds"):
+        self.registry = registry
+        self.name = name
+        self._collections: Dict[int, str] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def _finish(self, event, outcome: str):
+        labels = (
+            ("command", event.command_name),
+            ("collection", self._collections.pop(event.request_id, "")),
+            ("outcome", outcome),
+        )
+        self.registry.observe(self.name, event.duration_micros / 1e6, labels)
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+
+registry = MetricsRegistry()
+registry.describe("http_request_duration_seconds", "HTTP request latency by route template and status.")
+registry.describe("mongo_command_duration_seconds", "MongoDB command round-trip time.")
+registry.describe("bcrypt_duration_seconds", "Password hash/verify time including pool queueing.")
+registry.describe("jwt_duration_seconds", "JWT encode/decode time.")
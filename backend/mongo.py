@@ -0,0 +1,70 @@
+"""Motor client configuration from the environment.
+
+Every setting is optional; unset ones fall back to the driver default or to
+whatever the MONGO_URL query string says.
+
+    MONGO_MAX_POOL_SIZE                maxPoolSize (connections per server)
+    MONGO_MIN_POOL_SIZE                minPoolSize
+    MONGO_MAX_CONNECTING               maxConnecting (concurrent connection handshakes)
+    MONGO_MAX_IDLE_TIME_MS             maxIdleTimeMS
+    MONGO_WAIT_QUEUE_TIMEOUT_MS        waitQueueTimeoutMS (wait for a free pooled connection)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS  serverSelectionTimeoutMS
+    MONGO_CONNECT_TIMEOUT_MS           connectTimeoutMS
+    MONGO_SOCKET_TIMEOUT_MS            socketTimeoutMS
+    MONGO_COMPRESSORS                  compressors, e.g. "zstd,snappy,zlib" (in preference order;
+                                       zstd needs `zstandard`, snappy needs `python-snappy`)
+    MONGO_ZLIB_COMPRESSION_LEVEL       zlibCompressionLevel
+
+The client itself reads from the primary. `read_preference` builds the
+preference used by the public page read path only; writes and owner reads
+never leave the primary. A public page reloaded from a lagging secondary
+right after an edit is cached until the page cache TTL expires, so bound
+the lag with MONGO_PUBLIC_MAX_STALENESS_SECONDS if that matters. Static
+snapshot files are regenerated from the primary, so they don't go stale.
+"""
+from typing import Mapping
+
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+# Environment variable -> (MongoClient keyword, parser)
+CLIENT_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": ("maxPoolSize", int),
+    "MONGO_MIN_POOL_SIZE": ("minPoolSize", int),
+    "MONGO_MAX_CONNECTING": ("maxConnecting", int),
+    "MONGO_MAX_IDLE_TIME_MS": ("maxIdleTimeMS", int),
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": ("waitQueueTimeoutMS", int),
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": ("serverSelectionTimeoutMS", int),
+    "MONGO_CONNECT_TIMEOUT_MS": ("connectTimeoutMS", int),
+    "MONGO_SOCKET_TIMEOUT_MS": ("socketTimeoutMS", int),
+    "MONGO_COMPRESSORS": ("compressors", lambda value: ",".join(part.strip() for part in value.split(",") if part.strip())),
+    "MONGO_ZLIB_COMPRESSION_LEVEL": ("zlibCompressionLevel", int),
+}
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def client_options(environ: Mapping[str, str]) -> dict:
+    options = {}
+    for name, (option, parse) in CLIENT_OPTIONS.items():
+        value = environ.get(name, "").strip()
+        if not value:
+            continue
+        try:
+            options[option] = parse(value)
+        except ValueError:
+            raise ValueError(f"Invalid {name}: {value!r}")
+    return options
+
+
+def read_preference(mode: str, max_staleness: int = -1):
+    if mode not in READ_PREFERENCES:
+        raise ValueError(f"Unknown read preference: {mode}")
+    if mode == "primary":
+        return Primary()
+    return READ_PREFERENCES[mode](max_staleness=max_staleness)
@@ -0,0 +1,172 @@
+"""Token-bucket rate limiting for unauthenticated and expensive endpoints.
+
+Each key (client IP, link id, ...) gets a bucket holding up to `burst`
+tokens that refills at `rate` tokens per second; a request takes one token or
+is refused with the number of seconds until one is available. A bucket is
+two floats, kept in an OrderedDict in last-touched order. A bucket left alone
+for `burst / rate` seconds is full again, i.e. indistinguishable from a new
+one, so those are dropped from the front of the dict as other keys are
+touched; memory is therefore proportional to the keys active in the last
+refill window (and capped at `maxsize`).
+
+Buckets are per process by default. With several workers each one allows the
+full rate, so `RateLimiter` can instead defer to a `RateLimitBackend` shared by
+all workers (e.g. a Redis script); `InMemoryRateLimitBackend` is the local
+stand-in used in development and tests.
+
+Per-IP keys use `client_address`: the TCP peer, unless the peer is one of the
+configured trusted proxies, in which case `X-Forwarded-For` is read from the
+right and the first hop that isn't a trusted proxy is the client. Anything
+left of that hop was written by the client and is ignored, so rotating the
+header doesn't yield fresh buckets. Behind a proxy the proxies must be
+configured (`TRUSTED_PROXIES`): otherwise every client is the proxy's
+address and shares one bucket per limit.
+"""
+import ipaddress
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Protocol, Tuple, Union
+
+from fastapi import Request
+
+
+class RateLimited(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(name)
+        self.name = name
+        self.retry_after = retry_after
+
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_networks(value: str) -> List[Network]:
+    """Comma-separated addresses or CIDR ranges."""
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(",") if item.strip()]
+
+
+def _is_trusted(address: str, proxies: List[Network]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in proxies)
+
+
+def client_address(peer: str, forwarded: Optional[str], proxies: List[Network]) -> str:
+    if not forwarded or not _is_trusted(peer, proxies):
+        return peer
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop, proxies):
+            return hop
+    return hops[0] if hops else peer
+
+
+class TokenBuckets:
+    def __init__(self, rate: float, burst: float, maxsize: int = 100000, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self.idle = burst / rate
+        self._clock = clock
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: str, cost: float = 1.0) -> float:
+        """Take `cost` tokens; returns 0 on success, else seconds until they are available."""
+        now = self._clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            wait = 0.0
+        else:
+            wait = (cost - bucket[0]) / self.rate
+
+        buckets = self._buckets
+        while len(buckets) > self.maxsize or now - next(iter(buckets.values()))[1] >= self.idle:
+            buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class RateLimitBackend(Protocol):
+    """Bucket store shared by all workers."""
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float: ...
+
+
+class InMemoryRateLimitBackend:
+    """Local stand-in for a shared rate limit store, used in development and tests."""
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self._buckets: Dict[Tuple[float, float], TokenBuckets] = {}
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        buckets = self._buckets.get((rate, burst))
+        if buckets is None:
+            buckets = self._buckets[(rate, burst)] = TokenBuckets(rate, burst, self.maxsize)
+        return buckets.take(key, cost)
+
+
+class RateLimiter:
+    """FastAPI dependency limiting requests per `key(request)`; rate 0 disables it."""
+
+    def __init__(self, name: str, rate: float, burst: float, key: Callable[[Request], str],
+                 shared: Optional[RateLimitBackend] = None, maxsize: int = 100000):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.key = key
+        self.shared = shared
+        self.local = TokenBuckets(rate, burst, maxsize) if rate > 0 else None
+        self.allowed = 0
+        self.limited = 0
+
+    async def __call__(self, request: Request):
+        wait = await self.take(request)
+        if wait:
+            raise RateLimited(self.name, wait)
+
+    async def take(self, request: Request) -> float:
+        """Take a token for the request; returns 0 if allowed, else seconds until one is available."""
+        if self.local is None:
+            return 0.0
+        key = f"{self.name}:{self.key(request)}"
+        if self.shared is not None:
+            wait = await self.shared.take(key, self.rate, self.burst)
+        else:
+            wait = self.local.take(key)
+        if wait:
+            self.limited += 1
+        else:
+            self.allowed += 1
+        return wait
+
+    def clear(self):
+        if self.local is not None:
+            self.local.clear()
+        self.allowed = 0
+        self.limited = 0
+
+    def stats(self):
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "active_keys": len(self.local) if self.local is not None else 0,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "shared_backend": type(self.shared).__name__ if self.shared is not None else None,
+        }
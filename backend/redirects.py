@@ -0,0 +1,184 @@
+"""In-memory link id -> target URL directory behind the `/r/{link_id}` redirects.
+
+Redirects are answered from this map without a database round trip. It is
+warmed at startup by streaming `links.id` / `links.url` of every page, filled
+on a miss by one `links.id` index lookup (which loads all links of that
+page), updated in place by this worker's link endpoints and dropped per page
+when the change feed reports a write from another worker.
+
+Links are held per page: `_links` maps a link id to `(url, page_id,
+username)` and `_pages` keeps, in least-recently-used order, each held
+page's id, link ids and expiry. Eviction (past `maxsize` links) and expiry
+(`ttl`, a safety net for writes the feed can't see, such as deletes while
+polling) always drop a whole page, so a page known only by its username can
+be forgotten completely.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROJECTION = {"_id": 0, "id": 1, "username": 1, "links.id": 1, "links.url": 1}
+WARM_BATCH_SIZE = 1000
+
+
+class _Page:
+    __slots__ = ("page_id", "link_ids", "expires_at")
+
+    def __init__(self, page_id: str, link_ids: List[str], expires_at: float):
+        self.page_id = page_id
+        self.link_ids = link_ids
+        self.expires_at = expires_at
+
+
+class LinkDirectory:
+    def __init__(self, db: Callable, maxsize: int = 1000000, ttl: float = 3600.0):
+        self._db = db
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._links: Dict[str, Tuple[str, str, str]] = {}
+        self._pages: "OrderedDict[str, _Page]" = OrderedDict()
+        self._task = None
+        self._touched: Optional[set] = None  # usernames written to while warming
+        self.warmed = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._links)
+
+    def get(self, link_id: str) -> Optional[Tuple[str, str]]:
+        """`(url, page_id)` of a held link, or None."""
+        entry = self._links.get(link_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        url, page_id, username = entry
+        if self._pages[username].expires_at < time.monotonic():
+            self.drop_page(username)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._pages.move_to_end(username)
+        self.hits += 1
+        return url, page_id
+
+    async def resolve(self, link_id: str) -> Optional[Tuple[str, str]]:
+        entry = self.get(link_id)
+        if entry is not None:
+            return entry
+        page = await self._db().linkpages.find_one({"links.id": link_id}, PROJECTION)
+        if not page:
+            return None
+        self.put_page(page)
+        for link in page.get("links", []):
+            if link["id"] == link_id:
+                return link["url"], page["id"]
+        return None
+
+    def put_page(self, page: dict):
+        """Hold all links of `page` (needs `id`, `username` and `links.id` / `links.url`)."""
+        username = page["username"]
+        self.drop_page(username)
+        links = page.get("links", [])
+        for link in links:
+            self._links[link["id"]] = (link["url"], page["id"], username)
+        self._pages[username] = _Page(page["id"], [link["id"] for link in links], time.monotonic() + self.ttl)
+        while len(self._links) > self.maxsize and len(self._pages) > 1:
+            self._drop(*self._pages.popitem(last=False))
+            self.evictions += 1
+
+    def put_link(self, username: str, link_id: str, url: str):
+        """Add or update one link of a page; links of pages not held are loaded on their next miss."""
+        self._touch(username)
+        page = self._pages.get(username)
+        if page is None:
+            return
+        if link_id not in self._links:
+            page.link_ids.append(link_id)
+        self._links[link_id] = (url, page.page_id, username)
+
+    def drop_links(self, username: str, link_ids: List[str]):
+        self._touch(username)
+        for link_id in link_ids:
+            entry = self._links.get(link_id)
+            if entry is not None and entry[2] == username:
+                del self._links[link_id]
+
+    def drop_page(self, username: str):
+        self._touch(username)
+        page = self._pages.pop(username, None)
+        if page is not None:
+            self._drop(username, page)
+
+    def _drop(self, username: str, page: _Page):
+        for link_id in page.link_ids:
+            entry = self._links.get(link_id)
+            if entry is not None and entry[2] == username:
+                del self._links[link_id]
+
+    def _touch(self, username: str):
+        if self._touched is not None:
+            self._touched.add(username)
+
+    def clear(self):
+        self._links.clear()
+        self._pages.clear()
+
+    async def warm(self) -> int:
+        """Hold pages' links until `maxsize`, streaming `linkpages`; returns the number of links loaded."""
+        cursor = self._db().linkpages.find({"links.0": {"$exists": True}}, PROJECTION).batch_size(WARM_BATCH_SIZE)
+        loaded = 0
+        self._touched = set()
+        try:
+            async for page in cursor:
+                if loaded + len(page["links"]) > self.maxsize:
+                    break
+                # Pages resolved or written since the scan read them are fresher than it.
+                username = page["username"]
+                if username not in self._pages and username not in self._touched:
+                    self.put_page(page)
+                    loaded += len(page["links"])
+        finally:
+            self._touched = None
+        self.warmed = loaded
+        return loaded
+
+    async def _warm(self):
+        start = time.monotonic()
+        try:
+            loaded = await self.warm()
+        except Exception:
+            logger.exception("Failed to warm the link directory")
+            return
+        logger.info("Link directory warmed with %d links in %.1fs", loaded, time.monotonic() - start)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._warm())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._links),
+            "pages": len(self._pages),
+            "maxsize": self.maxsize,
+            "warmed": self.warmed,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,268 @@
+"""Instrumented access layer over the Motor database.
+
+`InstrumentedDatabase` wraps a Motor (or API-compatible) database and hands
+out `InstrumentedCollection`s, so handlers keep writing `db.linkpages.find_one(...)`
+while every call is timed by a `QueryProfiler`:
+
+* per (collection, operation, filter shape) counts, total and max duration,
+  where the shape replaces every value with "?" so `{"username": "alice"}`
+  and `{"username": "bob"}` aggregate together;
+* a bounded log of calls slower than `slow_ms`, kept with their shape (never
+  the values) and logged as warnings;
+* SpaceSaving top-K sketches of the most accessed usernames and link ids,
+  read from the `username` and `links.id` filter fields. Click counter
+  writes are keyed by `_id`, so the click path feeds `link_ids` itself
+  through `add_hot`, once per link per flushed batch. These count Mongo
+  access, so reads served from the page cache or the link memo don't show up.
+
+Durations are measured at the call site, so they include driver and thread
+pool queueing on top of the server round trip reported by `/metrics`.
+"""
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from responses import dumps
+
+logger = logging.getLogger(__name__)
+
+# Methods whose first argument is a query filter.
+FILTER_OPERATIONS = {
+    "find_one", "update_one", "update_many", "replace_one", "delete_one", "delete_many",
+    "find_one_and_update", "find_one_and_replace", "find_one_and_delete", "count_documents",
+}
+# Other methods that reach the server and are worth timing.
+WRITE_OPERATIONS = {"insert_one", "insert_many", "bulk_write", "create_index", "drop"}
+
+# Filter field -> hot-key sketch it feeds.
+HOT_FIELDS = {"username": "usernames", "links.id": "link_ids"}
+
+
+def filter_shape(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = filter_shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+
+class SpaceSaving:
+    """Top-K heavy hitters in O(k) memory (Metwally et al.).
+
+    Every key with true frequency above n/k is guaranteed to be tracked, and a
+    tracked key's count overestimates its true count by at most its `error`.
+    """
+
+    def __init__(self, k: int = 100):
+        self.k = k
+        self.total = 0
+        self._counts: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+
+    def add(self, key: str, count: int = 1):
+        self.total += count
+        if key in self._counts:
+            self._counts[key] += count
+        elif len(self._counts) < self.k:
+            self._counts[key] = count
+            self._errors[key] = 0
+        else:
+            victim = min(self._counts, key=self._counts.__getitem__)
+            floor = self._counts.pop(victim)
+            del self._errors[victim]
+            self._counts[key] = floor + count
+            self._errors[key] = floor
+
+    def top(self, n: Optional[int] = None) -> List[dict]:
+        ranked = sorted(self._counts.items(), key=lambda item: item[1], reverse=True)[:n]
+        return [{"key": key, "count": count, "error": self._errors[key]} for key, count in ranked]
+
+    def clear(self):
+        self.total = 0
+        self._counts.clear()
+        self._errors.clear()
+
+
+class QueryProfiler:
+    def __init__(self, slow_ms: float = 100.0, slow_log_size: int = 200, top_k: int = 100,
+                 max_shapes: int = 1000):
+        self.slow_ms = slow_ms
+        self.max_shapes = max_shapes
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self.hot = {name: SpaceSaving(top_k) for name in HOT_FIELDS.values()}
+        self._operations: Dict[Tuple[str, str, str], List[float]] = {}
+
+    def record(self, collection: str, operation: str, filters: List[dict], seconds: float):
+        shapes = filter_shape(filters)
+        shape = dumps(shapes[0] if len(shapes) == 1 else shapes or None).decode("utf-8")
+        key = (collection, operation, shape)
+        stats = self._operations.get(key)
+        if stats is None:
+            if len(self._operations) >= self.max_shapes:
+                key = (collection, operation, "(other)")
+                stats = self._operations.setdefault(key, [0, 0.0, 0.0])
+            else:
+                stats = self._operations[key] = [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] = max(stats[2], seconds)
+
+        for query in filters:
+            for field, sketch in HOT_FIELDS.items():
+                value = query.get(field)
+                if isinstance(value, str):
+                    self.hot[sketch].add(value)
+
+        duration_ms = seconds * 1000
+        if duration_ms >= self.slow_ms:
+            self.slow_queries.append({
+                "collection": collection,
+                "operation": operation,
+                "shape": shape,
+                "duration_ms": round(duration_ms, 3),
+                "at": datetime.utcnow(),
+            })
+            logger.warning("Slow %s.%s %s took %.1fms", collection, operation, shape, duration_ms)
+
+    def add_hot(self, sketch: str, key: str, count: int = 1):
+        """Count an access to `key` that its query filter doesn't show."""
+        self.hot[sketch].add(key, count)
+
+    def report(self, limit: int = 20) -> dict:
+        operations = sorted(self._operations.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return {
+            "slow_ms": self.slow_ms,
+            "operations": [
+                {
+                    "collection": collection,
+                    "operation": operation,
+                    "shape": shape,
+                    "count": count,
+                    "total_ms": round(total * 1000, 3),
+                    "mean_ms": round(total * 1000 / count, 3),
+                    "max_ms": round(longest * 1000, 3),
+                }
+                for (collection, operation, shape), (count, total, longest) in operations
+            ],
+            "slow_queries": list(self.slow_queries)[-limit:][::-1],
+            "hot": {name: sketch.top(limit) for name, sketch in self.hot.items()},
+        }
+
+    def clear(self):
+        self._operations.clear()
+        self.slow_queries.clear()
+        for sketch in self.hot.values():
+            sketch.clear()
+
+
+class InstrumentedCursor:
+    """Proxies a cursor, timing the time spent fetching results."""
+
+    def __init__(self, cursor, on_done):
+        self._cursor = cursor
+        self._on_done = on_done
+        self._elapsed = 0.0
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if not callable(attr):
+            return attr
+
+        def chain(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return self if result is self._cursor else result
+        return chain
+
+    async def to_list(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await self._cursor.to_list(*args, **kwargs)
+        finally:
+            self._on_done(time.perf_counter() - start)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        start = time.perf_counter()
+        try:
+            return await self._cursor.__anext__()
+        except StopAsyncIteration:
+            self._on_done(self._elapsed + time.perf_counter() - start)
+            raise
+        finally:
+            self._elapsed += time.perf_counter() - start
+
+
+class InstrumentedCollection:
+    def __init__(self, collection, profiler: QueryProfiler):
+        self._collection = collection
+        self._profiler = profiler
+        self.name = collection.name
+
+    def _timed(self, operation: str, method, filters_of):
+        async def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                self._profiler.record(self.name, operation, filters_of(args, kwargs), time.perf_counter() - start)
+        return call
+
+    def find(self, filter=None, *args, **kwargs):
+        cursor = self._collection.find(filter, *args, **kwargs)
+        return InstrumentedCursor(cursor, lambda seconds: self._profiler.record(self.name, "find", [filter or {}], seconds))
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in FILTER_OPERATIONS:
+            return self._timed(name, attr, _filter_argument)
+        if name == "bulk_write":
+            return self._timed(name, attr, _bulk_filters)
+        if name in WRITE_OPERATIONS:
+            return self._timed(name, attr, lambda args, kwargs: [])
+        return attr
+
+
+def _filter_argument(args, kwargs) -> List[dict]:
+    query = args[0] if args else kwargs.get("filter")
+    return [query] if isinstance(query, dict) else []
+
+
+def _bulk_filters(args, kwargs) -> List[dict]:
+    requests = args[0] if args else kwargs.get("requests", [])
+    return [request._filter for request in requests if isinstance(getattr(request, "_filter", None), dict)]
+
+
+class InstrumentedDatabase:
+    def __init__(self, database, profiler: QueryProfiler):
+        self._database = database
+        self.profiler = profiler
+        self._collections: Dict[str, InstrumentedCollection] = {}
+
+    def __getitem__(self, name: str) -> InstrumentedCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = InstrumentedCollection(self._database[name], self.profiler)
+        return collection
+
+    def get_collection(self, name: str, **options) -> InstrumentedCollection:
+        """A collection with per-collection options (e.g. read_preference); not memoized."""
+        if not options:
+            return self[name]
+        return InstrumentedCollection(self._database.get_collection(name, **options), self.profiler)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attr = getattr(self._database, name)
+        if hasattr(attr, "find_one") and hasattr(attr, "insert_one"):
+            return self[name]
+        return attr
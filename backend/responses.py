@@ -0,0 +1,47 @@
+"""Fast JSON serialization for responses built from Mongo documents.
+
+Documents read back from `linkpages` were written from validated models, so
+they are serialized directly (orjson when installed) instead of being
+re-validated into `LinkPage` and run through `jsonable_encoder`. orjson
+emits datetimes in the same ISO 8601 form as Pydantic, so the bytes on the
+wire are unchanged.
+"""
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def linkpage_document(document: dict) -> dict:
+    """Strip Mongo's `_id` so a raw linkpages document matches the `LinkPage` schema."""
+    document.pop("_id", None)
+    return document
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
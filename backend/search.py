@@ -0,0 +1,185 @@
+"""In-memory prefix index over page usernames and titles, for autocomplete.
+
+Each indexed string is kept in a sorted Python list as one entry
+`"<normalized key>\\0<username>"`, so a prefix query is a `bisect` to the
+first key starting with the prefix followed by a short forward scan, and the
+index costs two strings per page (the username and the title), which keeps
+a million pages at a few hundred MB. Keys are NFKC-normalized and casefolded.
+Inserting into or removing from the middle of a list moves its tail, which at
+a million entries is still well under a millisecond, and only page writes
+pay for it.
+
+The index is built at startup from a streaming `linkpages` cursor and sorted
+once; writes that arrive while it is being built are replayed on top of it.
+This worker's page endpoints keep it current, and writes from other workers
+are picked up from the change feed by `refresh`.
+"""
+import asyncio
+import logging
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = "\0"
+BUILD_BATCH_SIZE = 1000
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).casefold().replace(SEPARATOR, "").strip()
+
+
+class SortedPrefixes:
+    """Sorted `key\\0value` strings; `match(prefix)` yields values whose key starts with it."""
+
+    def __init__(self, entries: Optional[List[str]] = None):
+        self._entries = entries if entries is not None else []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key: str, value: str):
+        insort(self._entries, f"{key}{SEPARATOR}{value}")
+
+    def remove(self, key: str, value: str):
+        entry = f"{key}{SEPARATOR}{value}"
+        i = bisect_left(self._entries, entry)
+        if i < len(self._entries) and self._entries[i] == entry:
+            del self._entries[i]
+
+    def match(self, prefix: str):
+        entries = self._entries
+        i = bisect_left(entries, prefix)
+        while i < len(entries) and entries[i].startswith(prefix):
+            yield entries[i].split(SEPARATOR, 1)[1]
+            i += 1
+
+
+class PageSearchIndex:
+    def __init__(self, db: Callable):
+        self._db = db
+        self._usernames = SortedPrefixes()
+        self._titles = SortedPrefixes()
+        self._pages: Dict[str, str] = {}  # username -> title
+        self._pending: Optional[List[Tuple[str, Optional[str]]]] = None  # writes made during a build
+        self._task = None
+        self.ready = False
+        self.builds = 0
+        self.queries = 0
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def put(self, username: str, title: str):
+        if self._pending is not None:
+            self._pending.append((username, title))
+        self._put(username, title)
+
+    def remove(self, username: str):
+        if self._pending is not None:
+            self._pending.append((username, None))
+        self._remove(username)
+
+    def _put(self, username: str, title: str):
+        previous = self._pages.get(username)
+        if previous is None:
+            self._usernames.add(normalize(username), username)
+        elif previous == title:
+            return
+        else:
+            self._titles.remove(normalize(previous), username)
+        self._titles.add(normalize(title), username)
+        self._pages[username] = title
+
+    def _remove(self, username: str):
+        title = self._pages.pop(username, None)
+        if title is not None:
+            self._usernames.remove(normalize(username), username)
+            self._titles.remove(normalize(title), username)
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        """Pages whose username, then title, starts with `query`, each page once."""
+        self.queries += 1
+        prefix = normalize(query)
+        if not prefix or limit <= 0:
+            return []
+        results, seen = [], set()
+        for index in (self._usernames, self._titles):
+            for username in index.match(prefix):
+                if username not in seen:
+                    seen.add(username)
+                    results.append({"username": username, "title": self._pages[username]})
+                    if len(results) == limit:
+                        return results
+        return results
+
+    def load(self, pages: Iterable[Tuple[str, str]]):
+        """Replace the contents with `(username, title)` pairs, sorting once."""
+        titles = dict(pages)
+        self._usernames = SortedPrefixes(sorted(f"{normalize(u)}{SEPARATOR}{u}" for u in titles))
+        self._titles = SortedPrefixes(sorted(f"{normalize(t)}{SEPARATOR}{u}" for u, t in titles.items()))
+        self._pages = titles
+
+    async def build(self) -> int:
+        """(Re)build from a streaming `linkpages` cursor; returns the number of pages indexed."""
+        self._pending = []
+        try:
+            cursor = self._db().linkpages.find({}, {"_id": 0, "username": 1, "title": 1}).batch_size(BUILD_BATCH_SIZE)
+            pages = [(page["username"], page.get("title") or "") async for page in cursor]
+            pending, self._pending = self._pending, None
+            self.load(pages)
+            for username, title in pending:
+                if title is None:
+                    self._remove(username)
+                else:
+                    self._put(username, title)
+        finally:
+            self._pending = None
+        self.ready = True
+        self.builds += 1
+        return len(self._pages)
+
+    async def refresh(self, username: str):
+        """Re-read one page after a write made elsewhere."""
+        page = await self._db().linkpages.find_one({"username": username}, {"_id": 0, "title": 1})
+        if page is None:
+            self.remove(username)
+        else:
+            self.put(username, page.get("title") or "")
+
+    async def _build(self):
+        start = time.monotonic()
+        try:
+            indexed = await self.build()
+        except Exception:
+            logger.exception("Failed to build the page search index")
+            return
+        logger.info("Page search index built with %d pages in %.1fs", indexed, time.monotonic() - start)
+
+    def rebuild(self):
+        """Start a build in the background unless one is running."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._build())
+
+    def start(self):
+        self.rebuild()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "pages": len(self._pages),
+            "entries": len(self._usernames) + len(self._titles),
+            "builds": self.builds,
+            "queries": self.queries,
+        }
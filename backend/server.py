@@ -1,36 +1,209 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, status
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
+from starlette.background import BackgroundTask
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 import os
 import logging
+import math
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional
 import uuid
 from datetime import datetime, timedelta
 import jwt
-import bcrypt
-from pymongo import IndexModel
+from pymongo import IndexModel, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from analytics import ClickAnalytics, naive_utc
+from bulk_links import build_links_pipeline
+from cache import LRUCache, PageCache, InMemoryCacheBackend
+from changefeed import ChangeFeed
+from clicks import ClickBuffer
+from counters import LinkCounters
+from hll import SketchStore, days_between, relative_error
+from live import ClickStream, ClickStreamFull
+from metrics import MetricsMiddleware, MongoCommandTimer, registry as metrics
+from mongo import client_options, read_preference
+from conditional import conditional_response, http_date, is_not_modified, page_etag
+from passwords import PasswordHasher, PasswordHasherBusy
+from ratelimit import InMemoryRateLimitBackend, RateLimited, RateLimiter, client_address, parse_networks
+from redirects import LinkDirectory
+from repository import InstrumentedDatabase, QueryProfiler
+from responses import FastJSONResponse, dumps, linkpage_document, loads
+from search import PageSearchIndex
+from snapshots import SnapshotStore, snapshot_etag
+from transfer import COLLECTIONS, export_documents, import_documents, iter_lines
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection (created at startup by connect_mongo, see mongo.py for options;
+# motor is only imported there, so `import server` stays cheap for new workers)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+mongo_options = client_options(os.environ)
+PUBLIC_READ_PREFERENCE = read_preference(
+    os.environ.get("MONGO_PUBLIC_READ_PREFERENCE", "secondaryPreferred"),
+    int(os.environ.get("MONGO_PUBLIC_MAX_STALENESS_SECONDS", "-1")),
+)
+client = None
+db = None
+
+# Query profiling (slow queries by filter shape, hottest usernames / link ids)
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+PROFILER_TOP_K = int(os.environ.get("PROFILER_TOP_K", "100"))
+
+query_profiler = QueryProfiler(slow_ms=SLOW_QUERY_MS, top_k=PROFILER_TOP_K)
+
+def connect_mongo():
+    global client, db
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandTimer(metrics)], **mongo_options)
+    db = InstrumentedDatabase(client[os.environ['DB_NAME']], query_profiler)
+
+# Admin accounts (comma-separated emails)
+ADMIN_EMAILS = {email.strip().lower() for email in os.environ.get("ADMIN_EMAILS", "").split(",") if email.strip()}
 
 # JWT Configuration
 JWT_SECRET = "your-super-secret-jwt-key-change-in-production"
 JWT_ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
+# Public page cache
+PAGE_CACHE_SIZE = int(os.environ.get("PAGE_CACHE_SIZE", "10000"))
+PAGE_CACHE_TTL = float(os.environ.get("PAGE_CACHE_TTL", "60"))
+PAGE_CACHE_SHARED = os.environ.get("PAGE_CACHE_SHARED", "")  # "" or "memory"
+PUBLIC_PAGE_CACHE_CONTROL = os.environ.get("PUBLIC_PAGE_CACHE_CONTROL", "public, max-age=60")
+OWNER_PAGE_CACHE_CONTROL = "private, no-cache"
+
+# Startup work; launcher.py runs init_db once before forking its workers and
+# turns it off for them. PAGE_WARMUP loads the N most clicked public pages
+# (over the last day) into the page cache before a worker takes traffic.
+INIT_DB = os.environ.get("INIT_DB", "on")  # "on" or "off"
+PAGE_WARMUP = int(os.environ.get("PAGE_WARMUP", "0"))
+PAGE_WARMUP_CONCURRENCY = 20
+
+# Static HTML snapshots of public pages, optionally mirrored to a directory
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR") or None
+SNAPSHOT_REDIRECT_BASE = os.environ.get("SNAPSHOT_REDIRECT_BASE", "")  # backend origin, if files are hosted elsewhere
+
+snapshots = SnapshotStore(output_dir=SNAPSHOT_DIR, maxsize=PAGE_CACHE_SIZE, redirect_base=SNAPSHOT_REDIRECT_BASE)
+
+page_cache = PageCache(
+    maxsize=PAGE_CACHE_SIZE,
+    ttl=PAGE_CACHE_TTL,
+    shared=InMemoryCacheBackend() if PAGE_CACHE_SHARED == "memory" else None,
+)
+
+# Invalidation of other workers' caches from the linkpages change stream
+CHANGE_FEED = os.environ.get("CHANGE_FEED", "auto")  # "auto" or "off"
+CHANGE_FEED_POLL_INTERVAL = float(os.environ.get("CHANGE_FEED_POLL_INTERVAL", "1.0"))
+
+change_feed = ChangeFeed(lambda: db, poll_interval=CHANGE_FEED_POLL_INTERVAL)
+
+# Click counting
+CLICK_FLUSH_INTERVAL = float(os.environ.get("CLICK_FLUSH_INTERVAL", "1.0"))
+CLICK_FLUSH_SIZE = int(os.environ.get("CLICK_FLUSH_SIZE", "1000"))
+CLICK_COUNTER_SHARDS = int(os.environ.get("CLICK_COUNTER_SHARDS", "1"))
+CLICK_COUNTER_HOT_THRESHOLD = int(os.environ.get("CLICK_COUNTER_HOT_THRESHOLD", "50"))
+
+link_counters = LinkCounters(lambda: db, shards=CLICK_COUNTER_SHARDS, hot_threshold=CLICK_COUNTER_HOT_THRESHOLD)
+click_buffer = ClickBuffer(
+    lambda: db.link_counters,
+    flush_interval=CLICK_FLUSH_INTERVAL,
+    flush_size=CLICK_FLUSH_SIZE,
+    make_update=link_counters.update,
+)
+
+# Short-link redirects (/r/{link_id}) from an in-memory link id -> URL directory
+REDIRECT_CACHE_SIZE = int(os.environ.get("REDIRECT_CACHE_SIZE", "1000000"))  # links
+REDIRECT_CACHE_TTL = float(os.environ.get("REDIRECT_CACHE_TTL", "3600"))
+REDIRECT_WARM = os.environ.get("REDIRECT_WARM", "on")  # "on" or "off"
+REDIRECT_CACHE_CONTROL = "private, no-store"
+
+link_directory = LinkDirectory(lambda: db, maxsize=REDIRECT_CACHE_SIZE, ttl=REDIRECT_CACHE_TTL)
+
+# Username / title prefix search (/api/search), built in memory at startup
+SEARCH_INDEX = os.environ.get("SEARCH_INDEX", "on")  # "on" or "off"
+SEARCH_MAX_RESULTS = 50
+
+search_index = PageSearchIndex(lambda: db)
+
+# Click analytics (hourly buckets compacted into daily rollups)
+ANALYTICS_HOURLY_RETENTION_DAYS = int(os.environ.get("ANALYTICS_HOURLY_RETENTION_DAYS", "2"))
+ANALYTICS_MAX_RANGE_DAYS = 366
+
+click_analytics = ClickAnalytics(lambda: db, hourly_retention_days=ANALYTICS_HOURLY_RETENTION_DAYS)
+click_buffer.on_flush(click_analytics.record)
+
+async def profile_click_flush(batch, flushed_at):
+    # Counter upserts filter on `_id`, which the profiler can't map to a link.
+    for _, link_id in batch:
+        query_profiler.add_hot("link_ids", link_id)
+
+click_buffer.on_flush(profile_click_flush)
+
+# Unique visitor / clicker sketches (HyperLogLog, one per page per day)
+SKETCH_FLUSH_INTERVAL = float(os.environ.get("SKETCH_FLUSH_INTERVAL", "10"))
+
+page_sketches = SketchStore(lambda: db, flush_interval=SKETCH_FLUSH_INTERVAL)
+
+# Live click deltas for dashboards (Server-Sent Events)
+LIVE_CLICKS_MIN_INTERVAL = float(os.environ.get("LIVE_CLICKS_MIN_INTERVAL", "0.5"))
+LIVE_CLICKS_MAX_STREAMS = int(os.environ.get("LIVE_CLICKS_MAX_STREAMS", "10000"))
+LIVE_TICKET_TTL = int(os.environ.get("LIVE_TICKET_TTL", "30"))  # seconds
+LIVE_TICKET_SCOPE = "live"
+
+click_stream = ClickStream(min_interval=LIVE_CLICKS_MIN_INTERVAL, max_subscribers=LIVE_CLICKS_MAX_STREAMS)
+
+# Password hashing
+PASSWORD_EXECUTOR = os.environ.get("PASSWORD_EXECUTOR", "thread")  # "thread" or "process"
+PASSWORD_WORKERS = int(os.environ.get("PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_MAX_QUEUE = int(os.environ.get("PASSWORD_MAX_QUEUE", "100"))
+
+password_hasher = PasswordHasher(
+    executor=PASSWORD_EXECUTOR,
+    workers=PASSWORD_WORKERS,
+    max_queue=PASSWORD_MAX_QUEUE,
+)
+
+# Authenticated principal cache (user id -> UserResponse)
+PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.environ.get("PRINCIPAL_CACHE_TTL", "30"))
+
+principal_cache = LRUCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+# Rate limits (tokens per second, burst); a rate of 0 disables the limit
+CLICK_IP_RATE = float(os.environ.get("CLICK_IP_RATE", "10"))
+CLICK_IP_BURST = float(os.environ.get("CLICK_IP_BURST", "50"))
+CLICK_LINK_RATE = float(os.environ.get("CLICK_LINK_RATE", "500"))
+CLICK_LINK_BURST = float(os.environ.get("CLICK_LINK_BURST", "2000"))
+AUTH_IP_RATE = float(os.environ.get("AUTH_IP_RATE", "0.5"))
+AUTH_IP_BURST = float(os.environ.get("AUTH_IP_BURST", "10"))
+RATE_LIMIT_SHARED = os.environ.get("RATE_LIMIT_SHARED", "")  # "" or "memory"
+# Proxies whose X-Forwarded-For is believed (comma-separated IPs / CIDRs); empty: use the peer address.
+# Must be set behind a reverse proxy or ingress (see .env), or all clients share the proxy's buckets.
+TRUSTED_PROXIES = parse_networks(os.environ.get("TRUSTED_PROXIES", ""))
+
+rate_limit_backend = InMemoryRateLimitBackend() if RATE_LIMIT_SHARED == "memory" else None
+
+def client_ip(request: Request) -> str:
+    peer = request.client.host if request.client else ""
+    return client_address(peer, request.headers.get("x-forwarded-for"), TRUSTED_PROXIES)
+
+click_ip_limit = RateLimiter("click-ip", CLICK_IP_RATE, CLICK_IP_BURST, client_ip, shared=rate_limit_backend)
+click_link_limit = RateLimiter("click-link", CLICK_LINK_RATE, CLICK_LINK_BURST,
+                               lambda request: request.path_params["link_id"], shared=rate_limit_backend)
+auth_ip_limit = RateLimiter("auth-ip", AUTH_IP_RATE, AUTH_IP_BURST, client_ip, shared=rate_limit_backend)
+rate_limiters = (click_ip_limit, click_link_limit, auth_ip_limit)
+
 # Create the main app
-app = FastAPI()
 api_router = APIRouter(prefix="/api")
+root_router = APIRouter()
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 # Models
 class User(BaseModel):
@@ -69,6 +242,18 @@ class LinkCreate(BaseModel):
     url: str
     icon: Optional[str] = "🔗"
 
+class LinkUpdate(BaseModel):
+    id: str
+    title: Optional[str] = None
+    url: Optional[str] = None
+    icon: Optional[str] = None
+
+class LinkBulkOperations(BaseModel):
+    create: List[LinkCreate] = []
+    update: List[LinkUpdate] = []
+    delete: List[str] = []
+    order: List[str] = []
+
 class LinkPage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
@@ -94,46 +279,170 @@ class LinkPageUpdate(BaseModel):
     theme_font: Optional[str] = None
 
 # Utility Functions
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
-
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    with metrics.timer("jwt_duration_seconds", operation="encode"):
+        return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def create_stream_ticket(user_id: str) -> str:
+    # Only good for opening a live stream, and only for a few seconds
+    expire = datetime.utcnow() + timedelta(seconds=LIVE_TICKET_TTL)
+    payload = {"sub": user_id, "scope": LIVE_TICKET_SCOPE, "exp": expire}
+    with metrics.timer("jwt_duration_seconds", operation="encode"):
+        return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+# Fields needed to identify the caller; never load password_hash here.
+PRINCIPAL_PROJECTION = {"_id": 0, "id": 1, "email": 1, "username": 1, "created_at": 1}
+
+async def authenticate(token: str, scope: Optional[str] = None) -> UserResponse:
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_data = await db.users.find_one({"id": user_id})
-        if not user_data:
-            raise HTTPException(status_code=401, detail="User not found")
-        
-        return User(**user_data)
+        with metrics.timer("jwt_duration_seconds", operation="decode"):
+            payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    user_id = payload.get("sub")
+    # Access tokens carry no scope; scoped tickets are only accepted where asked for
+    if user_id is None or payload.get("scope") != scope:
         raise HTTPException(status_code=401, detail="Invalid token")
+    
+    user = principal_cache.get(user_id)
+    if user is None:
+        user_data = await db.users.find_one({"id": user_id}, PRINCIPAL_PROJECTION)
+        if not user_data:
+            raise HTTPException(status_code=401, detail="User not found")
+        user = UserResponse(**user_data)
+        principal_cache.set(user_id, user)
+    
+    return user
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> UserResponse:
+    return await authenticate(credentials.credentials)
+
+async def get_stream_user(ticket: Optional[str] = None,
+                          credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)) -> UserResponse:
+    # EventSource can't send an Authorization header, so streams also accept a
+    # ?ticket= from POST /api/live/ticket. Never the access token itself:
+    # URLs end up in access logs, proxy logs and browser history.
+    if credentials is not None:
+        return await authenticate(credentials.credentials)
+    if not ticket:
+        raise HTTPException(status_code=403, detail="Not authenticated")
+    return await authenticate(ticket, scope=LIVE_TICKET_SCOPE)
+
+def invalidate_user(user_id: str):
+    # Call after any write to a user record; authenticate() would otherwise
+    # serve the old principal until PRINCIPAL_CACHE_TTL runs out.
+    principal_cache.delete(user_id)
+
+async def invalidate_users(user_ids: List[str]):
+    for user_id in user_ids:
+        invalidate_user(user_id)
+
+async def get_admin_user(current_user: UserResponse = Depends(get_current_user)) -> UserResponse:
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+async def invalidate_linkpage(username: str):
+    await page_cache.invalidate(username)
+    snapshots.invalidate(username)
+    if snapshots.output_dir is not None:
+        snapshots.schedule(snapshots.regenerate(username, load_written_page))
+
+async def on_linkpage_changed(username: Optional[str]):
+    if username is None:
+        page_cache.clear()
+        snapshots.clear()
+        link_directory.clear()
+        if SEARCH_INDEX != "off":
+            search_index.rebuild()
+    else:
+        page_cache.invalidate_local(username)
+        snapshots.invalidate(username)
+        link_directory.drop_page(username)
+        if SEARCH_INDEX != "off":
+            await search_index.refresh(username)
+
+change_feed.on_change(on_linkpage_changed)
+
+async def load_public_page(username: str) -> Optional[dict]:
+    linkpages = db.get_collection("linkpages", read_preference=PUBLIC_READ_PREFERENCE)
+    linkpage_data = await linkpages.find_one({"username": username})
+    if not linkpage_data:
+        return None
+    change_feed.remember(linkpage_data.get("_id"), username)
+    return public_page_entry(linkpage_data)
+
+async def load_written_page(username: str) -> Optional[dict]:
+    # Read back from the primary, bypassing the page cache: right after a
+    # write a lagging secondary may still return the old page.
+    linkpage_data = await db.linkpages.find_one({"username": username})
+    return public_page_entry(linkpage_data) if linkpage_data else None
+
+def public_page_entry(linkpage_data: dict) -> dict:
+    linkpage = linkpage_document(linkpage_data)
+    return {
+        "id": linkpage["id"],
+        "body": dumps(linkpage).decode("utf-8"),
+        "etag": page_etag(linkpage),
+        "last_modified": http_date(linkpage["updated_at"]),
+    }
+
+async def get_public_page(username: str) -> Optional[dict]:
+    return await page_cache.get_or_load(username, lambda: load_public_page(username))
+
+def visitor_id(request: Request) -> str:
+    return f"{client_ip(request)}|{request.headers.get('user-agent', '')}"
+
+async def resolve_link_page(link_id: str) -> Optional[str]:
+    entry = await link_directory.resolve(link_id)
+    return entry[1] if entry is not None else None
+
+async def record_click(page_id: str, link_id: str, visitor: str):
+    await click_buffer.add(page_id, link_id)
+    click_stream.publish(page_id, link_id)
+    page_sketches.add(page_id, "clickers", visitor)
 
 # Database Initialization
 async def init_db():
-    # Create indexes
-    await db.users.create_index([("email", 1)], unique=True)
-    await db.users.create_index([("username", 1)], unique=True)
-    await db.linkpages.create_index([("username", 1)], unique=True)
-    await db.linkpages.create_index([("user_id", 1)])
+    # Create indexes, one createIndexes command per collection, all sent at once
+    # (worker startup used to wait for each round trip in turn)
+    await asyncio.gather(
+        db.users.create_indexes([
+            IndexModel([("id", 1)], unique=True),
+            IndexModel([("email", 1)], unique=True),
+            IndexModel([("username", 1)], unique=True),
+        ]),
+        db.linkpages.create_indexes([
+            IndexModel([("id", 1)], unique=True),
+            IndexModel([("username", 1)], unique=True),
+            IndexModel([("user_id", 1)]),
+            # Multikey index so track_click resolves a link's page without a collection scan
+            IndexModel([("links.id", 1)]),
+        ]),
+        click_analytics.ensure_indexes(),
+        page_sketches.ensure_indexes(),
+        link_counters.ensure_indexes(),
+        change_feed.ensure_indexes(),
+    )
+
+async def warm_public_pages(limit: int) -> int:
+    page_ids = await click_analytics.top_pages(datetime.utcnow() - timedelta(days=1), limit)
+    if not page_ids:
+        return 0
+    cursor = db.linkpages.find({"id": {"$in": page_ids}}, {"_id": 0, "username": 1})
+    usernames = [page["username"] async for page in cursor]
+    for start in range(0, len(usernames), PAGE_WARMUP_CONCURRENCY):
+        await asyncio.gather(*(get_public_page(username) for username in usernames[start:start + PAGE_WARMUP_CONCURRENCY]))
+    return len(usernames)
 
 # Auth Endpoints
-@api_router.post("/signup")
+@api_router.post("/signup", dependencies=[Depends(auth_ip_limit)])
 async def signup(user_data: UserCreate):
     # Check if user exists
     existing_user = await db.users.find_one({"$or": [{"email": user_data.email}, {"username": user_data.username}]})
@@ -141,7 +450,8 @@ async def signup(user_data: UserCreate):
         raise HTTPException(status_code=400, detail="Email or username already exists")
     
     # Create user
-    hashed_password = hash_password(user_data.password)
+    with metrics.timer("bcrypt_duration_seconds", operation="hash"):
+        hashed_password = await password_hasher.hash(user_data.password)
     user = User(
         email=user_data.email,
         username=user_data.username,
@@ -159,11 +469,14 @@ async def signup(user_data: UserCreate):
         "user": UserResponse(**user.dict())
     }
 
-@api_router.post("/login")
+@api_router.post("/login", dependencies=[Depends(auth_ip_limit)])
 async def login(user_data: UserLogin):
     # Find user
     user_doc = await db.users.find_one({"email": user_data.email})
-    if not user_doc or not verify_password(user_data.password, user_doc["password_hash"]):
+    if user_doc:
+        with metrics.timer("bcrypt_duration_seconds", operation="verify"):
+            verified = await password_hasher.verify(user_data.password, user_doc["password_hash"])
+    if not user_doc or not verified:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     user = User(**user_doc)
@@ -176,102 +489,223 @@ async def login(user_data: UserLogin):
     }
 
 @api_router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
-    return UserResponse(**current_user.dict())
+async def get_current_user_info(current_user: UserResponse = Depends(get_current_user)):
+    return current_user
 
 # LinkPage Endpoints
 @api_router.post("/linkpage")
-async def create_linkpage(linkpage_data: LinkPageCreate, current_user: User = Depends(get_current_user)):
-    # Check if user already has a linkpage
-    existing_page = await db.linkpages.find_one({"user_id": current_user.id})
-    if existing_page:
-        # Update existing page instead of creating new one
-        update_data = linkpage_data.dict()
-        update_data["updated_at"] = datetime.utcnow()
-        
-        await db.linkpages.update_one(
+async def create_linkpage(linkpage_data: LinkPageCreate, current_user: UserResponse = Depends(get_current_user)):
+    # Create the page, or update it if the user already has one, in a single upsert
+    fields = linkpage_data.dict()
+    fields["updated_at"] = datetime.utcnow()
+    new_page = LinkPage(user_id=current_user.id, username=current_user.username, **linkpage_data.dict())
+    on_insert = {k: v for k, v in new_page.dict().items() if k not in fields and k != "user_id"}
+    
+    try:
+        linkpage = await db.linkpages.find_one_and_update(
             {"user_id": current_user.id},
-            {"$set": update_data}
+            {"$set": fields, "$setOnInsert": on_insert},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
         )
-        
-        updated_page = await db.linkpages.find_one({"user_id": current_user.id})
-        return LinkPage(**updated_page)
-    
-    linkpage = LinkPage(
-        user_id=current_user.id,
-        username=current_user.username,
-        **linkpage_data.dict()
-    )
+    except DuplicateKeyError:
+        # A concurrent request created the page first; update that one instead
+        linkpage = await db.linkpages.find_one_and_update(
+            {"user_id": current_user.id},
+            {"$set": fields},
+            return_document=ReturnDocument.AFTER,
+        )
+        if not linkpage:
+            raise HTTPException(status_code=500, detail="Error creating link page")
     
-    try:
-        await db.linkpages.insert_one(linkpage.dict())
-        return linkpage
-    except Exception as e:
-        # If duplicate key error, return existing page
-        if "duplicate key error" in str(e):
-            existing_page = await db.linkpages.find_one({"user_id": current_user.id})
-            if existing_page:
-                return LinkPage(**existing_page)
-        raise HTTPException(status_code=500, detail="Error creating link page")
+    search_index.put(current_user.username, linkpage["title"])
+    await invalidate_linkpage(current_user.username)
+    return FastJSONResponse(await link_counters.merge(linkpage_document(linkpage)))
 
 @api_router.get("/linkpage/my")
-async def get_my_linkpage(current_user: User = Depends(get_current_user)):
+async def get_my_linkpage(request: Request, current_user: UserResponse = Depends(get_current_user)):
     linkpage_data = await db.linkpages.find_one({"user_id": current_user.id})
     if not linkpage_data:
         raise HTTPException(status_code=404, detail="Link page not found")
-    return LinkPage(**linkpage_data)
+    linkpage = await link_counters.merge(linkpage_document(linkpage_data))
+    return conditional_response(
+        request, dumps(linkpage), OWNER_PAGE_CACHE_CONTROL,
+        etag=page_etag(linkpage), last_modified=http_date(linkpage["updated_at"]),
+    )
+
+@api_router.get("/analytics")
+async def get_linkpage_analytics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    granularity: str = "day",
+    current_user: UserResponse = Depends(get_current_user),
+):
+    end = naive_utc(end) if end else datetime.utcnow()
+    start = naive_utc(start) if start else end - timedelta(days=7)
+    if granularity not in ("hour", "day"):
+        raise HTTPException(status_code=400, detail="granularity must be 'hour' or 'day'")
+    if start >= end or end - start > timedelta(days=ANALYTICS_MAX_RANGE_DAYS):
+        raise HTTPException(status_code=400, detail="Invalid date range")
+    
+    linkpage = await db.linkpages.find_one({"user_id": current_user.id}, {"_id": 0, "id": 1})
+    if not linkpage:
+        raise HTTPException(status_code=404, detail="Link page not found")
+    
+    links = await click_analytics.query(linkpage["id"], start, end, granularity)
+    return {"start": start, "end": end, "granularity": granularity, "links": links}
+
+@api_router.get("/analytics/uniques")
+async def get_linkpage_uniques(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: UserResponse = Depends(get_current_user),
+):
+    end = naive_utc(end) if end else datetime.utcnow()
+    start = naive_utc(start) if start else end - timedelta(days=7)
+    if start >= end or end - start > timedelta(days=ANALYTICS_MAX_RANGE_DAYS):
+        raise HTTPException(status_code=400, detail="Invalid date range")
+    
+    linkpage = await db.linkpages.find_one({"user_id": current_user.id}, {"_id": 0, "id": 1})
+    if not linkpage:
+        raise HTTPException(status_code=404, detail="Link page not found")
+    
+    days = list(days_between(start, end))
+    return {
+        "start": start,
+        "end": end,
+        "visitors": await page_sketches.count(linkpage["id"], "visitors", days),
+        "clickers": await page_sketches.count(linkpage["id"], "clickers", days),
+        "relative_error": round(relative_error(page_sketches.precision), 4),
+    }
+
+@api_router.post("/live/ticket")
+async def create_linkpage_live_ticket(current_user: UserResponse = Depends(get_current_user)):
+    return {"ticket": create_stream_ticket(current_user.id), "expires_in": LIVE_TICKET_TTL}
+
+@api_router.get("/live")
+async def stream_linkpage_clicks(current_user: UserResponse = Depends(get_stream_user)):
+    linkpage = await db.linkpages.find_one({"user_id": current_user.id}, {"_id": 0, "id": 1})
+    if not linkpage:
+        raise HTTPException(status_code=404, detail="Link page not found")
+    try:
+        subscription = click_stream.subscribe(linkpage["id"])
+    except ClickStreamFull:
+        raise HTTPException(status_code=503, detail="Too many live streams, try again shortly", headers={"Retry-After": "5"})
+    return StreamingResponse(
+        click_stream.events(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @api_router.get("/linkpage/{username}")
-async def get_public_linkpage(username: str):
-    linkpage_data = await db.linkpages.find_one({"username": username})
-    if not linkpage_data:
+async def get_public_linkpage(username: str, request: Request):
+    cached = await get_public_page(username)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Link page not found")
+    page_sketches.add(cached["id"], "visitors", visitor_id(request))
+    return conditional_response(
+        request, cached["body"], PUBLIC_PAGE_CACHE_CONTROL,
+        etag=cached["etag"], last_modified=cached["last_modified"],
+    )
+
+@api_router.get("/linkpage/{username}/snapshot", response_class=HTMLResponse)
+async def get_linkpage_snapshot(username: str, request: Request):
+    cached = await get_public_page(username)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Link page not found")
-    return LinkPage(**linkpage_data)
+    headers = {
+        "ETag": snapshot_etag(cached["etag"]),
+        "Last-Modified": cached["last_modified"],
+        "Cache-Control": PUBLIC_PAGE_CACHE_CONTROL,
+    }
+    if is_not_modified(request, headers["ETag"], headers["Last-Modified"]):
+        return Response(status_code=304, headers=headers)
+    # Possibly from a secondary, so it isn't written to the static file.
+    document = snapshots.get(username, cached["etag"], lambda: loads(cached["body"]), write=False)
+    return HTMLResponse(document, headers=headers)
 
 @api_router.put("/linkpage")
-async def update_linkpage(linkpage_data: LinkPageUpdate, current_user: User = Depends(get_current_user)):
+async def update_linkpage(linkpage_data: LinkPageUpdate, current_user: UserResponse = Depends(get_current_user)):
     update_data = {k: v for k, v in linkpage_data.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
     
-    result = await db.linkpages.update_one(
+    updated_page = await db.linkpages.find_one_and_update(
         {"user_id": current_user.id},
-        {"$set": update_data}
+        {"$set": update_data},
+        return_document=ReturnDocument.AFTER,
     )
-    
-    if result.matched_count == 0:
+    if not updated_page:
         raise HTTPException(status_code=404, detail="Link page not found")
     
-    updated_page = await db.linkpages.find_one({"user_id": current_user.id})
-    return LinkPage(**updated_page)
+    search_index.put(current_user.username, updated_page["title"])
+    await invalidate_linkpage(current_user.username)
+    return FastJSONResponse(await link_counters.merge(linkpage_document(updated_page)))
 
 @api_router.delete("/linkpage")
-async def delete_linkpage(current_user: User = Depends(get_current_user)):
-    result = await db.linkpages.delete_one({"user_id": current_user.id})
-    if result.deleted_count == 0:
+async def delete_linkpage(current_user: UserResponse = Depends(get_current_user)):
+    deleted = await db.linkpages.find_one_and_delete({"user_id": current_user.id}, {"_id": 0, "id": 1})
+    if not deleted:
         raise HTTPException(status_code=404, detail="Link page not found")
+    await link_counters.delete_page(deleted["id"])
+    link_directory.drop_page(current_user.username)
+    search_index.remove(current_user.username)
+    await invalidate_linkpage(current_user.username)
     return {"message": "Link page deleted successfully"}
 
 # Link Management Endpoints
 @api_router.post("/linkpage/links")
-async def add_link(link_data: LinkCreate, current_user: User = Depends(get_current_user)):
-    linkpage = await db.linkpages.find_one({"user_id": current_user.id})
+async def add_link(link_data: LinkCreate, current_user: UserResponse = Depends(get_current_user)):
+    # Appended by the bulk pipeline, which numbers `order` server-side, so
+    # concurrent adds can't both take the same position.
+    new_link = Link(**link_data.dict(), order=0)
+    linkpage = await db.linkpages.find_one_and_update(
+        {"user_id": current_user.id},
+        build_links_pipeline([new_link.dict()], {}, [], [], datetime.utcnow()),
+        projection={"_id": 0, "links": {"$slice": -1}},
+        return_document=ReturnDocument.AFTER,
+    )
     if not linkpage:
         raise HTTPException(status_code=404, detail="Link page not found")
     
-    new_link = Link(**link_data.dict(), order=len(linkpage.get("links", [])))
+    new_link = Link(**linkpage["links"][-1])
+    link_directory.put_link(current_user.username, new_link.id, new_link.url)
+    await invalidate_linkpage(current_user.username)
     
-    await db.linkpages.update_one(
-        {"user_id": current_user.id},
-        {
-            "$push": {"links": new_link.dict()},
-            "$set": {"updated_at": datetime.utcnow()}
-        }
+    return new_link
+
+MAX_BULK_LINK_OPERATIONS = 500
+
+@api_router.post("/linkpage/links/bulk")
+async def bulk_links(operations: LinkBulkOperations, current_user: UserResponse = Depends(get_current_user)):
+    total = len(operations.create) + len(operations.update) + len(operations.delete) + len(operations.order)
+    if total == 0:
+        raise HTTPException(status_code=400, detail="No link operations given")
+    if total > MAX_BULK_LINK_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_LINK_OPERATIONS} link operations per request")
+    
+    created = [Link(**link.dict()).dict() for link in operations.create]
+    updates = {}
+    for link in operations.update:
+        fields = {k: v for k, v in link.dict().items() if k != "id" and v is not None}
+        if fields:
+            updates.setdefault(link.id, {}).update(fields)
+    order = list(dict.fromkeys(operations.order))
+    
+    pipeline = build_links_pipeline(created, updates, operations.delete, order, datetime.utcnow())
+    updated_page = await db.linkpages.find_one_and_update(
+        {"user_id": current_user.id}, pipeline, return_document=ReturnDocument.AFTER,
     )
+    if not updated_page:
+        raise HTTPException(status_code=404, detail="Link page not found")
     
-    return new_link
+    link_directory.put_page(updated_page)
+    remaining = {link["id"] for link in updated_page.get("links", [])}
+    await link_counters.delete_links(updated_page["id"], [i for i in operations.delete if i not in remaining])
+    await invalidate_linkpage(current_user.username)
+    return FastJSONResponse(await link_counters.merge(linkpage_document(updated_page)))
 
 @api_router.put("/linkpage/links/{link_id}")
-async def update_link(link_id: str, link_data: LinkCreate, current_user: User = Depends(get_current_user)):
+async def update_link(link_id: str, link_data: LinkCreate, current_user: UserResponse = Depends(get_current_user)):
     result = await db.linkpages.update_one(
         {"user_id": current_user.id, "links.id": link_id},
         {
@@ -286,56 +720,215 @@ async def update_link(link_id: str, link_data: LinkCreate, current_user: User =
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Link not found")
+    link_directory.put_link(current_user.username, link_id, link_data.url)
+    await invalidate_linkpage(current_user.username)
     
     return {"message": "Link updated successfully"}
 
 @api_router.delete("/linkpage/links/{link_id}")
-async def delete_link(link_id: str, current_user: User = Depends(get_current_user)):
-    result = await db.linkpages.update_one(
-        {"user_id": current_user.id},
+async def delete_link(link_id: str, current_user: UserResponse = Depends(get_current_user)):
+    linkpage = await db.linkpages.find_one_and_update(
+        {"user_id": current_user.id, "links.id": link_id},
         {
             "$pull": {"links": {"id": link_id}},
             "$set": {"updated_at": datetime.utcnow()}
-        }
+        },
+        projection={"_id": 0, "id": 1},
     )
     
-    if result.matched_count == 0:
+    if not linkpage:
         raise HTTPException(status_code=404, detail="Link not found")
+    link_directory.drop_links(current_user.username, [link_id])
+    await link_counters.delete_links(linkpage["id"], [link_id])
+    await invalidate_linkpage(current_user.username)
     
     return {"message": "Link deleted successfully"}
 
-@api_router.post("/linkpage/links/{link_id}/click")
-async def track_click(link_id: str):
-    result = await db.linkpages.update_one(
-        {"links.id": link_id},
-        {"$inc": {"links.$.clicks": 1}}
-    )
-    
-    if result.matched_count == 0:
+@api_router.post("/linkpage/links/{link_id}/click", dependencies=[Depends(click_ip_limit), Depends(click_link_limit)])
+async def track_click(link_id: str, request: Request):
+    page_id = await resolve_link_page(link_id)
+    if page_id is None:
         raise HTTPException(status_code=404, detail="Link not found")
     
+    await record_click(page_id, link_id, visitor_id(request))
+    
     return {"message": "Click tracked"}
 
-# Include router
-app.include_router(api_router)
+# Search Endpoints
+@api_router.get("/search")
+async def search_linkpages(q: str, limit: int = 10):
+    if SEARCH_INDEX == "off":
+        raise HTTPException(status_code=503, detail="Search is disabled")
+    results = search_index.search(q, max(1, min(limit, SEARCH_MAX_RESULTS)))
+    return FastJSONResponse({"query": q, "results": results})
+
+# Admin Endpoints
+@api_router.get("/admin/export/{collection}")
+async def export_collection(collection: str, after: Optional[str] = None, admin: UserResponse = Depends(get_admin_user)):
+    if collection not in COLLECTIONS:
+        raise HTTPException(status_code=404, detail="Unknown collection")
+    return StreamingResponse(export_documents(db, collection, after=after), media_type="application/x-ndjson")
+
+@api_router.post("/admin/import/{collection}")
+async def import_collection(collection: str, request: Request, job: Optional[str] = None, batch_size: int = 1000,
+                            mode: str = "insert", admin: UserResponse = Depends(get_admin_user)):
+    if collection not in COLLECTIONS:
+        raise HTTPException(status_code=404, detail="Unknown collection")
+    if not 1 <= batch_size <= 10000:
+        raise HTTPException(status_code=400, detail="batch_size must be between 1 and 10000")
+    
+    model = {"users": User, "linkpages": LinkPage}[collection]
+    try:
+        stats = await import_documents(db, collection, iter_lines(request.stream()), model,
+                                       job_id=job, batch_size=batch_size, mode=mode,
+                                       on_commit=invalidate_users if collection == "users" else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Imported pages may replace anything this worker has cached.
+    page_cache.clear()
+    link_directory.clear()
+    if collection == "linkpages" and SEARCH_INDEX != "off":
+        search_index.rebuild()
+    return stats
+
+@api_router.get("/admin/profile")
+async def get_query_profile(limit: int = 20, admin: UserResponse = Depends(get_admin_user)):
+    return query_profiler.report(limit=max(1, min(limit, 1000)))
+
+@api_router.delete("/admin/profile")
+async def reset_query_profile(admin: UserResponse = Depends(get_admin_user)):
+    query_profiler.clear()
+    return {"message": "Query profile reset"}
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    return {
+        "linkpages": page_cache.stats(),
+        "clicks": click_buffer.stats(),
+        "passwords": password_hasher.stats(),
+        "principals": principal_cache.stats(),
+        "snapshots": snapshots.stats(),
+        "rate_limits": {limiter.name: limiter.stats() for limiter in rate_limiters},
+        "live_clicks": click_stream.stats(),
+        "change_feed": change_feed.stats(),
+        "redirects": link_directory.stats(),
+        "search": search_index.stats(),
+    }
+
+def collect_cache_gauges():
+    samples = []
+    for name, cache in (("linkpages", page_cache), ("principals", principal_cache), ("links", link_directory)):
+        stats = cache.stats()
+        for key in ("size", "hits", "misses", "evictions", "expirations"):
+            samples.append((f"cache_{key}", (("cache", name),), stats[key]))
+    samples.append(("click_buffer_pending_clicks", (), click_buffer.pending_clicks))
+    samples.append(("password_hasher_waiting", (), password_hasher.stats()["waiting"]))
+    samples.append(("live_click_streams", (), click_stream.stats()["subscribers"]))
+    for limiter in rate_limiters:
+        samples.append(("rate_limited_requests", (("limit", limiter.name),), limiter.limited))
+    return samples
+
+metrics.add_collector(collect_cache_gauges)
+
+@root_router.get("/r/{link_id}", include_in_schema=False)
+async def redirect_link(link_id: str, request: Request):
+    # Answered from the link directory; the click is recorded after the
+    # response is sent. Rate-limited clicks are still redirected, just not
+    # counted, but only to links already in memory: a miss costs a Mongo read.
+    ip_wait = await click_ip_limit.take(request)
+    entry = link_directory.get(link_id) if ip_wait else await link_directory.resolve(link_id)
+    if entry is None:
+        if ip_wait:
+            raise RateLimited(click_ip_limit.name, ip_wait)
+        raise HTTPException(status_code=404, detail="Link not found")
+    url, page_id = entry
+    background = None
+    if not ip_wait and not await click_link_limit.take(request):
+        background = BackgroundTask(record_click, page_id, link_id, visitor_id(request))
+    return RedirectResponse(url, status_code=302, headers={"Cache-Control": REDIRECT_CACHE_CONTROL}, background=background)
+
+@root_router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+async def password_hasher_busy_handler(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many concurrent authentication requests, try again shortly"},
+        headers={"Retry-After": "1"},
+    )
 
-# CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+async def rate_limited_handler(request, exc):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests, try again shortly"},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
 
 # Startup event
-@app.on_event("startup")
 async def startup_event():
-    await init_db()
+    if db is None:
+        connect_mongo()
+    if INIT_DB != "off":
+        await init_db()
+    if PAGE_WARMUP > 0:
+        try:
+            warmed = await warm_public_pages(PAGE_WARMUP)
+            logger.info("Warmed the page cache with %d public pages", warmed)
+        except Exception:
+            logger.exception("Page cache warmup failed")
+    click_buffer.start()
+    click_analytics.start()
+    page_sketches.start()
+    if REDIRECT_WARM != "off":
+        link_directory.start()
+    if SEARCH_INDEX != "off":
+        search_index.start()
+    if CHANGE_FEED != "off":
+        change_feed.start()
 
-@app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    await click_buffer.stop()
+    await click_analytics.stop()
+    await page_sketches.stop()
+    await change_feed.stop()
+    await link_directory.stop()
+    await search_index.stop()
+    password_hasher.shutdown()
+    if client is not None:
+        client.close()
+
+def create_app(database=None) -> FastAPI:
+    """App factory, e.g. `uvicorn --factory server:create_app`.
+
+    Each call builds a new app over this module's routes. The Mongo client,
+    caches and background tasks are per process and shared by every app; the
+    client is created by the startup hook, in the worker process, unless a
+    `database` (Motor or stand-in) is given here.
+    """
+    global db
+    if database is not None:
+        db = InstrumentedDatabase(database, query_profiler)
+    app = FastAPI()
+    app.include_router(api_router)
+    app.include_router(root_router)
+    app.add_exception_handler(PasswordHasherBusy, password_hasher_busy_handler)
+    app.add_exception_handler(RateLimited, rate_limited_handler)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # Added last so it is outermost and times the whole request
+    app.add_middleware(MetricsMiddleware, registry=metrics)
+    app.add_event_handler("startup", startup_event)
+    app.add_event_handler("shutdown", shutdown_db_client)
+    return app
+
+app = create_app()
 
 # Configure logging
 logging.basicConfig(
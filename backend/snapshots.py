@@ -0,0 +1,207 @@
+"""Pre-rendered static HTML snapshots of public link pages.
+
+Each snapshot is a self-contained HTML document (no JS, no API call) rendered
+from the serialized `LinkPage`. Links go through the backend's `/r/{link_id}`
+redirect, prefixed with `SNAPSHOT_REDIRECT_BASE` when the files are hosted on
+another origin, so their clicks are counted. Snapshots are keyed by the page's
+ETag, so a page is only re-rendered after one of its writers changed it. When an output
+directory is configured, the page is re-rendered from the primary after each
+write and written to `<dir>/<username>.html` for static hosting; renders for
+the snapshot endpoint, which may read a secondary, are not written.
+
+    python snapshots.py OUTPUT_DIR    # render every page from MONGO_URL/DB_NAME
+"""
+import asyncio
+import hashlib
+import html
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Callable, Optional
+from urllib.parse import quote, urlsplit
+
+from cache import LRUCache
+from responses import loads
+
+logger = logging.getLogger(__name__)
+
+FONT_STACKS = {
+    "font-sans": "ui-sans-serif, system-ui, -apple-system, 'Segoe UI', Roboto, sans-serif",
+    "font-serif": "ui-serif, Georgia, Cambria, 'Times New Roman', serif",
+    "font-mono": "ui-monospace, SFMono-Regular, Menlo, Consolas, monospace",
+}
+SAFE_URL_SCHEMES = {"http", "https", "mailto", "tel"}
+SAFE_FILENAME = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_.-]*$")
+HEX_COLOR = re.compile(r"^#[0-9A-Fa-f]{3,8}$")
+
+TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<meta name="description" content="{description}">
+<meta name="theme-color" content="{color}">
+<style>
+body{{margin:0;min-height:100vh;background:#f8fafc;font-family:{font};color:#111827}}
+main{{max-width:28rem;margin:0 auto;padding:3rem 1rem;text-align:center}}
+.avatar{{width:5rem;height:5rem;margin:0 auto 1rem;border-radius:50%;background:{color};color:#fff;
+display:flex;align-items:center;justify-content:center;font-size:2rem;font-weight:700}}
+h1{{font-size:1.5rem;margin:0 0 .5rem}}
+p{{color:#4b5563;margin:0 0 2rem}}
+a.link{{display:block;margin:0 0 .75rem;padding:1rem;border-radius:.75rem;background:{color};color:#fff;
+text-decoration:none;font-weight:600}}
+</style>
+</head>
+<body>
+<main>
+<div class="avatar">{initial}</div>
+<h1>{title}</h1>
+<p>{description}</p>
+{links}
+</main>
+</body>
+</html>
+"""
+
+
+def _safe_url(url: str) -> str:
+    scheme = urlsplit(url.strip()).scheme.lower()
+    return url.strip() if scheme in SAFE_URL_SCHEMES else "#"
+
+
+def _link_href(link: dict, redirect_base: str) -> str:
+    # Through /r/ so clicks are counted; unsafe targets aren't linked at all.
+    if _safe_url(link["url"]) == "#":
+        return "#"
+    return f"{redirect_base}/r/{quote(link['id'], safe='')}"
+
+
+def render_linkpage_html(page: dict, redirect_base: str = "") -> str:
+    color = page.get("theme_color") or "#3B82F6"
+    if not HEX_COLOR.match(color):
+        color = "#3B82F6"
+    links = sorted(page.get("links", []), key=lambda link: link.get("order", 0))
+    link_html = "\n".join(
+        '<a class="link" href="{href}" rel="noopener">{icon} {title}</a>'.format(
+            href=html.escape(_link_href(link, redirect_base)),
+            icon=html.escape(link.get("icon") or ""),
+            title=html.escape(link["title"]),
+        )
+        for link in links
+    )
+    title = page.get("title") or page["username"]
+    return TEMPLATE.format(
+        title=html.escape(title),
+        description=html.escape(page.get("description") or ""),
+        color=color,
+        font=FONT_STACKS.get(page.get("theme_font"), FONT_STACKS["font-sans"]),
+        initial=html.escape(title[:1].upper()),
+        links=link_html,
+    )
+
+
+def snapshot_etag(page_etag: str) -> str:
+    return '"' + hashlib.sha1(f"html:{page_etag}".encode()).hexdigest() + '"'
+
+
+class SnapshotStore:
+    def __init__(self, output_dir: Optional[str] = None, maxsize: int = 10000, ttl: float = 3600,
+                 redirect_base: str = ""):
+        self.output_dir = Path(output_dir) if output_dir else None
+        self.redirect_base = redirect_base.rstrip("/")
+        self._snapshots = LRUCache(maxsize=maxsize, ttl=ttl)  # username -> (page etag, html)
+        self.renders = 0
+        self._tasks = set()
+
+    def _path(self, username: str) -> Optional[Path]:
+        if self.output_dir is None or not SAFE_FILENAME.match(username):
+            return None
+        return self.output_dir / f"{username}.html"
+
+    def _write(self, username: str, document: str):
+        path = self._path(username)
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(document, encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _remove(self, username: str):
+        path = self._path(username)
+        if path is not None:
+            path.unlink(missing_ok=True)
+
+    def get(self, username: str, page_etag: str, page: Callable[[], dict], write: bool = True) -> str:
+        """Snapshot for the page with `page_etag`, calling `page()` only to re-render.
+
+        Re-renders are written to the output directory unless `write` is false.
+        """
+        cached = self._snapshots.get(username)
+        if cached is not None and cached[0] == page_etag:
+            return cached[1]
+        document = render_linkpage_html(page(), self.redirect_base)
+        self.renders += 1
+        self._snapshots.set(username, (page_etag, document))
+        if write:
+            self._write(username, document)
+        return document
+
+    def invalidate(self, username: str):
+        self._snapshots.delete(username)
+
+    def clear(self):
+        self._snapshots.clear()
+
+    def schedule(self, coro):
+        """Run a regeneration in the background, keeping a reference until done."""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def regenerate(self, username: str, load_page):
+        """Re-render (or remove) the static file after a writer changed the page.
+
+        `load_page` should read the primary: a file rendered from a lagging
+        secondary would keep the old page until the next write.
+        """
+        try:
+            cached = await load_page(username)
+            if cached is None:
+                self._remove(username)
+            else:
+                self.get(username, cached["etag"], lambda: loads(cached["body"]))
+        except Exception:
+            logger.exception("Failed to regenerate snapshot for %s", username)
+
+    def stats(self):
+        return {
+            "size": len(self._snapshots),
+            "renders": self.renders,
+            "output_dir": str(self.output_dir) if self.output_dir else None,
+        }
+
+
+async def write_all(db, output_dir: str) -> int:
+    from conditional import page_etag
+
+    store = SnapshotStore(output_dir, maxsize=1, redirect_base=os.environ.get("SNAPSHOT_REDIRECT_BASE", ""))
+    count = 0
+    async for page in db.linkpages.find({}, {"_id": 0}):
+        store.get(page["username"], page_etag(page), lambda: page)
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    import sys
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / ".env")
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    written = asyncio.run(write_all(client[os.environ["DB_NAME"]], sys.argv[1]))
+    print(f"Wrote {written} snapshots to {sys.argv[1]}")
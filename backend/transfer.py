@@ -0,0 +1,176 @@
+"""Streaming NDJSON export and import of `users` and `linkpages`.
+
+Export walks an async cursor sorted by `id` and yields one JSON line per
+document, so memory stays bounded by the cursor batch whatever the
+collection size; `after` resumes an interrupted export from the last id
+written.
+
+Import reads lines incrementally, validates each record against the
+collection's model, and writes valid records in unordered `bulk_write`
+batches: plain inserts by default (records whose `id` already exists are
+counted as `existing` through the unique `id` index), or
+`ReplaceOne(..., upsert=True)` keyed by `id` with `mode="replace"` to
+overwrite. Either way re-applying a batch is harmless, so after every
+acknowledged batch the number of input lines consumed is checkpointed in
+`import_checkpoints` under the job id; rerunning the same job skips the lines
+already committed. `on_commit`, if given, receives the ids of each
+acknowledged batch, e.g. to drop cached copies of the records it replaced.
+
+    python transfer.py export linkpages > linkpages.ndjson
+    python transfer.py import linkpages linkpages.ndjson --job linkpages-2026-10
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+from pymongo import InsertOne, ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from responses import dumps, loads
+
+COLLECTIONS = ("users", "linkpages")
+IMPORT_MODES = ("insert", "replace")
+DUPLICATE_KEY = 11000
+MAX_REPORTED_ERRORS = 20
+
+
+async def export_documents(db, collection: str, after: Optional[str] = None,
+                           batch_size: int = 1000) -> AsyncIterator[bytes]:
+    query = {"id": {"$gt": after}} if after else {}
+    cursor = db[collection].find(query, {"_id": 0}).sort("id", 1).batch_size(batch_size)
+    async for document in cursor:
+        yield dumps(document) + b"\n"
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+async def import_documents(db, collection: str, lines: AsyncIterator[bytes], model: Type[BaseModel],
+                           job_id: Optional[str] = None, batch_size: int = 1000, mode: str = "insert",
+                           on_commit: Optional[Callable[[List[str]], Awaitable]] = None) -> dict:
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"mode must be one of {IMPORT_MODES}")
+    checkpoints = db.import_checkpoints
+    resume_from = 0
+    if job_id:
+        checkpoint = await checkpoints.find_one({"_id": job_id})
+        if checkpoint:
+            if checkpoint["collection"] != collection:
+                raise ValueError(f"Job {job_id} was started for {checkpoint['collection']}")
+            resume_from = checkpoint["lines"]
+
+    started = time.perf_counter()
+    stats = {"imported": 0, "existing": 0, "invalid": 0, "skipped": resume_from, "errors": []}
+    batch, batch_ids, line_number = [], [], 0
+
+    async def commit():
+        if batch:
+            try:
+                await db[collection].bulk_write(batch, ordered=False)
+                stats["imported"] += len(batch)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if any(error["code"] != DUPLICATE_KEY for error in errors):
+                    raise
+                stats["imported"] += len(batch) - len(errors)
+                stats["existing"] += len(errors)
+            if on_commit is not None:
+                await on_commit(list(batch_ids))
+            batch.clear()
+            batch_ids.clear()
+        if job_id:
+            await checkpoints.update_one(
+                {"_id": job_id},
+                {"$set": {"collection": collection, "lines": line_number, "updated_at": datetime.utcnow()}},
+                upsert=True,
+            )
+
+    async for line in lines:
+        line_number += 1
+        if line_number <= resume_from or not line.strip():
+            continue
+        try:
+            document = model(**loads(line)).dict()
+        except (ValueError, TypeError, ValidationError) as e:
+            stats["invalid"] += 1
+            if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+                stats["errors"].append({"line": line_number, "error": str(e).splitlines()[0]})
+            continue
+        if mode == "replace":
+            batch.append(ReplaceOne({"id": document["id"]}, document, upsert=True))
+        else:
+            batch.append(InsertOne(document))
+        batch_ids.append(document["id"])
+        if len(batch) >= batch_size:
+            await commit()
+    await commit()
+
+    elapsed = time.perf_counter() - started
+    stats["lines"] = line_number
+    stats["seconds"] = round(elapsed, 3)
+    stats["docs_per_sec"] = round(stats["imported"] / elapsed) if elapsed > 0 else None
+    return stats
+
+
+async def _file_chunks(path: str, size: int = 1 << 16) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def main(argv=None):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_parser = sub.add_parser("export")
+    export_parser.add_argument("collection", choices=COLLECTIONS)
+    export_parser.add_argument("--after", help="resume after this id")
+    import_parser = sub.add_parser("import")
+    import_parser.add_argument("collection", choices=COLLECTIONS)
+    import_parser.add_argument("path")
+    import_parser.add_argument("--job", help="checkpoint id; rerun with the same id to resume")
+    import_parser.add_argument("--batch-size", type=int, default=1000)
+    import_parser.add_argument("--mode", choices=IMPORT_MODES, default="insert")
+    args = parser.parse_args(argv)
+
+    load_dotenv(Path(__file__).parent / ".env")
+    db = AsyncIOMotorClient(os.environ["MONGO_URL"])[os.environ["DB_NAME"]]
+
+    if args.command == "export":
+        started, count = time.perf_counter(), 0
+        async for line in export_documents(db, args.collection, after=args.after):
+            sys.stdout.buffer.write(line)
+            count += 1
+        elapsed = time.perf_counter() - started
+        print(f"Exported {count} {args.collection} in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f} docs/sec)",
+              file=sys.stderr)
+    else:
+        from server import LinkPage, User
+
+        model = {"users": User, "linkpages": LinkPage}[args.collection]
+        stats = await import_documents(db, args.collection, iter_lines(_file_chunks(args.path)), model,
+                                       job_id=args.job, batch_size=args.batch_size, mode=args.mode)
+        print(dumps(stats).decode(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
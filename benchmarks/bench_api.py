@@ -0,0 +1,216 @@
+"""Load test of the API in-process against the local Mongo stand-in.
+
+    python benchmarks/bench_api.py [--users 500] [--concurrency 32] [--requests 2000]
+                                   [--workloads public_views click_storm login_burst dashboard_edits]
+                                   [--output results.json] [--compare baseline.json]
+
+Seeds `--users` users, each with a page of `--links` links, then drives each
+workload with `--concurrency` closed-loop clients and reports requests/sec,
+latency percentiles and status counts as JSON. Page and link choices follow a
+Zipf-like distribution (a few hot pages take most of the traffic) drawn from
+`--seed`, so two runs send the same request sequence. `--compare` prints the
+RPS and p99 change of each workload against an earlier `--output` file.
+
+Login bursts do a real bcrypt verify per request, so they default to
+`--logins` requests rather than `--requests`.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+from itertools import accumulate
+
+from harness import app_client, summarize
+import passwords
+import server
+
+WORKLOADS = ("public_views", "click_storm", "login_burst", "dashboard_edits")
+PASSWORD = "benchmark-password"
+
+
+def skewed_picker(rng, items, exponent=1.1):
+    """Pick items with probability proportional to 1 / rank**exponent."""
+    cumulative = list(accumulate(1 / (rank + 1) ** exponent for rank in range(len(items))))
+    return lambda: rng.choices(items, cum_weights=cumulative)[0]
+
+
+async def seed(users, links, rng):
+    """Insert users and pages directly; every user shares one bcrypt hash."""
+    password_hash = passwords.hash_password(PASSWORD)
+    accounts = []
+    for start in range(0, users, 1000):
+        user_docs, page_docs = [], []
+        for i in range(start, min(users, start + 1000)):
+            user = server.User(
+                id=str(uuid.UUID(int=rng.getrandbits(128))),
+                email=f"user{i}@example.com",
+                username=f"user{i}",
+                password_hash=password_hash,
+            )
+            page = server.LinkPage(
+                id=str(uuid.UUID(int=rng.getrandbits(128))),
+                user_id=user.id,
+                username=user.username,
+                title=f"Page {i}",
+                links=[
+                    server.Link(id=str(uuid.UUID(int=rng.getrandbits(128))), title=f"Link {j}",
+                                url=f"https://example.com/{i}/{j}", order=j)
+                    for j in range(links)
+                ],
+            )
+            user_docs.append(user.dict())
+            page_docs.append(page.dict())
+            accounts.append({
+                "username": user.username,
+                "email": user.email,
+                "headers": {"Authorization": f"Bearer {server.create_access_token({'sub': user.id})}"},
+                "link_ids": [link.id for link in page.links],
+            })
+        await server.db.users.insert_many(user_docs)
+        await server.db.linkpages.insert_many(page_docs)
+    return accounts
+
+
+def request_factories(accounts, rng, clients):
+    """Workload name -> callable returning the next (method, url, kwargs)."""
+    pick_account = skewed_picker(rng, accounts)
+    link_ids = [link_id for account in accounts for link_id in account["link_ids"]]
+    pick_link = skewed_picker(rng, link_ids)
+    # Visitors come from many addresses, so per-IP rate limits apply as in production.
+    addresses = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(clients)]
+
+    def visitor():
+        return {"X-Forwarded-For": rng.choice(addresses)}
+
+    def public_view():
+        return "GET", f"/api/linkpage/{pick_account()['username']}", {"headers": visitor()}
+
+    def click():
+        return "POST", f"/api/linkpage/links/{pick_link()}/click", {"headers": visitor()}
+
+    def login():
+        return "POST", "/api/login", {
+            "headers": visitor(), "json": {"email": pick_account()["email"], "password": PASSWORD},
+        }
+
+    def dashboard_edit():
+        account = pick_account()
+        roll = rng.random()
+        if roll < 0.5:
+            return "GET", "/api/linkpage/my", {"headers": account["headers"]}
+        if roll < 0.75:
+            return "PUT", "/api/linkpage", {
+                "headers": account["headers"], "json": {"description": f"Edited {rng.getrandbits(32):08x}"},
+            }
+        link_id = rng.choice(account["link_ids"])
+        return "PUT", f"/api/linkpage/links/{link_id}", {
+            "headers": account["headers"],
+            "json": {"title": f"Link {rng.getrandbits(16)}", "url": "https://example.com/edited"},
+        }
+
+    return {
+        "public_views": public_view,
+        "click_storm": click,
+        "login_burst": login,
+        "dashboard_edits": dashboard_edit,
+    }
+
+
+async def drive(client, next_request, total, concurrency):
+    """Closed loop: `concurrency` clients each send their next request as soon as the last returns."""
+    # Draw the whole sequence up front so it doesn't depend on scheduling.
+    plan = [next_request() for _ in range(total)]
+    position = iter(plan)
+    samples, statuses = [], {}
+
+    async def worker():
+        for method, url, kwargs in position:
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            samples.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "rps": round(total / elapsed, 1),
+        "latency": summarize(samples),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "started_at": datetime.utcnow().isoformat() + "Z",
+    }
+
+
+def compare(results, baseline):
+    lines = []
+    for name, current in results["workloads"].items():
+        previous = baseline.get("workloads", {}).get(name)
+        if not previous:
+            continue
+        rps = (current["rps"] - previous["rps"]) / previous["rps"] * 100
+        p99 = (current["latency"]["p99_ms"] - previous["latency"]["p99_ms"]) / previous["latency"]["p99_ms"] * 100
+        lines.append(f"{name:16} rps {previous['rps']:>9} -> {current['rps']:>9} ({rps:+.1f}%)   "
+                     f"p99 {previous['latency']['p99_ms']:>8} -> {current['latency']['p99_ms']:>8} ms ({p99:+.1f}%)")
+    return "\n".join(lines)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--links", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=10000, help="distinct client IPs")
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = {
+        "environment": environment(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "workloads": {},
+    }
+    async with app_client() as client:
+        accounts = await seed(args.users, args.links, rng)
+        factories = request_factories(accounts, rng, args.clients)
+        for name in args.workloads:
+            total = args.logins if name == "login_burst" else args.requests
+            results["workloads"][name] = await drive(client, factories[name], total, args.concurrency)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(results, json.load(f)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
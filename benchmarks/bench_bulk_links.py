@@ -0,0 +1,83 @@
+"""50-link import: per-link endpoints vs one POST /api/linkpage/links/bulk.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_bulk_links.py [--links 50] [--rounds 20]
+
+Needs a real MongoDB: it counts the commands the driver sends, and the
+stand-in evaluates pipeline updates in Python. A scratch database is created
+and dropped. Reports wall time per import and Mongo commands per import.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from harness import app_client, signup, summarize
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def new_links(count):
+    return [{"title": f"Link {i}", "url": f"https://example.com/{i}", "icon": "🔗"} for i in range(count)]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--links", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"], event_listeners=[counter])
+    db = client[f"bench_bulk_links_{uuid.uuid4().hex[:8]}"]
+    results = {}
+    try:
+        async with app_client(db) as api:
+            headers = await signup(api, "bulk")
+            await api.post("/api/linkpage", json={"title": "Bulk"}, headers=headers)
+
+            async def reset():
+                await db.linkpages.update_one({"username": "bulk"}, {"$set": {"links": []}})
+
+            async def per_link():
+                for link in new_links(args.links):
+                    (await api.post("/api/linkpage/links", json=link, headers=headers)).raise_for_status()
+
+            async def bulk():
+                response = await api.post("/api/linkpage/links/bulk", json={"create": new_links(args.links)},
+                                          headers=headers)
+                response.raise_for_status()
+
+            for name, run in [("per_link", per_link), ("bulk", bulk)]:
+                samples, commands = [], []
+                for _ in range(args.rounds):
+                    await reset()
+                    before, start = counter.count, time.perf_counter()
+                    await run()
+                    samples.append(time.perf_counter() - start)
+                    commands.append(counter.count - before)
+                page = await db.linkpages.find_one({"username": "bulk"})
+                assert [link["order"] for link in page["links"]] == list(range(args.links))
+                results[name] = {"import": summarize(samples), "mongo_commands": max(commands)}
+    finally:
+        await client.drop_database(db.name)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+"""Per-click cost of track_click's page lookup as the linkpages collection grows.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_click_lookup.py --sizes 1000 10000 100000
+
+Runs against the Mongo at MONGO_URL (a scratch database is created and
+dropped) so the `links.id` / `id` indexes from init_db are exercised; with
+`--stand-in` it runs on mongomock instead, which has no indexes and only
+checks the harness itself. Each click resolves the page cold (the link
+directory is cleared) and flushes its own increment, i.e. the worst case.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+from harness import stand_in_db, summarize
+from motor.motor_asyncio import AsyncIOMotorClient
+import server
+
+
+def make_page(i, links_per_page):
+    page_id = str(uuid.uuid4())
+    return {
+        "id": page_id,
+        "user_id": f"user-{i}",
+        "username": f"user{i}",
+        "title": f"Page {i}",
+        "links": [
+            {"id": str(uuid.uuid4()), "title": f"Link {j}", "url": "https://example.com", "order": j, "clicks": 0}
+            for j in range(links_per_page)
+        ],
+    }
+
+
+async def seed(db, start, stop, links_per_page, link_ids):
+    batch = []
+    for i in range(start, stop):
+        page = make_page(i, links_per_page)
+        link_ids.append(page["links"][-1]["id"])
+        batch.append(page)
+        if len(batch) == 1000:
+            await db.linkpages.insert_many(batch)
+            batch = []
+    if batch:
+        await db.linkpages.insert_many(batch)
+
+
+async def plan_stages(db, link_id):
+    try:
+        explain = await db.command(
+            "explain", {"find": "linkpages", "filter": {"links.id": link_id}}, verbosity="queryPlanner",
+        )
+    except Exception:
+        return None
+    stages, node = [], explain["queryPlanner"]["winningPlan"]
+    while node:
+        stages.append(node["stage"])
+        node = node.get("inputStage")
+    return stages
+
+
+async def measure(link_ids, clicks):
+    samples = []
+    for link_id in random.sample(link_ids, min(clicks, len(link_ids))):
+        server.link_directory.clear()
+        start = time.perf_counter()
+        page_id = await server.resolve_link_page(link_id)
+        await server.click_buffer.add(page_id, link_id)
+        await server.click_buffer.flush()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--links-per-page", type=int, default=5)
+    parser.add_argument("--clicks", type=int, default=500)
+    parser.add_argument("--stand-in", action="store_true")
+    args = parser.parse_args()
+
+    if args.stand_in:
+        db = stand_in_db()
+    else:
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        db = client[f"bench_click_lookup_{uuid.uuid4().hex[:8]}"]
+    server.db = db
+    await server.init_db()
+
+    results, link_ids, seeded = [], [], 0
+    try:
+        for size in sorted(args.sizes):
+            await seed(db, seeded, size, args.links_per_page, link_ids)
+            seeded = size
+            samples = await measure(link_ids, args.clicks)
+            results.append({
+                "pages": size,
+                "plan": await plan_stages(db, link_ids[0]),
+                "per_click": summarize(samples),
+            })
+    finally:
+        if not args.stand_in:
+            await client.drop_database(db.name)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
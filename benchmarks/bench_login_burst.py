@@ -0,0 +1,81 @@
+"""Public page latency while a burst of logins runs concurrently.
+
+    python benchmarks/bench_login_burst.py [--logins 40] [--views 400]
+
+Compares bcrypt on the event loop (the old behaviour) with the thread and
+process executors.
+"""
+import argparse
+import asyncio
+import json
+
+from harness import app_client, signup, summarize
+import passwords
+import server
+
+
+class InlineHasher(passwords.PasswordHasher):
+    """bcrypt called directly inside the handler, blocking the event loop."""
+
+    async def _run(self, func, *args):
+        return func(*args)
+
+
+async def run_scenario(hasher, logins, views):
+    server.password_hasher = hasher
+    async with app_client() as client:
+        headers = await signup(client, "burst")
+        await client.post("/api/linkpage", json={"title": "Burst"}, headers=headers)
+        await client.get("/api/linkpage/burst")
+
+        async def view(scheduled):
+            # Open-loop: latency counts from when the request was due, so time
+            # spent waiting on a blocked event loop is included.
+            await asyncio.sleep(max(0.0, scheduled - loop.time()))
+            response = await client.get("/api/linkpage/burst")
+            response.raise_for_status()
+            return loop.time() - scheduled
+
+        async def login(i):
+            return await client.post("/api/login", headers={"X-Forwarded-For": f"10.0.{i >> 8}.{i & 255}"}, json={
+                "email": "burst@example.com", "password": "benchmark-password",
+            })
+
+        async def paced_views(count, interval=0.002):
+            start = loop.time()
+            return await asyncio.gather(*[view(start + i * interval) for i in range(count)])
+
+        loop = asyncio.get_running_loop()
+        idle = await paced_views(100)
+        login_task = asyncio.gather(*[login(i) for i in range(logins)])
+        busy = await paced_views(views)
+        responses = await login_task
+        statuses = {}
+        for response in responses:
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    hasher.shutdown()
+    return {"idle": summarize(idle), "during_login_burst": summarize(busy), "login_statuses": statuses}
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--views", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=server.PASSWORD_WORKERS)
+    args = parser.parse_args()
+
+    original = server.password_hasher
+    results = {}
+    for name, hasher in [
+        ("inline", InlineHasher(workers=args.workers)),
+        ("thread", passwords.PasswordHasher("thread", workers=args.workers)),
+        ("process", passwords.PasswordHasher("process", workers=args.workers)),
+    ]:
+        results[name] = await run_scenario(hasher, args.logins, args.views)
+    server.password_hasher = original
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
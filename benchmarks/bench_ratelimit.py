@@ -0,0 +1,88 @@
+"""Overhead of the token-bucket rate limiter.
+
+    python benchmarks/bench_ratelimit.py [--keys 1 1000 100000] [--takes 200000] [--clicks 2000]
+
+Reports the cost of one `take` for the in-process buckets and for the
+in-memory shared backend as the number of active keys grows, and the click
+endpoint's latency with the limiters enabled versus disabled.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from harness import app_client, signup, summarize
+from ratelimit import InMemoryRateLimitBackend, TokenBuckets
+import server
+
+
+def bench_local(keys, takes):
+    buckets = TokenBuckets(rate=1e9, burst=1e9, maxsize=max(keys, 1))
+    names = [f"10.0.{i >> 8}.{i & 255}:{i}" for i in range(keys)]
+    sequence = [random.choice(names) for _ in range(takes)]
+    start = time.perf_counter()
+    for key in sequence:
+        buckets.take(key)
+    return (time.perf_counter() - start) / takes * 1e9
+
+
+async def bench_shared(keys, takes):
+    backend = InMemoryRateLimitBackend(maxsize=max(keys, 1))
+    names = [f"10.0.{i >> 8}.{i & 255}:{i}" for i in range(keys)]
+    sequence = [random.choice(names) for _ in range(takes)]
+    start = time.perf_counter()
+    for key in sequence:
+        await backend.take(key, 1e9, 1e9)
+    return (time.perf_counter() - start) / takes * 1e9
+
+
+async def bench_clicks(clicks, enabled):
+    originals = {limiter: limiter.local for limiter in server.rate_limiters}
+    for limiter in server.rate_limiters:
+        limiter.local = TokenBuckets(1e9, 1e9) if enabled else None
+    try:
+        async with app_client() as client:
+            headers = await signup(client, "limits")
+            await client.post("/api/linkpage", json={"title": "Limits"}, headers=headers)
+            link = (await client.post("/api/linkpage/links", json={"title": "A", "url": "https://a.example"},
+                                      headers=headers)).json()
+            samples = []
+            for i in range(clicks):
+                start = time.perf_counter()
+                response = await client.post(f"/api/linkpage/links/{link['id']}/click",
+                                             headers={"X-Forwarded-For": f"10.1.{i >> 8 & 255}.{i & 255}"})
+                samples.append(time.perf_counter() - start)
+                response.raise_for_status()
+    finally:
+        for limiter, local in originals.items():
+            limiter.local = local
+    return summarize(samples)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, nargs="+", default=[1, 1000, 100000])
+    parser.add_argument("--takes", type=int, default=200000)
+    parser.add_argument("--clicks", type=int, default=2000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(json.dumps({
+        "take_ns": [
+            {
+                "keys": keys,
+                "local": round(bench_local(keys, args.takes)),
+                "shared_memory": round(await bench_shared(keys, args.takes)),
+            }
+            for keys in args.keys
+        ],
+        "click_endpoint": {
+            "limits_disabled": await bench_clicks(args.clicks, enabled=False),
+            "limits_enabled": await bench_clicks(args.clicks, enabled=True),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
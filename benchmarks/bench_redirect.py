@@ -0,0 +1,111 @@
+"""Server time of the `/r/{link_id}` short-link redirect.
+
+    python benchmarks/bench_redirect.py [--pages 2000] [--links-per-page 5] [--requests 5000]
+
+Seeds pages on the Mongo stand-in, warms the link directory and drives the
+ASGI app directly, timing each request until its last response body message
+is sent (the click is recorded after that, in a background task). Reports
+hits, misses (directory cleared before each request) and, for comparison,
+the `POST /api/linkpage/links/{id}/click` beacon the frontend used to send
+before navigating.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+from harness import app_client, stand_in_db, summarize
+import server
+
+
+def make_page(i, links_per_page):
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": f"user-{i}",
+        "username": f"user{i}",
+        "title": f"Page {i}",
+        "links": [
+            {"id": str(uuid.uuid4()), "title": f"Link {j}", "url": f"https://example.com/{i}/{j}", "order": j}
+            for j in range(links_per_page)
+        ],
+    }
+
+
+async def server_time(method, path, address):
+    """Seconds from calling the app until the response is complete on the wire."""
+    done = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal done
+        if message["type"] == "http.response.body" and not message.get("more_body") and done is None:
+            done = time.perf_counter()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), (b"x-forwarded-for", address.encode())],
+        "client": (address, 40000), "server": ("bench", 80),
+    }
+    start = time.perf_counter()
+    await server.app(scope, receive, send)
+    return done - start
+
+
+async def drive(method, path_for, link_ids, requests, clear=False):
+    samples = []
+    for i in range(requests):
+        if clear:
+            server.link_directory.clear()
+        address = f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+        samples.append(await server_time(method, path_for(random.choice(link_ids)), address))
+    return summarize(samples)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--links-per-page", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    db = stand_in_db()
+    pages = [make_page(i, args.links_per_page) for i in range(args.pages)]
+    for start in range(0, len(pages), 1000):
+        await db.linkpages.insert_many(pages[start:start + 1000])
+    link_ids = [link["id"] for page in pages for link in page["links"]]
+
+    async with app_client(db):
+        start = time.perf_counter()
+        await server.link_directory.stop()  # time the warm here instead of in the startup task
+        warmed = await server.link_directory.warm()
+        warm_seconds = time.perf_counter() - start
+
+        lookups = random.choices(link_ids, k=100000)
+        start = time.perf_counter()
+        for link_id in lookups:
+            server.link_directory.get(link_id)
+        lookup_ns = (time.perf_counter() - start) / len(lookups) * 1e9
+
+        hits = await drive("GET", lambda link_id: f"/r/{link_id}", link_ids, args.requests)
+        misses = await drive("GET", lambda link_id: f"/r/{link_id}", link_ids, min(args.requests, 500), clear=True)
+        await server.link_directory.warm()
+        beacon = await drive("POST", lambda link_id: f"/api/linkpage/links/{link_id}/click", link_ids, args.requests)
+
+    print(json.dumps({
+        "links": len(link_ids),
+        "warm": {"links": warmed, "seconds": round(warm_seconds, 3)},
+        "directory_get_ns": round(lookup_ns),
+        "redirect_hit": hits,
+        "redirect_miss": misses,
+        "click_beacon": beacon,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""Latency and memory of the username / title prefix index behind /api/search.
+
+    python benchmarks/bench_search.py [--pages 1000000] [--queries 20000]
+
+Loads `--pages` synthetic pages into `server.search_index` (as the startup
+build does after reading the cursor) and reports the load time, the resident
+memory it added, the latency of `search` for random 1-6 character prefixes of
+usernames and titles, the same through `GET /api/search` on the in-process
+app, and the cost of page writes (`put` of a new title, `remove`).
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import time
+
+from harness import app_client, summarize
+import server
+
+WORDS = ("link", "studio", "music", "design", "travel", "coffee", "daily", "photo", "code", "garden", "fitness",
+         "books", "art", "shop", "news", "club", "notes", "lab", "kitchen", "world")
+
+
+def make_pages(count, rng):
+    pages = []
+    for i in range(count):
+        first, second = rng.choice(WORDS), rng.choice(WORDS)
+        pages.append((f"{first}{second}{i}", f"{first.title()} {second.title()} {i}"))
+    return pages
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def prefixes(pages, count, rng):
+    queries = []
+    for _ in range(count):
+        username, title = rng.choice(pages)
+        text = rng.choice((username, title))
+        queries.append(text[:rng.randint(1, 6)])
+    return queries
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--writes", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pages = make_pages(args.pages, rng)
+    index = server.search_index
+    rss_before = max_rss_mb()
+    start = time.perf_counter()
+    index.load(pages)
+    load_seconds = time.perf_counter() - start
+    rss_added = max_rss_mb() - rss_before
+
+    queries = prefixes(pages, args.queries, rng)
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query)
+        samples.append(time.perf_counter() - start)
+    direct = summarize(samples)
+
+    writes = []
+    for username, title in rng.sample(pages, args.writes):
+        start = time.perf_counter()
+        index.put(username, title + " renamed")
+        writes.append(time.perf_counter() - start)
+    removes = []
+    for username, _ in rng.sample(pages, args.writes):
+        start = time.perf_counter()
+        index.remove(username)
+        removes.append(time.perf_counter() - start)
+
+    server.SEARCH_INDEX = "off"  # keep startup from rebuilding over the loaded index
+    async with app_client() as client:
+        server.SEARCH_INDEX = "on"
+        endpoint = []
+        for query in queries[:min(len(queries), 5000)]:
+            start = time.perf_counter()
+            response = await client.get("/api/search", params={"q": query})
+            endpoint.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    print(json.dumps({
+        "pages": args.pages,
+        "load_seconds": round(load_seconds, 2),
+        "rss_added_mb": round(rss_added),
+        "search": direct,
+        "endpoint": summarize(endpoint),
+        "put": summarize(writes),
+        "remove": summarize(removes),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""Serialization cost of a LinkPage response for pages with 10, 100 and 1000 links.
+
+    python benchmarks/bench_serialization.py [--sizes 10 100 1000]
+
+"model" is the previous path: validate the Mongo document into `LinkPage`,
+run it through `jsonable_encoder` and `JSONResponse`. "fast" is the current
+path: strip `_id` and render with `FastJSONResponse`.
+"""
+import argparse
+import json
+import timeit
+import uuid
+from datetime import datetime
+
+import harness  # noqa: F401  (puts backend/ on sys.path)
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from bson import ObjectId
+
+from responses import FastJSONResponse, linkpage_document
+from server import LinkPage
+
+
+def make_document(links):
+    now = datetime.utcnow()
+    return {
+        "_id": ObjectId(),
+        "id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "username": "benchmark",
+        "title": "Benchmark page",
+        "description": "Serialization benchmark",
+        "theme_color": "#3B82F6",
+        "theme_font": "font-sans",
+        "links": [
+            {
+                "id": str(uuid.uuid4()), "title": f"Link {i}", "url": f"https://example.com/{i}",
+                "icon": "🔗", "order": i, "clicks": i * 7, "created_at": now,
+            }
+            for i in range(links)
+        ],
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def model_path(document):
+    return JSONResponse(content=jsonable_encoder(LinkPage(**document))).body
+
+
+def fast_path(document):
+    return FastJSONResponse(content=linkpage_document(dict(document))).body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        document = make_document(size)
+        assert json.loads(model_path(document)) == json.loads(fast_path(document))
+        number = max(1, 20000 // size)
+        row = {"links": size}
+        for name, func in [("model", model_path), ("fast", fast_path)]:
+            best = min(timeit.repeat(lambda: func(document), number=number, repeat=args.repeat))
+            row[f"{name}_us"] = round(best / number * 1e6, 1)
+        row["speedup"] = round(row["model_us"] / row["fast_us"], 1)
+        results.append(row)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Cold start of a backend worker: `import server` and time to first response.
+
+    python benchmarks/bench_startup.py [--runs 5] [--top 15] [--output startup.json] [--compare baseline.json]
+
+Each run is a fresh interpreter started with `-X importtime` that imports
+`server`, then runs the startup hooks against the Mongo stand-in and serves
+one request (the stand-in's own imports are excluded). Reports the median
+import and first-response times and, from the importtime log, the modules
+`server` imports directly with their median cumulative import time, so a new
+heavy dependency shows up by name. `--compare` prints the change of the
+totals and of every module against an earlier `--output` file.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from bench_api import environment
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import server
+imported = time.perf_counter()
+
+import asyncio, httpx
+from mongomock_motor import AsyncMongoMockClient
+
+async def first_response():
+    start = time.perf_counter()
+    app = server.create_app(AsyncMongoMockClient()["startup"])
+    await app.router.startup()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        status = (await client.get("/api/linkpage/nobody")).status_code
+    elapsed = time.perf_counter() - start
+    await app.router.shutdown()
+    return status, elapsed
+
+status, elapsed = asyncio.run(first_response())
+print(json.dumps({"import_seconds": imported - start, "first_response_seconds": elapsed, "status": status}))
+"""
+
+
+def parse_importtime(log):
+    """Cumulative microseconds of each module imported directly by `server`."""
+    modules, depth = {}, None
+    for line in reversed(log.splitlines()):
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        indent = len(name) - len(name.lstrip())
+        if name.strip() == "server":
+            depth = indent
+        elif depth is not None:
+            if indent <= depth:
+                break
+            if indent == depth + 2:
+                modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def run_once():
+    env = dict(os.environ)
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    env.setdefault("DB_NAME", "benchmark_database")
+    env.update(CHANGE_FEED="off", REDIRECT_WARM="off")
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], cwd=BACKEND_DIR, env=env,
+                             capture_output=True, text=True, check=True)
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result["modules"] = parse_importtime(process.stderr)
+    return result
+
+
+def compare(results, baseline):
+    lines = []
+    for key in ("import_ms", "first_response_ms"):
+        previous, current = baseline.get(key), results[key]
+        if previous:
+            lines.append(f"{key:24} {previous:>9} -> {current:>9} ms ({(current - previous) / previous * 100:+.1f}%)")
+    before, after = baseline.get("modules", {}), results["modules"]
+    for name in sorted(set(before) | set(after), key=lambda name: -max(before.get(name, 0), after.get(name, 0))):
+        lines.append(f"  {name:22} {before.get(name, '-'):>9} -> {after.get(name, '-'):>9} ms")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    names = {name for run in runs for name in run["modules"]}
+    modules = {name: round(statistics.median(run["modules"].get(name, 0) for run in runs) / 1000, 1) for name in names}
+    results = {
+        "environment": environment(),
+        "runs": args.runs,
+        "import_ms": round(statistics.median(run["import_seconds"] for run in runs) * 1000, 1),
+        "first_response_ms": round(statistics.median(run["first_response_seconds"] for run in runs) * 1000, 1),
+        "modules": dict(sorted(modules.items(), key=lambda item: -item[1])[:args.top]),
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(results, json.load(f)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Streaming export/import throughput in docs/sec on the local Mongo stand-in.
+
+    python benchmarks/bench_transfer.py [--pages 20000] [--links 5] [--batch-size 1000]
+
+Seeds linkpages, exports them through `export_documents`, imports the NDJSON
+into a fresh database through `import_documents`, and reports docs/sec plus
+the peak Python heap of each phase (tracemalloc).
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from harness import stand_in_db
+from bench_click_lookup import make_page
+import server
+from transfer import export_documents, import_documents, iter_lines
+
+
+async def seed(db, pages, links):
+    for start in range(0, pages, 1000):
+        await db.linkpages.insert_many([make_page(i, links) for i in range(start, min(pages, start + 1000))])
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=20000)
+    parser.add_argument("--links", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    source, target = stand_in_db(), stand_in_db()
+    await seed(source, args.pages, args.links)
+    dump = bytearray()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    async for line in export_documents(source, "linkpages"):
+        dump += line
+    export_seconds = time.perf_counter() - start
+    _, export_peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+
+    async def chunks(size=1 << 16):
+        for i in range(0, len(dump), size):
+            yield bytes(dump[i:i + size])
+
+    start = time.perf_counter()
+    stats = await import_documents(target, "linkpages", iter_lines(chunks()), server.LinkPage,
+                                   job_id="bench", batch_size=args.batch_size)
+    import_seconds = time.perf_counter() - start
+    _, import_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(json.dumps({
+        "documents": args.pages,
+        "ndjson_bytes": len(dump),
+        "export_docs_per_sec": round(args.pages / export_seconds),
+        "import_docs_per_sec": round(stats["imported"] / import_seconds),
+        # Export peak includes the benchmark's own in-memory copy of the dump.
+        "export_peak_heap_mb": round(export_peak / 2**20, 1),
+        "import_peak_heap_mb": round(import_peak / 2**20, 1),
+        "invalid": stats["invalid"],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
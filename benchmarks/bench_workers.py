@@ -0,0 +1,205 @@
+"""Throughput of the pre-fork launcher as the worker count grows.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_workers.py --workers 1 2 4 8
+    python benchmarks/bench_workers.py --stand-in --workers 1 2 4
+
+For each worker count, starts `launcher.py` on a free port, waits for it to
+answer, then drives public page views and short-link redirects over real
+HTTP from `--load-processes` client processes for `--duration` seconds and
+reports requests/sec, latency and the speedup over the first worker count.
+
+Against MONGO_URL a scratch database is seeded (and dropped afterwards) and
+shared by all workers. With `--stand-in` each launch seeds a mongomock
+database before forking, so every worker serves its own copy; only reads
+are driven, so the copies stay identical. The load generators need cores
+too: on a machine with C cores, expect scaling to flatten before C workers.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import httpx
+from harness import BACKEND_DIR, summarize
+
+LAUNCH = """
+import asyncio, json, os, sys
+from datetime import datetime
+import launcher, server
+
+pages = json.loads(sys.stdin.read())
+for page in pages:
+    page["created_at"] = page["updated_at"] = datetime.fromisoformat(page["updated_at"])
+if os.environ.get("BENCH_STAND_IN"):
+    from mongomock_motor import AsyncMongoMockClient
+    db = AsyncMongoMockClient()["bench_workers"]
+    asyncio.run(db.linkpages.insert_many(pages))
+    server.create_app(db)
+sys.exit(launcher.Launcher(int(sys.argv[1]), host="127.0.0.1", port=int(sys.argv[2]), log_level="warning").run())
+"""
+
+
+def make_page(i, links_per_page, now):
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": f"user-{i}",
+        "username": f"user{i}",
+        "title": f"Page {i}",
+        "description": "",
+        "theme_color": "#3B82F6",
+        "theme_font": "font-sans",
+        "links": [
+            {"id": str(uuid.uuid4()), "title": f"Link {j}", "url": f"https://example.com/{i}/{j}", "icon": "🔗",
+             "order": j, "clicks": 0}
+            for j in range(links_per_page)
+        ],
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def launch(workers, pages, stand_in, db_name):
+    port = free_port()
+    env = dict(os.environ, CHANGE_FEED="off", DB_NAME=db_name)
+    # Rate limits would cap a handful of load generator IPs long before the workers do.
+    env.update(CLICK_IP_RATE="0", CLICK_LINK_RATE="0")
+    if stand_in:
+        env["BENCH_STAND_IN"] = "1"
+    process = subprocess.Popen([sys.executable, "-c", LAUNCH, str(workers), str(port)], cwd=BACKEND_DIR, env=env,
+                               stdin=subprocess.PIPE, text=True)
+    process.stdin.write(json.dumps(pages if stand_in else [], default=datetime.isoformat))
+    process.stdin.close()
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/api/linkpage/user0").raise_for_status()
+            return process, port
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.send_signal(signal.SIGTERM)
+    process.wait(timeout=60)
+    raise RuntimeError(f"launcher with {workers} workers did not come up")
+
+
+async def load(port, targets, duration, concurrency, seed):
+    rng = random.Random(seed)
+    samples, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+        stop_at = time.monotonic() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.monotonic() < stop_at:
+                path = rng.choice(targets)
+                start = time.perf_counter()
+                response = await client.get(path, follow_redirects=False)
+                samples.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors += 1
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, errors
+
+
+def load_process(port, targets, duration, concurrency, seed, results):
+    results.put(asyncio.run(load(port, targets, duration, concurrency, seed)))
+
+
+def drive(port, targets, duration, concurrency, processes):
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    per_process = max(1, concurrency // processes)
+    children = [context.Process(target=load_process, args=(port, targets, duration, per_process, i, results))
+                for i in range(processes)]
+    for child in children:
+        child.start()
+    samples, errors = [], 0
+    for _ in children:
+        child_samples, child_errors = results.get()
+        samples.extend(child_samples)
+        errors += child_errors
+    for child in children:
+        child.join()
+    return {
+        "rps": round(len(samples) / duration, 1),
+        "errors": errors,
+        "latency": summarize(samples),
+    }
+
+
+async def seed_mongo(db_name, pages):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    for start in range(0, len(pages), 1000):
+        await client[db_name].linkpages.insert_many([dict(page) for page in pages[start:start + 1000]])
+    client.close()
+
+
+async def drop_mongo(db_name):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    await client.drop_database(db_name)
+    client.close()
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, cores}))
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--links-per-page", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--load-processes", type=int, default=max(1, cores // 2))
+    parser.add_argument("--stand-in", action="store_true")
+    args = parser.parse_args()
+
+    now = datetime.utcnow().replace(microsecond=0)
+    pages = [make_page(i, args.links_per_page, now) for i in range(args.pages)]
+    rng = random.Random(0)
+    targets = [f"/api/linkpage/{page['username']}" for page in rng.sample(pages, min(200, len(pages)))]
+    targets += [f"/r/{link['id']}" for page in rng.sample(pages, min(200, len(pages))) for link in page["links"][:1]]
+
+    db_name = f"bench_workers_{uuid.uuid4().hex[:8]}"
+    if not args.stand_in:
+        asyncio.run(seed_mongo(db_name, pages))
+    results = []
+    try:
+        for workers in args.workers:
+            process, port = launch(workers, pages, args.stand_in, db_name)
+            try:
+                drive(port, targets, min(2.0, args.duration), args.concurrency, args.load_processes)  # warm caches
+                result = drive(port, targets, args.duration, args.concurrency, args.load_processes)
+            finally:
+                process.send_signal(signal.SIGTERM)
+                process.wait(timeout=60)
+            results.append({"workers": workers, **result})
+    finally:
+        if not args.stand_in:
+            asyncio.run(drop_mongo(db_name))
+
+    base = results[0]["rps"] / results[0]["workers"] if results and results[0]["rps"] else None
+    for result in results:
+        if base:
+            result["speedup"] = round(result["rps"] / (base * results[0]["workers"]), 2)
+            result["efficiency"] = round(result["rps"] / (base * result["workers"]), 2)
+    print(json.dumps({"cores": cores, "load_processes": args.load_processes, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
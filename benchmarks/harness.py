@@ -0,0 +1,77 @@
+"""Shared helpers for the benchmarks: an in-process app against a Mongo stand-in."""
+import logging
+import os
+import statistics
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR.parent))  # for tests.pipeline_stand_in
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark_database")
+# httpx.ASGITransport connects as 127.0.0.1; trust it so X-Forwarded-For can simulate many clients.
+os.environ.setdefault("TRUSTED_PROXIES", "127.0.0.1")
+
+import httpx  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+import server  # noqa: E402
+from tests.pipeline_stand_in import PipelineStandIn  # noqa: E402
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def stand_in_db():
+    return PipelineStandIn(AsyncMongoMockClient()[os.environ["DB_NAME"]])
+
+
+@asynccontextmanager
+async def app_client(db=None):
+    """Run the FastAPI app in this event loop with startup/shutdown hooks."""
+    app = server.create_app(db if db is not None else stand_in_db())
+    server.page_cache.clear()
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            yield client
+    finally:
+        await app.router.shutdown()
+
+
+async def signup(client, username, password="benchmark-password"):
+    response = await client.post("/api/signup", json={
+        "email": f"{username}@example.com",
+        "username": username,
+        "password": password,
+    })
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    result = await coro
+    return time.perf_counter() - start, result
+
+
+def summarize(samples):
+    """Latency summary in milliseconds."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0}
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(pct(50), 3),
+        "p95_ms": round(pct(95), 3),
+        "p99_ms": round(pct(99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
@@ -454,18 +454,6 @@ const PublicPage = ({ username }) => {
     }
   };
 
-  const handleLinkClick = async (link) => {
-    // Track click
-    try {
-      await axios.post(`${API}/linkpage/links/${link.id}/click`);
-    } catch (error) {
-      console.error('Error tracking click:', error);
-    }
-    
-    // Open link
-    window.open(link.url, '_blank');
-  };
-
   if (loading) {
     return (
       <div className="min-h-screen flex items-center justify-center bg-gray-50">
@@ -505,9 +493,11 @@ const PublicPage = ({ username }) => {
           
           <div className="space-y-4">
             {linkPage.links.map((link) => (
-              <button
+              <a
                 key={link.id}
-                onClick={() => handleLinkClick(link)}
+                href={`${BACKEND_URL}/r/${link.id}`}
+                target="_blank"
+                rel="noopener noreferrer"
                 className="w-full flex items-center p-4 bg-gray-50 rounded-xl hover:bg-gray-100 transition-colors text-left group"
               >
                 <span className="text-2xl mr-4">{link.icon}</span>
@@ -516,7 +506,7 @@ const PublicPage = ({ username }) => {
                     {link.title}
                   </div>
                 </div>
-              </button>
+              </a>
             ))}
           </div>
           
@@ -0,0 +1,50 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+import server  # noqa: E402
+from repository import InstrumentedDatabase  # noqa: E402
+from tests.pipeline_stand_in import PipelineStandIn  # noqa: E402
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    db = PipelineStandIn(AsyncMongoMockClient()["test_database"])
+    monkeypatch.setattr(server, "db", InstrumentedDatabase(db, server.query_profiler))
+    server.page_cache.clear()
+    server.principal_cache.clear()
+    server.link_directory.clear()
+    server.search_index.load([])
+    server.query_profiler.clear()
+    for limiter in server.rate_limiters:
+        limiter.clear()
+    return db
+
+
+@pytest.fixture
+def api(mock_db):
+    with TestClient(server.app) as client:
+        yield client
+
+
+@pytest.fixture
+def signup(api):
+    def _signup(username="alice"):
+        response = api.post("/api/signup", json={
+            "email": f"{username}@example.com",
+            "username": username,
+            "password": "secret-password",
+        })
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return _signup
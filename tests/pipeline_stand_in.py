@@ -0,0 +1,163 @@
+"""Mongo stand-in that applies update pipelines, for tests and benchmarks.
+
+mongomock accepts update pipelines but evaluates only part of the expression
+language (no `$range`, no array literals), so `PipelineStandIn` wraps a
+stand-in database and its collections apply pipeline updates with
+`apply_pipeline`, a Python evaluator of the subset `bulk_links` builds.
+`test_bulk_links_against_mongodb` checks it against a real server.
+"""
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.results import UpdateResult
+
+
+def _path(value: Any, parts: List[str]) -> Any:
+    for part in parts:
+        if isinstance(value, list):
+            value = [_path(item, [part]) for item in value if isinstance(item, dict)]
+        elif isinstance(value, dict):
+            value = value.get(part)
+        else:
+            return None
+    return value
+
+
+def _truthy(value: Any) -> bool:
+    return not (value is None or value is False or (type(value) in (int, float) and value == 0))
+
+
+def evaluate(expression: Any, document: dict, variables: Optional[Dict[str, Any]] = None) -> Any:
+    """Value of an aggregation expression (the subset these pipelines use) against `document`."""
+    variables = variables or {}
+
+    def ev(expr, scope=variables):
+        return evaluate(expr, document, scope)
+
+    if isinstance(expression, str) and expression.startswith("$$"):
+        name, *parts = expression[2:].split(".")
+        return _path(document if name == "ROOT" else variables[name], parts)
+    if isinstance(expression, str) and expression.startswith("$"):
+        return _path(document, expression[1:].split("."))
+    if isinstance(expression, list):
+        return [ev(item) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    if len(expression) != 1 or not next(iter(expression)).startswith("$"):
+        return {key: ev(value) for key, value in expression.items()}
+
+    (operator, args), = expression.items()
+    if operator == "$literal":
+        return args
+    if operator in ("$filter", "$map"):
+        items = ev(args["input"])
+        if items is None:
+            return None
+        name = args.get("as", "this")
+        if operator == "$filter":
+            return [item for item in items if _truthy(ev(args["cond"], {**variables, name: item}))]
+        return [ev(args["in"], {**variables, name: item}) for item in items]
+    if operator == "$switch":
+        for branch in args["branches"]:
+            if _truthy(ev(branch["case"])):
+                return ev(branch["then"])
+        return ev(args["default"])
+
+    values = ev(args) if isinstance(args, list) else [ev(args)]
+    if operator == "$not":
+        return not _truthy(values[0])
+    if operator == "$eq":
+        return values[0] == values[1]
+    if operator == "$in":
+        if not isinstance(values[1], list):
+            raise ValueError("$in requires an array as a second argument")
+        return values[0] in values[1]
+    if operator == "$size":
+        return len(values[0])
+    if operator == "$arrayElemAt":
+        array, index = values
+        return array[index] if -len(array) <= index < len(array) else None
+    if operator == "$range":
+        return list(range(*values))
+    if operator == "$concatArrays":
+        return None if any(value is None for value in values) else [item for value in values for item in value]
+    if operator == "$mergeObjects":
+        merged = {}
+        for value in values:
+            merged.update(value or {})
+        return merged
+    raise NotImplementedError(f"{operator} is not supported by apply_pipeline")
+
+
+def apply_pipeline(document: dict, stages: List[dict]) -> dict:
+    """`document` after an update pipeline of `$set` / `$addFields` stages on top-level fields."""
+    document = dict(document)
+    for stage in stages:
+        (name, fields), = stage.items()
+        if name not in ("$set", "$addFields"):
+            raise NotImplementedError(f"{name} is not supported by apply_pipeline")
+        values = {field: evaluate(expression, document) for field, expression in fields.items()}
+        document.update(values)
+    return document
+
+
+class PipelineCollection:
+    """Collection proxy applying pipeline updates (lists of stages) with `apply_pipeline`."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    async def _apply(self, filter: dict, pipeline: List[dict]) -> Optional[dict]:
+        document = await self._collection.find_one(filter)
+        if document is None:
+            return None
+        await self._collection.replace_one({"_id": document["_id"]}, apply_pipeline(document, pipeline))
+        return document
+
+    async def update_one(self, filter, update, *args, **kwargs):
+        if not isinstance(update, list):
+            return await self._collection.update_one(filter, update, *args, **kwargs)
+        if kwargs.get("upsert"):
+            raise NotImplementedError("pipeline upserts are not supported by the stand-in")
+        matched = await self._apply(filter, update) is not None
+        return UpdateResult({"n": int(matched), "nModified": int(matched), "ok": 1.0}, True)
+
+    async def find_one_and_update(self, filter, update, projection=None, *args,
+                                  return_document=ReturnDocument.BEFORE, **kwargs):
+        if not isinstance(update, list):
+            return await self._collection.find_one_and_update(filter, update, projection, *args,
+                                                              return_document=return_document, **kwargs)
+        if kwargs.get("upsert") or return_document != ReturnDocument.AFTER:
+            raise NotImplementedError("the stand-in only returns the document after a pipeline update")
+        before = await self._apply(filter, update)
+        if before is None:
+            return None
+        return await self._collection.find_one({"_id": before["_id"]}, projection)
+
+
+class PipelineStandIn:
+    """Stand-in database (e.g. mongomock) whose collections apply pipeline updates in Python."""
+
+    def __init__(self, database):
+        self._database = database
+        self._collections: Dict[str, PipelineCollection] = {}
+
+    def __getitem__(self, name: str) -> PipelineCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = PipelineCollection(self._database[name])
+        return collection
+
+    def get_collection(self, name: str, **options) -> PipelineCollection:
+        return PipelineCollection(self._database.get_collection(name, **options)) if options else self[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attr = getattr(self._database, name)
+        if hasattr(attr, "find_one") and hasattr(attr, "insert_one"):
+            return self[name]
+        return attr
@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from analytics import ClickAnalytics
+
+
+@pytest.fixture
+def analytics():
+    db = AsyncMongoMockClient()["test_database"]
+    return ClickAnalytics(lambda: db, hourly_retention_days=2)
+
+
+def test_query_buckets_by_hour_and_day(analytics):
+    async def run():
+        day = datetime(2026, 3, 1)
+        await analytics.record({("p1", "a"): 2, ("p1", "b"): 1}, day.replace(hour=9, minute=15))
+        await analytics.record({("p1", "a"): 3}, day.replace(hour=9, minute=55))
+        await analytics.record({("p1", "a"): 4}, day.replace(hour=17))
+        await analytics.record({("p2", "c"): 9}, day.replace(hour=17))
+
+        hourly = await analytics.query("p1", day, day + timedelta(days=1), "hour")
+        assert [(link["link_id"], link["total"]) for link in hourly] == [("a", 9), ("b", 1)]
+        assert [(b["bucket"].hour, b["clicks"]) for b in hourly[0]["series"]] == [(9, 5), (17, 4)]
+
+        daily = await analytics.query("p1", day, day + timedelta(days=1), "day")
+        assert daily[0]["series"] == [{"bucket": day, "clicks": 9}]
+
+    asyncio.run(run())
+
+
+def test_compaction_rolls_hourly_into_daily_and_is_idempotent(analytics):
+    async def run():
+        old, recent = datetime(2026, 3, 1), datetime(2026, 3, 5)
+        await analytics.record({("p1", "a"): 2}, old.replace(hour=1))
+        await analytics.record({("p1", "a"): 5}, old.replace(hour=23))
+        await analytics.record({("p1", "a"): 7}, recent.replace(hour=8))
+        now = recent.replace(hour=12)
+
+        assert await analytics.compact(now) == 2
+        assert await analytics.hourly.count_documents({}) == 1
+        rollup = await analytics.daily.find_one({"link_id": "a"})
+        assert rollup["hours"] == {"01": 2, "23": 5}
+
+        # Simulate a run interrupted before the hourly delete: the rollup is rewritten, not doubled.
+        await analytics.hourly.insert_one({"page_id": "p1", "link_id": "a", "hour": old.replace(hour=1), "clicks": 2})
+        assert (await analytics.query("p1", old, now, "day"))[0]["total"] == 14
+        await analytics.compact(now)
+        assert (await analytics.daily.find_one({"link_id": "a"}))["hours"] == {"01": 2, "23": 5}
+
+        days = (await analytics.query("p1", old, now, "day"))[0]["series"]
+        assert [(b["bucket"], b["clicks"]) for b in days] == [(old, 7), (recent, 7)]
+        hours = (await analytics.query("p1", old.replace(hour=12), now, "hour"))[0]["series"]
+        assert [b["clicks"] for b in hours] == [5, 7]
+
+    asyncio.run(run())
+
+
+def test_analytics_endpoint_is_owner_only(api, signup):
+    assert api.get("/api/analytics").status_code == 403
+    headers = signup()
+    assert api.get("/api/analytics", headers=headers).status_code == 404
+    api.post("/api/linkpage", json={"title": "Alice"}, headers=headers)
+    link = api.post("/api/linkpage/links", json={"title": "Site", "url": "https://example.com"}, headers=headers).json()
+    api.post(f"/api/linkpage/links/{link['id']}/click")
+    asyncio.run(server.click_buffer.flush())
+
+    body = api.get("/api/analytics?granularity=hour", headers=headers).json()
+    assert body["links"][0]["link_id"] == link["id"] and body["links"][0]["total"] == 1
+    assert api.get("/api/analytics?granularity=week", headers=headers).status_code == 400
+
+
+def test_user_named_analytics_keeps_a_public_page(api, signup):
+    api.post("/api/linkpage", json={"title": "Stats"}, headers=signup("analytics"))
+    assert api.get("/api/linkpage/analytics").json()["title"] == "Stats"
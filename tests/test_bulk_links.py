@@ -0,0 +1,93 @@
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import ReturnDocument
+
+from bulk_links import build_links_pipeline
+from tests.pipeline_stand_in import PipelineStandIn, apply_pipeline
+
+
+def test_bulk_links_validation(api, signup):
+    headers = signup()
+    assert api.post("/api/linkpage/links/bulk", json={}, headers=headers).status_code == 400
+    too_many = {"delete": [str(i) for i in range(501)]}
+    assert api.post("/api/linkpage/links/bulk", json=too_many, headers=headers).status_code == 400
+    assert api.post("/api/linkpage/links/bulk", json={"delete": ["x"]}).status_code == 403
+
+
+def test_pipeline_renumbers_order_last():
+    pipeline = build_links_pipeline([{"id": "new"}], {"a": {"title": "A"}}, ["b"], ["c"], datetime(2026, 1, 1))
+    assert len(pipeline) == 3
+    assert pipeline[-1]["$set"]["links"]["$map"]["in"]["$mergeObjects"][1] == {"order": "$$i"}
+    assert build_links_pipeline([], {}, [], ["a"], datetime(2026, 1, 1))[0]["$set"]["links"]["$concatArrays"]
+
+
+def test_client_ids_are_literals():
+    page = {"title": "a", "links": [{"id": "a", "title": "A"}, {"id": "b", "title": "B"}]}
+    # As field paths these would resolve to the page title ("a") or to each link's own id.
+    for ids in (["$title"], ["$$l.id"], ["$$ROOT.title"]):
+        pipeline = build_links_pipeline([], {ids[0]: {"title": "X"}}, ids, ids, datetime(2026, 1, 1))
+        links = apply_pipeline(page, pipeline)["links"]
+        assert [(link["id"], link["title"], link["order"]) for link in links] == [("a", "A", 0), ("b", "B", 1)]
+
+
+async def apply_bulk_operations(linkpages):
+    await linkpages.delete_many({})
+    await linkpages.insert_one({"id": "p1", "user_id": "u1", "links": [
+        {"id": i, "title": i.upper(), "url": "https://example.com", "order": n, "clicks": n}
+        for n, i in enumerate(["a", "b", "c", "d"])
+    ]})
+    pipeline = build_links_pipeline(
+        create=[{"id": "e", "title": "E", "url": "https://e.example", "clicks": 0}],
+        update={"a": {"title": "A2"}, "b": {"title": "ignored"}},
+        delete=["b", "zz"],
+        order=["d", "c"],
+        now=datetime(2026, 1, 1),
+    )
+    return await linkpages.find_one_and_update({"user_id": "u1"}, pipeline, return_document=ReturnDocument.AFTER)
+
+
+def assert_bulk_operations_applied(page):
+    assert [(link["id"], link["order"]) for link in page["links"]] == [("d", 0), ("c", 1), ("a", 2), ("e", 3)]
+    assert page["links"][2]["title"] == "A2" and page["links"][2]["clicks"] == 0
+    assert page["updated_at"] == datetime(2026, 1, 1)
+
+
+def test_bulk_links_on_stand_in():
+    linkpages = PipelineStandIn(AsyncMongoMockClient()["test_bulk_links"]).linkpages
+    assert_bulk_operations_applied(asyncio.run(apply_bulk_operations(linkpages)))
+
+
+# Checks the stand-in's evaluation against MongoDB itself.
+@pytest.mark.skipif(not os.environ.get("TEST_MONGO_URL"), reason="needs a real MongoDB (TEST_MONGO_URL)")
+def test_bulk_links_against_mongodb():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def run():
+        client = AsyncIOMotorClient(os.environ["TEST_MONGO_URL"])
+        try:
+            return await apply_bulk_operations(client["test_bulk_links"].linkpages)
+        finally:
+            await client.drop_database("test_bulk_links")
+
+    assert_bulk_operations_applied(asyncio.run(run()))
+
+
+def test_bulk_links_endpoint(api, signup):
+    headers = signup()
+    api.post("/api/linkpage", json={"title": "Alice"}, headers=headers)
+    ids = [api.post("/api/linkpage/links", json={"title": t, "url": f"https://{t}.example"}, headers=headers).json()["id"]
+           for t in ("a", "b", "c")]
+
+    page = api.post("/api/linkpage/links/bulk", headers=headers, json={
+        "create": [{"title": "d", "url": "https://d.example"}],
+        "update": [{"id": ids[0], "title": "A"}],
+        "delete": [ids[1]],
+        "order": [ids[2]],
+    }).json()
+    assert [(link["title"], link["order"]) for link in page["links"]] == [("c", 0), ("A", 1), ("d", 2)]
+    assert api.get("/api/linkpage/my", headers=headers).json()["links"] == page["links"]
@@ -0,0 +1,90 @@
+import asyncio
+
+import server
+from cache import LRUCache, PageCache, InMemoryCacheBackend
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_expires_entries():
+    cache = LRUCache(maxsize=10, ttl=-1)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_page_cache_single_flight_and_shared_tier():
+    async def run():
+        shared = InMemoryCacheBackend()
+        cache = PageCache(maxsize=10, ttl=60, shared=shared)
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"username": "alice"}
+
+        results = await asyncio.gather(*[cache.get_or_load("alice", loader) for _ in range(5)])
+        assert results == [{"username": "alice"}] * 5
+        assert len(calls) == 1
+
+        # A second worker sharing the same backend is served from the shared tier.
+        other = PageCache(maxsize=10, ttl=60, shared=shared)
+        assert await other.get_or_load("alice", loader) == {"username": "alice"}
+        assert other.shared_hits == 1 and len(calls) == 1
+
+        await cache.invalidate("alice")
+        assert await other.shared.get("linkpage:alice") is None
+
+    asyncio.run(run())
+
+
+def test_public_page_is_cached_and_invalidated_by_writers(api, signup):
+    headers = signup()
+    assert api.post("/api/linkpage", json={"title": "Alice"}, headers=headers).status_code == 200
+
+    before = api.get("/api/cache/stats").json()["linkpages"]  # counters run across tests
+    assert api.get("/api/linkpage/alice").json()["title"] == "Alice"
+    assert api.get("/api/linkpage/alice").json()["title"] == "Alice"
+    stats = api.get("/api/cache/stats").json()["linkpages"]
+    assert stats["hits"] - before["hits"] == 1 and stats["loads"] - before["loads"] == 1
+
+    api.post("/api/linkpage/links", json={"title": "Site", "url": "https://example.com"}, headers=headers)
+    assert [link["title"] for link in api.get("/api/linkpage/alice").json()["links"]] == ["Site"]
+
+    api.put("/api/linkpage", json={"title": "Alice B"}, headers=headers)
+    assert api.get("/api/linkpage/alice").json()["title"] == "Alice B"
+
+    api.delete("/api/linkpage", headers=headers)
+    assert api.get("/api/linkpage/alice").status_code == 404
+
+
+def test_principal_is_cached_between_requests(api, signup, mock_db):
+    headers = signup()
+    assert api.get("/api/me", headers=headers).json()["username"] == "alice"
+
+    # Served from the principal cache; the user row is not read again.
+    asyncio.run(mock_db.users.update_one({"username": "alice"}, {"$set": {"email": "changed@example.com"}}))
+    assert api.get("/api/me", headers=headers).json()["email"] == "alice@example.com"
+
+    user_id = api.get("/api/me", headers=headers).json()["id"]
+    server.invalidate_user(user_id)
+    me = api.get("/api/me", headers=headers).json()
+    assert me["email"] == "changed@example.com"
+    assert "password_hash" not in me
+
+
+def test_unknown_or_bad_token_is_rejected(api, mock_db):
+    assert api.get("/api/me", headers={"Authorization": "Bearer not-a-jwt"}).status_code == 401
+    token = server.create_access_token({"sub": "no-such-user"})
+    response = api.get("/api/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401 and response.json()["detail"] == "User not found"
@@ -0,0 +1,185 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import server
+from changefeed import ChangeFeed, is_click_only
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import OperationFailure
+
+
+def test_click_only_updates_are_ignored():
+    assert is_click_only({"operationType": "update", "updateDescription": {"updatedFields": {"links.2.clicks": 9}}})
+    assert not is_click_only({"operationType": "update", "updateDescription": {
+        "updatedFields": {"links.2.clicks": 9, "title": "New"},
+    }})
+    assert not is_click_only({"operationType": "update", "updateDescription": {
+        "updatedFields": {"updated_at": 1}, "removedFields": [],
+    }})
+    assert not is_click_only({"operationType": "delete"})
+
+
+class FakeStream:
+    def __init__(self, changes, error=None):
+        self.changes = changes
+        self.error = error
+        self.resume_token = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.error is not None:
+            raise self.error
+        if not self.changes:
+            await asyncio.sleep(3600)
+        change = self.changes.pop(0)
+        self.resume_token = change["_id"]
+        return change
+
+
+class FakeDatabase:
+    def __init__(self, streams):
+        self.state_db = AsyncMongoMockClient()["feed"]
+        self.streams = streams
+        self.resumed_after = []
+        self.watch_options = []
+        self.linkpages = self
+
+    @property
+    def change_feed_state(self):
+        return self.state_db.change_feed_state
+
+    def watch(self, full_document=None, resume_after=None, **options):
+        self.resumed_after.append(resume_after)
+        self.watch_options.append(options)
+        return self.streams.pop(0)
+
+
+def test_change_stream_dispatches_and_checkpoints_resume_token():
+    async def run():
+        changes = [
+            {"_id": {"_data": "1"}, "operationType": "update", "documentKey": {"_id": 1},
+             "fullDocument": {"username": "alice"}, "updateDescription": {"updatedFields": {"title": "A"}}},
+            {"_id": {"_data": "2"}, "operationType": "update", "documentKey": {"_id": 2},
+             "fullDocument": {"username": "bob"}, "updateDescription": {"updatedFields": {"links.0.clicks": 3}}},
+            # Deletes resolve from a learned _id, from the pre-image, or not at all.
+            {"_id": {"_data": "3"}, "operationType": "delete", "documentKey": {"_id": 1}},
+            {"_id": {"_data": "4"}, "operationType": "delete", "documentKey": {"_id": 3},
+             "fullDocumentBeforeChange": {"username": "carol"}},
+            {"_id": {"_data": "5"}, "operationType": "delete", "documentKey": {"_id": 9}},
+        ]
+        db = FakeDatabase([FakeStream(changes)])
+        feed = ChangeFeed(lambda: db, checkpoint_interval=0)
+        seen = []
+
+        async def listener(username):
+            seen.append(username)
+        feed.on_change(listener)
+
+        feed.start()
+        for _ in range(100):
+            if len(seen) == 4:
+                break
+            await asyncio.sleep(0.01)
+        await feed.stop()
+        assert seen == ["alice", "alice", "carol", None] and feed.mode == "change_stream"
+        assert db.watch_options == [{"full_document_before_change": "whenAvailable"}]
+
+        # A restarted worker resumes after the last checkpointed event, and a
+        # stale token makes it drop its caches and start over from now.
+        stale = OperationFailure("resume point no longer in oplog", code=286)
+        db.streams = [FakeStream([], error=stale), FakeStream([])]
+        restarted = ChangeFeed(lambda: db)
+        restarted.on_change(listener)
+        restarted.start()
+        for _ in range(100):
+            if len(db.resumed_after) == 3:
+                break
+            await asyncio.sleep(0.01)
+        await restarted.stop()
+        assert db.resumed_after == [None, {"_data": "5"}, None]
+        assert seen[-1] is None and restarted.errors == 0
+
+    asyncio.run(run())
+
+
+def test_servers_without_pre_images_are_watched_without_them():
+    async def run():
+        unknown = OperationFailure("unknown field fullDocumentBeforeChange", code=40415)
+        db = FakeDatabase([FakeStream([], error=unknown), FakeStream([])])
+        feed = ChangeFeed(lambda: db, retry_interval=0)
+        feed.start()
+        for _ in range(100):
+            if len(db.watch_options) == 2:
+                break
+            await asyncio.sleep(0.01)
+        await feed.stop()
+        assert db.watch_options == [{"full_document_before_change": "whenAvailable"}, {}]
+        assert feed.mode == "change_stream" and feed.errors == 0
+
+    asyncio.run(run())
+
+
+def test_polling_fallback_sees_writes_from_skewed_clocks():
+    async def run():
+        db = AsyncMongoMockClient()["feed"]
+        feed = ChangeFeed(lambda: db, poll_interval=0.01, poll_lookback=2)
+        seen = []
+
+        async def listener(username):
+            seen.append(username)
+        feed.on_change(listener)
+
+        feed.start()
+        await asyncio.sleep(0.05)
+        assert feed.mode == "polling"
+        now = datetime.utcnow()
+        await db.linkpages.insert_one({"username": "alice", "updated_at": now})
+        # Written by a worker whose clock runs a second behind.
+        await db.linkpages.insert_one({"username": "bob", "updated_at": now - timedelta(seconds=1)})
+        await asyncio.sleep(0.1)
+        await db.linkpages.update_one({"username": "alice"}, {"$set": {"updated_at": now + timedelta(seconds=1)}})
+        await asyncio.sleep(0.1)
+        await feed.stop()
+        assert seen == ["bob", "alice", "alice"]
+
+    asyncio.run(run())
+
+
+def test_write_from_another_worker_invalidates_cached_page(api, signup, mock_db, monkeypatch):
+    monkeypatch.setattr(server.change_feed, "poll_interval", 0.01)
+    headers = signup()
+    api.post("/api/linkpage", json={"title": "Alice"}, headers=headers)
+    assert api.get("/api/linkpage/alice").json()["title"] == "Alice"
+
+    # Another worker's write: nothing in this process invalidated the page.
+    asyncio.run(mock_db.linkpages.update_one(
+        {"username": "alice"}, {"$set": {"title": "Elsewhere", "updated_at": datetime.utcnow()}},
+    ))
+    deadline = time.monotonic() + 2
+    while api.get("/api/linkpage/alice").json()["title"] != "Elsewhere":
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+def test_deleting_a_served_page_invalidates_only_that_page(api, signup, mock_db):
+    for name in ("alice", "bob"):
+        api.post("/api/linkpage", json={"title": name.title()}, headers=signup(name))
+        api.get(f"/api/linkpage/{name}")  # remembers the page's _id
+    bob = asyncio.run(mock_db.linkpages.find_one({"username": "bob"}))
+    asyncio.run(mock_db.linkpages.delete_one({"_id": bob["_id"]}))
+    builds = server.search_index.builds
+
+    username = server.change_feed.username_of({"operationType": "delete", "documentKey": {"_id": bob["_id"]}})
+    assert username == "bob"
+    asyncio.run(server.on_linkpage_changed(username))
+    assert server.search_index.builds == builds
+    assert [hit["username"] for hit in server.search_index.search("b")] == []
+    assert server.page_cache.local.get("alice") is not None
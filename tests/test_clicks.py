@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from clicks import ClickBuffer
+
+
+@pytest.fixture
+def linkpages():
+    return AsyncMongoMockClient()["test_database"].linkpages
+
+
+async def seed(linkpages, link_ids=("a", "b")):
+    await linkpages.insert_one({"id": "p1", "links": [{"id": link_id, "clicks": 0} for link_id in link_ids]})
+
+
+async def clicks(linkpages):
+    page = await linkpages.find_one({"id": "p1"})
+    return {link["id"]: link["clicks"] for link in page["links"]}
+
+
+def test_flush_batches_increments(linkpages):
+    async def run():
+        await seed(linkpages)
+        buffer = ClickBuffer(lambda: linkpages, flush_size=100)
+        for _ in range(7):
+            await buffer.add("p1", "a")
+        await buffer.add("p1", "b", 3)
+        assert buffer.pending_clicks == 10 and await clicks(linkpages) == {"a": 0, "b": 0}
+        assert await buffer.flush() == 10
+        assert await clicks(linkpages) == {"a": 7, "b": 3}
+        assert buffer.stats()["flushes"] == 1
+
+    asyncio.run(run())
+
+
+def test_flush_interval_and_graceful_stop(linkpages):
+    async def run():
+        await seed(linkpages)
+        buffer = ClickBuffer(lambda: linkpages, flush_interval=0.01, flush_size=100)
+        buffer.start()
+        await buffer.add("p1", "a")
+        await asyncio.sleep(0.05)
+        assert (await clicks(linkpages))["a"] == 1
+        await buffer.add("p1", "b", 2)
+        await buffer.stop()
+        assert await clicks(linkpages) == {"a": 1, "b": 2}
+
+    asyncio.run(run())
+
+
+def test_unflushed_clicks_are_bounded(linkpages):
+    class SlowCollection:
+        async def bulk_write(self, operations, ordered):
+            await asyncio.sleep(0.01)
+            return await linkpages.bulk_write(operations, ordered=ordered)
+
+    async def run():
+        await seed(linkpages)
+        buffer = ClickBuffer(lambda: SlowCollection(), flush_size=5)
+        await asyncio.gather(*[buffer.add("p1", "a") for _ in range(200)])
+        # Lost on a crash = everything not yet acknowledged by Mongo.
+        assert buffer.pending_clicks <= buffer.flush_size
+        assert 200 - (await clicks(linkpages))["a"] <= 2 * buffer.flush_size
+        await buffer.stop()
+        assert (await clicks(linkpages))["a"] == 200
+
+    asyncio.run(run())
+
+
+def test_failed_flush_is_retried(linkpages):
+    class FlakyCollection:
+        failures = 1
+
+        async def bulk_write(self, operations, ordered):
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("mongo unavailable")
+            return await linkpages.bulk_write(operations, ordered=ordered)
+
+    async def run():
+        await seed(linkpages)
+        collection = FlakyCollection()
+        buffer = ClickBuffer(lambda: collection)
+        await buffer.add("p1", "a", 4)
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+        assert buffer.pending_clicks == 4
+        await buffer.flush()
+        assert (await clicks(linkpages))["a"] == 4
+
+    asyncio.run(run())
+
+
+def test_track_click_endpoint_is_buffered(mock_db):
+    with TestClient(server.app) as api:
+        token = api.post("/api/signup", json={
+            "email": "alice@example.com", "username": "alice", "password": "secret-password",
+        }).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        api.post("/api/linkpage", json={"title": "Alice"}, headers=headers)
+        link = api.post("/api/linkpage/links", json={"title": "Site", "url": "https://example.com"},
+                        headers=headers).json()
+
+        for _ in range(3):
+            assert api.post(f"/api/linkpage/links/{link['id']}/click").status_code == 200
+        assert api.post("/api/linkpage/links/missing/click").status_code == 404
+        assert api.get("/api/cache/stats").json()["clicks"]["pending_clicks"] == 3
+
+    # The shutdown hook flushed the buffer, to the counters rather than the page.
+    page = asyncio.run(mock_db.linkpages.find_one({"username": "alice"}))
+    assert page["links"][0]["clicks"] == 0
+    counter = asyncio.run(mock_db.link_counters.find_one({"link_id": link["id"]}))
+    assert counter["clicks"] == 3 and counter["page_id"] == page["id"]
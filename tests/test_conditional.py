@@ -0,0 +1,36 @@
+def create_page(api, signup):
+    headers = signup()
+    api.post("/api/linkpage", json={"title": "Alice"}, headers=headers)
+    return headers
+
+
+def test_public_page_revalidates_with_etag(api, signup):
+    headers = create_page(api, signup)
+    first = api.get("/api/linkpage/alice")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "public, max-age=60"
+    assert first.headers["last-modified"].endswith("GMT")
+
+    not_modified = api.get("/api/linkpage/alice", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+
+    api.put("/api/linkpage", json={"title": "Alice B"}, headers=headers)
+    changed = api.get("/api/linkpage/alice", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+
+
+def test_if_modified_since(api, signup):
+    create_page(api, signup)
+    last_modified = api.get("/api/linkpage/alice").headers["last-modified"]
+    assert api.get("/api/linkpage/alice", headers={"If-Modified-Since": last_modified}).status_code == 304
+    old = "Mon, 01 Jan 2001 00:00:00 GMT"
+    assert api.get("/api/linkpage/alice", headers={"If-Modified-Since": old}).status_code == 200
+
+
+def test_owner_page_is_private_and_conditional(api, signup):
+    headers = create_page(api, signup)
+    first = api.get("/api/linkpage/my", headers=headers)
+    assert first.headers["cache-control"] == "private, no-cache"
+    revalidated = api.get("/api/linkpage/my", headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert revalidated.status_code == 304
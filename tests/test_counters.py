@@ -0,0 +1,95 @@
+import asyncio
+
+import server
+from clicks import ClickBuffer
+from counters import LinkCounters
+from mongomock_motor import AsyncMongoMockClient
+
+
+def test_hot_links_are_spread_over_shards_and_merged():
+    async def run():
+        db = AsyncMongoMockClient()["counters"]
+        counters = LinkCounters(lambda: db, shards=4, hot_threshold=10)
+        buffer = ClickBuffer(lambda: db.link_counters, make_update=counters.update)
+        for _ in range(20):
+            await buffer.add("p1", "hot", 10)
+            await buffer.add("p1", "cold", 1)
+            await buffer.flush()
+
+        assert {c["shard"] async for c in db.link_counters.find({"link_id": "hot"})} > {0}
+        assert await db.link_counters.count_documents({"link_id": "cold"}) == 1
+        page = {"id": "p1", "links": [{"id": "hot", "clicks": 5}, {"id": "cold"}, {"id": "new"}]}
+        await counters.merge(page)
+        assert [link["clicks"] for link in page["links"]] == [205, 20, 0]
+
+        await counters.delete_links("p2", ["hot"])  # another page's id: nothing to delete
+        await counters.delete_links("p1", ["hot"])
+        assert await counters.totals("p1") == {"cold": 20}
+
+    asyncio.run(run())
+
+
+def test_migration_moves_embedded_counts_once():
+    async def run():
+        db = AsyncMongoMockClient()["counters"]
+        counters = LinkCounters(lambda: db)
+        await db.linkpages.insert_many([
+            {"id": "p1", "links": [{"id": "a", "clicks": 7}, {"id": "b", "clicks": 0}]},
+            {"id": "p2", "links": [{"id": "c", "clicks": 2}]},
+        ])
+        await db.link_counters.insert_one({"_id": "a:0", "link_id": "a", "page_id": "p1", "shard": 0, "clicks": 1})
+
+        assert await counters.migrate(batch_size=1) == 2
+        # Simulate a crash before the embedded counts were zeroed, then rerun.
+        await db.linkpages.update_one({"id": "p2"}, {"$set": {"links.0.clicks": 2}})
+        assert await counters.migrate() == 1
+
+        assert await counters.totals("p1") == {"a": 8}
+        assert await counters.totals("p2") == {"c": 2}
+        page = await db.linkpages.find_one({"id": "p1"}, {"_id": 0})
+        assert [link["clicks"] for link in (await counters.merge(page))["links"]] == [8, 0]
+
+    asyncio.run(run())
+
+
+def test_owner_page_includes_counter_clicks(api, signup):
+    headers = signup()
+    api.post("/api/linkpage", json={"title": "Alice"}, headers=headers)
+    link = api.post("/api/linkpage/links", json={"title": "A", "url": "https://a.example"}, headers=headers).json()
+    first = api.get("/api/linkpage/my", headers=headers)
+    for _ in range(2):
+        api.post(f"/api/linkpage/links/{link['id']}/click")
+    asyncio.run(server.click_buffer.flush())
+
+    page = api.get("/api/linkpage/my", headers=headers)
+    assert page.json()["links"][0]["clicks"] == 2
+    assert page.headers["etag"] != first.headers["etag"]
+
+
+def test_deleting_another_users_link_id_keeps_its_clicks(api, signup):
+    alice, bob = signup("alice"), signup("bob")
+    for headers, title in ((alice, "Alice"), (bob, "Bob")):
+        api.post("/api/linkpage", json={"title": title}, headers=headers)
+    link = api.post("/api/linkpage/links", json={"title": "A", "url": "https://a.example"}, headers=alice).json()
+    api.post(f"/api/linkpage/links/{link['id']}/click")
+    asyncio.run(server.click_buffer.flush())
+
+    assert api.delete(f"/api/linkpage/links/{link['id']}", headers=bob).status_code == 404
+    assert api.post("/api/linkpage/links/bulk", json={"delete": [link["id"]]}, headers=bob).status_code == 200
+    assert api.get("/api/linkpage/my", headers=alice).json()["links"][0]["clicks"] == 1
+
+
+def test_page_write_responses_include_counter_clicks(api, signup):
+    headers = signup()
+    api.post("/api/linkpage", json={"title": "Alice"}, headers=headers)
+    link = api.post("/api/linkpage/links", json={"title": "A", "url": "https://a.example"}, headers=headers).json()
+    for _ in range(3):
+        api.post(f"/api/linkpage/links/{link['id']}/click")
+    asyncio.run(server.click_buffer.flush())
+
+    responses = [
+        api.post("/api/linkpage", json={"title": "Alice"}, headers=headers),
+        api.put("/api/linkpage", json={"description": "Hi"}, headers=headers),
+        api.post("/api/linkpage/links/bulk", json={"order": [link["id"]]}, headers=headers),
+    ]
+    assert [response.json()["links"][0]["clicks"] for response in responses] == [3, 3, 3]
@@ -0,0 +1,94 @@
+import asyncio
+import random
+from datetime import datetime
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from hll import HyperLogLog, SketchStore, relative_error
+
+
+@pytest.mark.parametrize("cardinality", [10, 1000, 20000, 200000])
+def test_estimate_within_documented_error_bound(cardinality):
+    rng = random.Random(cardinality)
+    sketch, exact = HyperLogLog(), set()
+    for _ in range(cardinality * 2):  # every id seen about twice
+        visitor = f"visitor-{rng.randrange(cardinality * 3)}"
+        sketch.add(visitor)
+        exact.add(visitor)
+    error = abs(sketch.count() - len(exact)) / len(exact)
+    # Three standard errors: fails by chance far less than 1% of the time.
+    assert error <= 3 * relative_error(sketch.precision)
+    assert len(sketch.to_bytes()) == 4096
+
+
+def test_merge_equals_union():
+    a, b, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    for i in range(30000):
+        (a if i % 2 else b).add(str(i))
+        union.add(str(i))
+    for i in range(10000):  # overlap is not double counted
+        a.add(str(i))
+    merged = HyperLogLog.from_bytes(a.to_bytes()).merge(b)
+    assert merged.registers == union.registers
+    assert abs(merged.count() - 30000) / 30000 <= 3 * relative_error(12)
+
+
+def test_workers_merge_into_one_stored_sketch():
+    async def run():
+        db = AsyncMongoMockClient()["test_database"]
+        day = datetime(2026, 3, 1)
+        workers = [SketchStore(lambda: db) for _ in range(3)]
+        for worker_index, worker in enumerate(workers):
+            for i in range(worker_index * 500, worker_index * 500 + 1000):
+                worker.add("p1", "visitors", f"v{i}", at=day)
+        for worker in workers:
+            await worker.flush()
+
+        assert await db.page_sketches.count_documents({}) == 1
+        stored = await db.page_sketches.find_one({})
+        assert stored["version"] == 3 and len(stored["registers"]) == 4096
+        estimate = await workers[0].count("p1", "visitors", ["2026-03-01"])
+        assert abs(estimate - 2000) / 2000 <= 3 * relative_error(12)
+
+    asyncio.run(run())
+
+
+def test_uniques_endpoint(api, signup):
+    headers = signup()
+    api.post("/api/linkpage", json={"title": "Alice"}, headers=headers)
+    link = api.post("/api/linkpage/links", json={"title": "Site", "url": "https://example.com"}, headers=headers).json()
+    for i in range(5):
+        visitor = {"User-Agent": f"browser-{i}"}
+        api.get("/api/linkpage/alice", headers=visitor)
+        api.get("/api/linkpage/alice", headers=visitor)
+        if i < 2:
+            api.post(f"/api/linkpage/links/{link['id']}/click", headers=visitor)
+
+    body = api.get("/api/analytics/uniques", headers=headers).json()
+    assert body["visitors"] == 5 and body["clickers"] == 2
+    asyncio.run(server.page_sketches.flush())
+    assert api.get("/api/analytics/uniques", headers=headers).json()["visitors"] == 5
+
+
+def test_failed_early_flush_is_logged_and_kept(caplog):
+    class Broken:
+        async def find_one(self, *args, **kwargs):
+            raise RuntimeError("mongo down")
+
+    class Database:
+        page_sketches = Broken()
+
+    async def run():
+        store = SketchStore(lambda: Database(), max_pending=2)
+        store.add("p1", "visitors", "a")
+        store.add("p2", "visitors", "b")  # reaches max_pending, starts an early flush
+        assert len(store._early_flushes) == 1
+        await asyncio.sleep(0.01)
+        assert not store._early_flushes
+        return store
+
+    store = asyncio.run(run())
+    assert len(store._pending) == 2  # merged back for the next flush
+    assert "Early sketch flush failed" in caplog.text and "mongo down" in caplog.text
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import server
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+LAUNCH = """
+import sys
+from mongomock_motor import AsyncMongoMockClient
+import launcher, server
+
+server.create_app(AsyncMongoMockClient()["launcher"])
+sys.exit(launcher.Launcher(2, host="127.0.0.1", port=int(sys.argv[1]), log_level="warning").run())
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def test_launcher_serves_from_forked_workers_and_stops_on_sigterm():
+    port = free_port()
+    env = dict(os.environ, CHANGE_FEED="off", REDIRECT_WARM="off")
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    env.setdefault("DB_NAME", "test_database")
+    process = subprocess.Popen([sys.executable, "-c", LAUNCH, str(port)], cwd=BACKEND_DIR, env=env)
+    try:
+        deadline = time.monotonic() + 20
+        while True:
+            assert time.monotonic() < deadline and process.poll() is None
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/api/linkpage/nobody").status_code == 404:
+                    break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        workers = children(process.pid)
+        assert len(workers) == 2
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=20) == 0
+        assert not [pid for pid in workers if os.path.exists(f"/proc/{pid}")]
+    finally:
+        if process.poll() is None:
+            process.kill()
+
+
+def test_warmup_loads_most_clicked_pages(api, signup, mock_db):
+    for username in ("alice", "bob", "carol"):
+        api.post("/api/linkpage", json={"title": username}, headers=signup(username))
+    pages = {page["username"]: page["id"] for page in asyncio.run(mock_db.linkpages.find().to_list(None))}
+    hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    asyncio.run(mock_db.link_clicks_hourly.insert_many([
+        {"link_id": "l1", "page_id": pages["bob"], "hour": hour, "clicks": 30},
+        {"link_id": "l2", "page_id": pages["alice"], "hour": hour, "clicks": 20},
+        {"link_id": "l3", "page_id": pages["alice"], "hour": hour, "clicks": 20},
+        {"link_id": "l4", "page_id": pages["carol"], "hour": hour, "clicks": 5},
+    ]))
+    server.page_cache.clear()
+
+    assert asyncio.run(server.warm_public_pages(2)) == 2
+    assert server.page_cache.local.get("alice") and server.page_cache.local.get("bob")
+    assert server.page_cache.local.get("carol") is None
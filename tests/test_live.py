@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import pytest
+import server
+from live import ClickStream, ClickStreamFull
+
+
+def parse(event: bytes):
+    fields = dict(line.split(": ", 1) for line in event.decode().strip().split("\n"))
+    return fields["event"], json.loads(fields["data"])
+
+
+def test_stream_coalesces_deltas_per_interval():
+    async def run():
+        stream = ClickStream(min_interval=0.2, heartbeat=5)
+        subscription = stream.subscribe("p1")
+        events = stream.events(subscription)
+        assert await events.__anext__() == b"retry: 5000\n\n"
+
+        stream.publish("p1", "a")
+        stream.publish("p2", "z")
+        assert parse(await events.__anext__()) == ("clicks", {"a": 1})
+
+        # A burst within min_interval of the last event goes out as one event.
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(500):
+            stream.publish("p1", "a")
+        stream.publish("p1", "b", 2)
+        assert parse(await events.__anext__()) == ("clicks", {"a": 500, "b": 2})
+        assert loop.time() - start >= 0.15
+        assert stream.stats()["events_sent"] == 2
+
+        await events.aclose()
+        assert stream.stats()["subscribers"] == 0
+        stream.publish("p1", "a")
+        assert stream.stats()["published_clicks"] == 503
+
+    asyncio.run(run())
+
+
+def test_stream_heartbeat_and_subscriber_cap():
+    async def run():
+        stream = ClickStream(heartbeat=0.01, max_subscribers=1)
+        events = stream.events(stream.subscribe("p1"))
+        await events.__anext__()
+        assert await events.__anext__() == b": keep-alive\n\n"
+        with pytest.raises(ClickStreamFull):
+            stream.subscribe("p2")
+        await events.aclose()
+        stream.subscribe("p2")
+
+    asyncio.run(run())
+
+
+def test_live_endpoint_requires_owner(api, signup):
+    assert api.get("/api/live").status_code == 403
+    assert api.get("/api/live?ticket=bogus").status_code == 401
+    headers = signup()
+    assert api.get("/api/live", headers=headers).status_code == 404
+    assert api.post("/api/live/ticket").status_code == 403
+
+    ticket = api.post("/api/live/ticket", headers=headers).json()
+    assert ticket["expires_in"] == server.LIVE_TICKET_TTL
+    assert api.get(f"/api/live?ticket={ticket['ticket']}").status_code == 404
+
+
+def test_live_query_accepts_only_stream_tickets(api, signup, monkeypatch):
+    headers = signup()
+    token = headers["Authorization"].split()[1]
+    # The long-lived access token is no longer accepted in the URL, under either name.
+    assert api.get(f"/api/live?token={token}").status_code == 403
+    assert api.get(f"/api/live?ticket={token}").status_code == 401
+
+    ticket = api.post("/api/live/ticket", headers=headers).json()["ticket"]
+    assert api.get("/api/me", headers={"Authorization": f"Bearer {ticket}"}).status_code == 401
+
+    monkeypatch.setattr(server, "LIVE_TICKET_TTL", -1)
+    expired = api.post("/api/live/ticket", headers=headers).json()["ticket"]
+    response = api.get(f"/api/live?ticket={expired}")
+    assert response.status_code == 401 and response.json()["detail"] == "Token expired"
+
+
+def test_track_click_publishes_to_subscribers(api, signup):
+    headers = signup()
+    page = api.post("/api/linkpage", json={"title": "Alice"}, headers=headers).json()
+    link = api.post("/api/linkpage/links", json={"title": "A", "url": "https://a.example"}, headers=headers).json()
+    subscription = server.click_stream.subscribe(page["id"])
+    try:
+        api.post(f"/api/linkpage/links/{link['id']}/click")
+        api.post(f"/api/linkpage/links/{link['id']}/click")
+        assert subscription.take() == {link["id"]: 2}
+    finally:
+        server.click_stream.unsubscribe(subscription)
+
+
+def test_user_named_live_keeps_a_public_page(api, signup):
+    api.post("/api/linkpage", json={"title": "Live"}, headers=signup("live"))
+    assert api.get("/api/linkpage/live").json()["title"] == "Live"
@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+from metrics import MetricsMiddleware, MetricsRegistry
+
+# Per-request cost the timing middleware may add on top of the app it wraps.
+OVERHEAD_BUDGET_MICROSECONDS = 50
+
+
+def sample(body, series):
+    for line in body.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_metrics_endpoint_reports_route_templates(api, signup):
+    page_404 = 'http_request_duration_seconds_count{method="GET",route="/api/linkpage/{username}",status="404"}'
+    before = sample(api.get("/metrics").text, page_404)
+    signup()
+    api.get("/api/linkpage/nobody")
+    api.get("/api/linkpage/someone-else")
+
+    response = api.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert sample(body, page_404) == before + 2
+    assert sample(body, 'http_request_duration_seconds_count{method="POST",route="/api/signup",status="200"}') >= 1
+    assert sample(body, 'bcrypt_duration_seconds_count{operation="hash"}') >= 1
+    assert sample(body, 'jwt_duration_seconds_count{operation="encode"}') >= 1
+    assert 'cache_size{cache="linkpages"} ' in body
+
+
+def test_histogram_buckets_are_cumulative_and_labels_escaped():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        registry.observe("latency_seconds", value, (("route", 'say "hi"'),))
+
+    body = registry.render()
+    assert 'latency_seconds_bucket{route="say \\"hi\\"",le="0.1"} 1' in body
+    assert 'latency_seconds_bucket{route="say \\"hi\\"",le="1.0"} 2' in body
+    assert 'latency_seconds_bucket{route="say \\"hi\\"",le="+Inf"} 3' in body
+    assert 'latency_seconds_count{route="say \\"hi\\""} 3' in body
+
+
+def test_middleware_overhead_within_budget():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/"}
+    instrumented = MetricsMiddleware(app, MetricsRegistry())
+
+    async def per_request(target, n=20000):
+        start = time.perf_counter()
+        for _ in range(n):
+            await target(scope, receive, send)
+        return (time.perf_counter() - start) / n
+
+    async def measure():
+        # Best of several rounds keeps scheduler noise out of the comparison.
+        bare = min([await per_request(app) for _ in range(5)])
+        timed = min([await per_request(instrumented) for _ in range(5)])
+        return (timed - bare) * 1e6
+
+    overhead = asyncio.run(measure())
+    assert overhead < OVERHEAD_BUDGET_MICROSECONDS, f"{overhead:.1f}us per request"
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+import server
+from mongo import client_options, read_preference
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.read_preferences import Primary, SecondaryPreferred
+from repository import InstrumentedDatabase, QueryProfiler
+
+
+def test_client_options_from_environment():
+    options = client_options({
+        "MONGO_MAX_POOL_SIZE": "50",
+        "MONGO_WAIT_QUEUE_TIMEOUT_MS": "250",
+        "MONGO_SERVER_SELECTION_TIMEOUT_MS": "2000",
+        "MONGO_COMPRESSORS": "zstd, snappy,zlib",
+        "MONGO_MIN_POOL_SIZE": "",
+    })
+    assert options == {
+        "maxPoolSize": 50,
+        "waitQueueTimeoutMS": 250,
+        "serverSelectionTimeoutMS": 2000,
+        "compressors": "zstd,snappy,zlib",
+    }
+    assert client_options({}) == {}
+    with pytest.raises(ValueError, match="MONGO_MAX_POOL_SIZE"):
+        client_options({"MONGO_MAX_POOL_SIZE": "lots"})
+
+
+def test_read_preference():
+    assert read_preference("primary") == Primary()
+    assert read_preference("secondaryPreferred", 120) == SecondaryPreferred(max_staleness=120)
+    with pytest.raises(ValueError):
+        read_preference("secondary-ish")
+
+
+def test_get_collection_applies_read_preference_and_stays_instrumented():
+    profiler = QueryProfiler(slow_ms=1000)
+    db = InstrumentedDatabase(AsyncMongoMockClient()["options"], profiler)
+    linkpages = db.get_collection("linkpages", read_preference=SecondaryPreferred())
+    assert linkpages.read_preference == SecondaryPreferred()
+    assert db.linkpages.read_preference == Primary()
+
+    asyncio.run(linkpages.find_one({"username": "alice"}))
+    assert profiler.report()["hot"]["usernames"][0]["key"] == "alice"
+
+
+def test_client_is_created_at_startup(monkeypatch):
+    monkeypatch.setattr(server, "client", None)
+    monkeypatch.setattr(server, "db", None)
+    monkeypatch.setattr(server, "mongo_options", {"maxPoolSize": 7, "serverSelectionTimeoutMS": 100})
+    server.connect_mongo()
+    try:
+        assert server.client.options.pool_options.max_pool_size == 7
+        assert server.db.linkpages.read_preference == Primary()
+    finally:
+        server.client.close()
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+
+import passwords
+import pytest
+import server
+from passwords import PasswordHasher, PasswordHasherBusy
+
+
+def test_hash_and_verify_round_trip():
+    hasher = PasswordHasher(workers=1)
+
+    async def run():
+        hashed = await hasher.hash("secret-password")
+        return await hasher.verify("secret-password", hashed), await hasher.verify("wrong", hashed)
+
+    try:
+        assert asyncio.run(run()) == (True, False)
+    finally:
+        hasher.shutdown()
+
+
+def test_calls_beyond_workers_and_queue_are_rejected(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(passwords, "hash_password", lambda password: release.wait(5) and password)
+    hasher = PasswordHasher(workers=1, max_queue=1)
+
+    async def run():
+        running = asyncio.create_task(hasher.hash("a"))
+        await asyncio.sleep(0)  # holds the only slot
+        queued = asyncio.create_task(hasher.hash("b"))
+        await asyncio.sleep(0)  # waits for it
+        assert hasher.stats()["waiting"] == 1
+        with pytest.raises(PasswordHasherBusy):
+            await hasher.hash("c")
+        release.set()
+        return await running, await queued
+
+    try:
+        assert asyncio.run(run()) == ("a", "b")
+    finally:
+        hasher.shutdown()
+    assert hasher.stats()["rejected"] == 1 and hasher.stats()["waiting"] == 0
+
+
+def test_busy_hasher_answers_503(api, monkeypatch):
+    # No free slot and no queue: every call is shed.
+    monkeypatch.setattr(server, "password_hasher", PasswordHasher(workers=0, max_queue=0))
+    response = api.post("/api/signup", json={
+        "email": "alice@example.com", "username": "alice", "password": "secret-password",
+    })
+    assert response.status_code == 503 and response.headers["retry-after"] == "1"
+    assert api.get("/api/cache/stats").json()["passwords"]["rejected"] == 1
@@ -0,0 +1,90 @@
+import asyncio
+
+import server
+from ratelimit import InMemoryRateLimitBackend, RateLimited, RateLimiter, TokenBuckets, client_address, parse_networks
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_at_rate():
+    clock = Clock()
+    buckets = TokenBuckets(rate=2, burst=3, clock=clock)
+    assert [buckets.take("a") for _ in range(3)] == [0, 0, 0]
+    assert buckets.take("a") == 0.5
+    clock.now = 0.5
+    assert buckets.take("a") == 0
+    assert buckets.take("a") == 0.5
+    assert buckets.take("b") == 0
+
+
+def test_idle_buckets_are_evicted():
+    clock = Clock()
+    buckets = TokenBuckets(rate=1, burst=2, maxsize=3, clock=clock)
+    for key in "abc":
+        buckets.take(key)
+    buckets.take("d")
+    assert len(buckets) == 3
+    clock.now = 1.9
+    buckets.take("c")
+    assert len(buckets) == 3
+    clock.now = 2.5
+    buckets.take("e")
+    # b, d were last touched 2.5s ago (>= burst / rate) and are dropped; c is kept.
+    assert len(buckets) == 2
+    clock.now = 3.0
+    assert buckets.take("c") == 0 and buckets.take("c") == 0 and buckets.take("c") > 0
+
+
+def test_client_address_only_believes_trusted_proxies():
+    proxies = parse_networks("10.0.0.0/8, 192.0.2.1")
+    assert client_address("198.51.100.9", "203.0.113.7", proxies) == "198.51.100.9"
+    assert client_address("10.1.2.3", None, proxies) == "10.1.2.3"
+    assert client_address("10.1.2.3", "203.0.113.7", proxies) == "203.0.113.7"
+    # Hops left of the first untrusted one were written by the client.
+    assert client_address("10.1.2.3", "1.1.1.1, 203.0.113.7, 192.0.2.1", proxies) == "203.0.113.7"
+    assert client_address("10.1.2.3", "garbage, 10.0.0.5", proxies) == "garbage"
+    assert client_address("testclient", "203.0.113.7", proxies) == "testclient"
+
+
+def test_shared_backend_is_shared_between_limiters():
+    shared = InMemoryRateLimitBackend()
+    workers = [RateLimiter("auth-ip", 1, 2, lambda request: "1.2.3.4", shared=shared) for _ in range(2)]
+
+    async def run():
+        results = []
+        for limiter in workers * 2:
+            try:
+                await limiter(None)
+                results.append(True)
+            except RateLimited:
+                results.append(False)
+        return results
+
+    assert asyncio.run(run()) == [True, True, False, False]
+
+
+def test_click_and_auth_routes_are_limited(api, signup, monkeypatch):
+    monkeypatch.setattr(server.click_ip_limit, "local", TokenBuckets(rate=0.001, burst=3))
+    monkeypatch.setattr(server.auth_ip_limit, "local", TokenBuckets(rate=0.001, burst=2))
+    headers = signup()
+    api.post("/api/linkpage", json={"title": "Alice"}, headers=headers)
+    link = api.post("/api/linkpage/links", json={"title": "A", "url": "https://a.example"}, headers=headers).json()
+
+    click = f"/api/linkpage/links/{link['id']}/click"
+    assert [api.post(click).status_code for _ in range(4)] == [200, 200, 200, 429]
+    # Not from a trusted proxy: a made-up X-Forwarded-For doesn't get a fresh bucket.
+    assert api.post(click, headers={"X-Forwarded-For": "203.0.113.7"}).status_code == 429
+
+    login = {"email": "alice@example.com", "password": "secret-password"}
+    assert api.post("/api/login", json=login).status_code == 200
+    limited = api.post("/api/login", json=login)
+    assert limited.status_code == 429 and int(limited.headers["retry-after"]) >= 1
+
+    stats = api.get("/api/cache/stats").json()["rate_limits"]
+    assert stats["click-ip"]["limited"] == 2 and stats["auth-ip"]["limited"] == 1
@@ -0,0 +1,111 @@
+import asyncio
+
+import server
+from mongomock_motor import AsyncMongoMockClient
+from redirects import LinkDirectory
+
+
+def page(username, *links, page_id=None):
+    return {
+        "id": page_id or f"page-{username}",
+        "username": username,
+        "links": [{"id": link_id, "url": f"https://{link_id}.example"} for link_id in links],
+    }
+
+
+def test_directory_holds_whole_pages_in_lru_order():
+    directory = LinkDirectory(lambda: None, maxsize=4)
+    directory.put_page(page("alice", "a1", "a2"))
+    directory.put_page(page("bob", "b1", "b2"))
+    assert directory.get("a1") == ("https://a1.example", "page-alice")
+
+    # bob's page is the least recently used, so both of its links go.
+    directory.put_page(page("carol", "c1"))
+    assert directory.get("b1") is None and directory.get("b2") is None
+    assert len(directory) == 3 and directory.stats()["evictions"] == 1
+
+    directory.put_link("alice", "a1", "https://new.example")
+    directory.put_link("alice", "a3", "https://a3.example")
+    directory.put_link("bob", "b3", "https://b3.example")  # not held, loaded on a miss
+    assert directory.get("a1") == ("https://new.example", "page-alice")
+    assert directory.get("b3") is None
+
+    directory.drop_links("alice", ["a3"])
+    directory.drop_links("alice", ["c1"])  # carol's link: left alone
+    assert directory.get("a3") is None and directory.get("c1") == ("https://c1.example", "page-carol")
+    directory.drop_page("alice")
+    assert directory.get("a1") is None and directory.get("c1") == ("https://c1.example", "page-carol")
+
+
+def test_directory_expires_pages():
+    directory = LinkDirectory(lambda: None, ttl=-1)
+    directory.put_page(page("alice", "a1", "a2"))
+    assert directory.get("a1") is None
+    assert len(directory) == 0 and directory.stats()["expirations"] == 1
+
+
+def test_warm_streams_pages_up_to_maxsize():
+    async def run():
+        db = AsyncMongoMockClient()["redirects"]
+        await db.linkpages.insert_many([page("alice", "a1", "a2"), page("bob"), page("carol", "c1", "c2")])
+        directory = LinkDirectory(lambda: db, maxsize=3)
+        assert await directory.warm() == 2
+        assert directory.get("a2") == ("https://a2.example", "page-alice")
+        assert directory.get("c1") is None
+
+        # Misses load the whole page with one query.
+        assert await directory.resolve("c1") == ("https://c1.example", "page-carol")
+        assert await directory.resolve("missing") is None
+
+    asyncio.run(run())
+
+
+def test_redirect_records_click_after_responding(api, signup, mock_db):
+    headers = signup()
+    created = api.post("/api/linkpage", json={"title": "Alice"}, headers=headers).json()
+    link = api.post("/api/linkpage/links", json={"title": "A", "url": "https://a.example"}, headers=headers).json()
+
+    server.link_directory.clear()
+    response = api.get(f"/r/{link['id']}", follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["location"] == "https://a.example"
+    assert response.headers["cache-control"] == "private, no-store"
+
+    server.query_profiler.clear()
+    assert api.get(f"/r/{link['id']}", follow_redirects=False).status_code == 302
+    # (The change feed's background polls may show up as `find`.)
+    operations = server.query_profiler.report()["operations"]
+    assert not [op for op in operations if op["operation"] == "find_one"]
+
+    asyncio.run(server.click_buffer.flush())
+    page = api.get("/api/linkpage/my", headers=headers).json()
+    assert page["id"] == created["id"] and page["links"][0]["clicks"] == 2
+
+    api.put(f"/api/linkpage/links/{link['id']}", json={"title": "A", "url": "https://b.example"}, headers=headers)
+    assert api.get(f"/r/{link['id']}", follow_redirects=False).headers["location"] == "https://b.example"
+    api.delete(f"/api/linkpage/links/{link['id']}", headers=headers)
+    assert api.get(f"/r/{link['id']}", follow_redirects=False).status_code == 404
+
+
+def test_rate_limited_redirects_are_not_counted(api, signup, monkeypatch):
+    headers = signup()
+    api.post("/api/linkpage", json={"title": "Alice"}, headers=headers)
+    link = api.post("/api/linkpage/links", json={"title": "A", "url": "https://a.example"}, headers=headers).json()
+    monkeypatch.setattr(server.click_ip_limit.local, "burst", 2)
+    monkeypatch.setattr(server.click_ip_limit.local, "rate", 0.01)
+
+    for _ in range(4):
+        assert api.get(f"/r/{link['id']}", follow_redirects=False).status_code == 302
+    asyncio.run(server.click_buffer.flush())
+    assert api.get("/api/linkpage/my", headers=headers).json()["links"][0]["clicks"] == 2
+
+
+def test_unknown_redirects_are_rate_limited_before_reading_mongo(api, monkeypatch):
+    monkeypatch.setattr(server.click_ip_limit.local, "burst", 3)
+    monkeypatch.setattr(server.click_ip_limit.local, "rate", 0.01)
+    server.query_profiler.clear()
+
+    statuses = [api.get(f"/r/nope{i}", follow_redirects=False).status_code for i in range(10)]
+    assert statuses == [404] * 3 + [429] * 7
+    operations = server.query_profiler.report()["operations"]
+    assert sum(op["count"] for op in operations if op["operation"] == "find_one") == 3
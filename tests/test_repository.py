@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+import server
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import UpdateOne
+from repository import InstrumentedDatabase, QueryProfiler, SpaceSaving, filter_shape
+
+
+def test_filter_shape_hides_values():
+    assert filter_shape({"username": "alice"}) == {"username": "?"}
+    assert filter_shape({"$or": [{"email": "a@x"}, {"username": "a"}]}) == {"$or": [{"email": "?"}, {"username": "?"}]}
+    assert filter_shape({"id": {"$in": ["a", "b", "c"]}}) == {"id": {"$in": ["?"]}}
+
+
+def test_space_saving_keeps_heavy_hitters():
+    sketch = SpaceSaving(k=10)
+    keys = ["hot-a" if i % 3 == 0 else "hot-b" if i % 5 == 0 else f"cold-{i}" for i in range(5000)]
+    for key in keys:
+        sketch.add(key)
+    top = sketch.top(2)
+    assert [entry["key"] for entry in top] == ["hot-a", "hot-b"]
+    for entry in top:
+        assert entry["count"] - entry["error"] <= keys.count(entry["key"]) <= entry["count"]
+
+
+def test_instrumented_database_records_shapes_slow_queries_and_hot_keys():
+    profiler = QueryProfiler(slow_ms=0)
+    db = InstrumentedDatabase(AsyncMongoMockClient()["profiled"], profiler)
+
+    async def run():
+        await db.linkpages.insert_one({"id": "p1", "username": "alice", "links": [{"id": "l1", "clicks": 0}]})
+        for _ in range(3):
+            await db.linkpages.find_one({"username": "alice"})
+        await db.linkpages.find_one({"username": "bob"})
+        await db.linkpages.bulk_write([UpdateOne({"id": "p1", "links.id": "l1"}, {"$inc": {"links.$.clicks": 1}})])
+        assert len([page async for page in db.linkpages.find({}).sort("id", 1)]) == 1
+
+    asyncio.run(run())
+    report = profiler.report()
+    by_op = {(op["operation"], op["shape"]): op for op in report["operations"]}
+    assert by_op[("find_one", '{"username":"?"}')]["count"] == 4
+    assert by_op[("bulk_write", '{"id":"?","links.id":"?"}')]["count"] == 1
+    assert ("find", "{}") in by_op
+    assert report["hot"]["usernames"][0] == {"key": "alice", "count": 3, "error": 0}
+    assert report["hot"]["link_ids"][0]["key"] == "l1"
+    assert report["slow_queries"] and "alice" not in str(report["slow_queries"])
+
+
+@pytest.fixture
+def admin(api, signup, monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_EMAILS", {"admin@example.com"})
+    return signup("admin")
+
+
+def test_admin_profile_endpoint(api, signup, admin):
+    assert api.get("/api/admin/profile", headers=signup("mallory")).status_code == 403
+    api.get("/api/linkpage/nobody")
+
+    report = api.get("/api/admin/profile", headers=admin).json()
+    assert {"key": "nobody", "count": 1, "error": 0} in report["hot"]["usernames"]
+    assert any(op["collection"] == "users" and op["operation"] == "insert_one" for op in report["operations"])
+
+    assert api.delete("/api/admin/profile", headers=admin).status_code == 200
+    assert api.get("/api/admin/profile", headers=admin).json()["hot"]["usernames"] == []
+
+
+def test_flushed_clicks_count_as_hot_link_ids(api, signup):
+    headers = signup()
+    api.post("/api/linkpage", json={"title": "Alice"}, headers=headers)
+    link = api.post("/api/linkpage/links", json={"title": "A", "url": "https://a.example"}, headers=headers).json()
+    for _ in range(3):
+        api.post(f"/api/linkpage/links/{link['id']}/click")
+
+    server.query_profiler.clear()
+    asyncio.run(server.click_buffer.flush())
+    assert server.query_profiler.report()["hot"]["link_ids"] == [{"key": link["id"], "count": 1, "error": 0}]
@@ -0,0 +1,69 @@
+import pytest
+import server
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def quiet_api(mock_db, monkeypatch):
+    # No background polling, so every recorded linkpages call comes from the request.
+    monkeypatch.setattr(server, "CHANGE_FEED", "off")
+    with TestClient(server.app) as client:
+        yield client
+
+
+def linkpage_calls():
+    report = server.query_profiler.report(limit=1000)
+    return sorted(
+        (op["operation"], op["count"]) for op in report["operations"] if op["collection"] == "linkpages"
+    )
+
+
+def calls_for(request):
+    server.query_profiler.clear()
+    response = request()
+    assert response.status_code == 200, response.text
+    return response, linkpage_calls()
+
+
+def test_linkpage_mutations_take_one_round_trip(quiet_api):
+    api = quiet_api
+    token = api.post("/api/signup", json={
+        "email": "alice@example.com", "username": "alice", "password": "secret-password",
+    }).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    api.get("/api/me", headers=headers)  # principal now cached
+
+    created, calls = calls_for(lambda: api.post("/api/linkpage", json={"title": "Alice"}, headers=headers))
+    assert calls == [("find_one_and_update", 1)]
+    assert created.json()["title"] == "Alice" and created.json()["links"] == []
+
+    again, calls = calls_for(lambda: api.post("/api/linkpage", json={"title": "Alice B"}, headers=headers))
+    assert calls == [("find_one_and_update", 1)]
+    assert again.json()["id"] == created.json()["id"] and again.json()["title"] == "Alice B"
+
+    updated, calls = calls_for(lambda: api.put("/api/linkpage", json={"description": "Hi"}, headers=headers))
+    assert calls == [("find_one_and_update", 1)]
+    assert updated.json()["description"] == "Hi" and updated.json()["title"] == "Alice B"
+
+    link, calls = calls_for(lambda: api.post(
+        "/api/linkpage/links", json={"title": "A", "url": "https://a.example"}, headers=headers,
+    ))
+    assert calls == [("find_one_and_update", 1)]
+    assert link.json()["order"] == 0 and link.json()["title"] == "A"
+
+    second, _ = calls_for(lambda: api.post(
+        "/api/linkpage/links", json={"title": "B", "url": "https://b.example"}, headers=headers,
+    ))
+    assert second.json()["order"] == 1
+
+    _, calls = calls_for(lambda: api.put(
+        f"/api/linkpage/links/{link.json()['id']}", json={"title": "A2", "url": "https://a.example"}, headers=headers,
+    ))
+    assert calls == [("update_one", 1)]
+
+    _, calls = calls_for(lambda: api.delete(f"/api/linkpage/links/{link.json()['id']}", headers=headers))
+    assert calls == [("find_one_and_update", 1)]
+
+    _, calls = calls_for(lambda: api.delete("/api/linkpage", headers=headers))
+    assert calls == [("find_one_and_delete", 1)]
+    assert api.put("/api/linkpage", json={"title": "Gone"}, headers=headers).status_code == 404
@@ -0,0 +1,63 @@
+import asyncio
+
+import server
+from mongomock_motor import AsyncMongoMockClient
+from search import PageSearchIndex
+
+
+def test_prefix_search_ranks_usernames_before_titles():
+    index = PageSearchIndex(lambda: None)
+    index.load([("alice", "Bob's biggest fan"), ("bob", "Bob's links"), ("bobby", "Ｂobby Ｔables")])
+
+    assert [r["username"] for r in index.search("bob")] == ["bob", "bobby", "alice"]
+    assert index.search("BOBBY t") == [{"username": "bobby", "title": "Ｂobby Ｔables"}]
+    assert [r["username"] for r in index.search("b", limit=2)] == ["bob", "bobby"]
+    assert index.search("  ") == [] and index.search("zed") == []
+
+    index.put("alice", "Alice's garden")
+    index.put("carol", "Bob fan club")
+    index.remove("bobby")
+    assert [r["username"] for r in index.search("bob")] == ["bob", "carol"]
+    assert [r["username"] for r in index.search("al")] == ["alice"]
+    assert index.stats()["entries"] == 6
+
+
+def test_build_streams_pages_and_replays_concurrent_writes():
+    async def run():
+        db = AsyncMongoMockClient()["search"]
+        await db.linkpages.insert_many([{"username": f"user{i}", "title": f"Page {i}"} for i in range(2500)])
+        index = PageSearchIndex(lambda: db)
+
+        build = asyncio.create_task(index.build())
+        await asyncio.sleep(0)
+        index.put("zoe", "Zoe")  # written while the cursor is being read
+        index.remove("user7")
+        assert await build == 2500
+        assert len(index) == 2500 and index.ready
+        assert index.search("zoe") == [{"username": "zoe", "title": "Zoe"}]
+        assert "user7" not in [r["username"] for r in index.search("user7", limit=50)]
+        assert [r["username"] for r in index.search("user249")] == ["user249", "user2490", "user2491", "user2492",
+                                                                     "user2493", "user2494", "user2495", "user2496",
+                                                                     "user2497", "user2498"]
+
+        await db.linkpages.update_one({"username": "user1"}, {"$set": {"title": "Renamed"}})
+        await index.refresh("user1")
+        assert index.search("renamed") == [{"username": "user1", "title": "Renamed"}]
+
+    asyncio.run(run())
+
+
+def test_search_endpoint_follows_page_writes(api, signup):
+    alice = signup("alice")
+    bob = signup("bob")
+    api.post("/api/linkpage", json={"title": "Alice in Wonderland"}, headers=alice)
+    api.post("/api/linkpage", json={"title": "Bob's Burgers"}, headers=bob)
+
+    assert api.get("/api/search?q=ali").json()["results"] == [{"username": "alice", "title": "Alice in Wonderland"}]
+    api.put("/api/linkpage", json={"title": "Wonderland"}, headers=alice)
+    assert [r["username"] for r in api.get("/api/search?q=wonder").json()["results"]] == ["alice"]
+    assert api.get("/api/search?q=alice in").json()["results"] == []
+
+    api.delete("/api/linkpage", headers=bob)
+    assert api.get("/api/search?q=bob").json()["results"] == []
+    assert api.get("/api/search").status_code == 422
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import time
+
+import server
+from snapshots import SnapshotStore, render_linkpage_html
+
+
+def test_render_escapes_content_and_orders_links():
+    document = render_linkpage_html({
+        "username": "alice",
+        "title": "<Alice>",
+        "description": "Hi & welcome",
+        "theme_color": "#10B981",
+        "theme_font": "font-serif",
+        "links": [
+            {"id": "b/2", "title": "Second", "url": "https://b.example", "order": 1},
+            {"id": "a1", "title": "First", "url": "javascript:alert(1)", "icon": "⭐", "order": 0},
+        ],
+    }, redirect_base="https://api.example")
+    assert "<title>&lt;Alice&gt;</title>" in document
+    assert "Hi &amp; welcome" in document
+    assert "Georgia" in document and "#10B981" in document
+    assert document.index("First") < document.index("Second")
+    assert "javascript:" not in document and 'href="#"' in document
+    assert 'href="https://api.example/r/b%2F2"' in document and "https://b.example" not in document
+
+
+def test_snapshot_endpoint_rerenders_only_after_writes(api, signup):
+    headers = signup()
+    api.post("/api/linkpage", json={"title": "Alice"}, headers=headers)
+    link = api.post("/api/linkpage/links", json={"title": "Site", "url": "https://example.com"}, headers=headers).json()
+
+    renders = server.snapshots.renders
+    response = api.get("/api/linkpage/alice/snapshot")
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/html")
+    assert f'href="/r/{link["id"]}"' in response.text
+    assert api.get("/api/linkpage/alice/snapshot", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+    api.get("/api/linkpage/alice/snapshot")
+    assert server.snapshots.renders == renders + 1
+
+    api.put("/api/linkpage", json={"title": "Alice B"}, headers=headers)
+    assert "Alice B" in api.get("/api/linkpage/alice/snapshot").text
+    assert server.snapshots.renders == renders + 2
+    assert api.get("/api/linkpage/nobody/snapshot").status_code == 404
+
+
+def test_regenerate_writes_and_removes_files(tmp_path):
+    store = SnapshotStore(output_dir=str(tmp_path))
+    page = {"body": json.dumps({"username": "alice", "title": "Alice", "links": []}), "etag": '"1"'}
+
+    async def load(username):
+        return page
+
+    asyncio.run(store.regenerate("alice", load))
+    assert "Alice" in (tmp_path / "alice.html").read_text()
+
+    page = None
+    asyncio.run(store.regenerate("alice", load))
+    assert not (tmp_path / "alice.html").exists()
+
+    store.get("../escape", '"2"', lambda: {"username": "x", "title": "x", "links": []})
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_snapshot_file_is_regenerated_from_the_primary(api, signup, monkeypatch, tmp_path):
+    headers = signup()
+    api.post("/api/linkpage", json={"title": "Alice"}, headers=headers)
+    stale = asyncio.run(server.db.linkpages.find_one({"username": "alice"}))
+
+    class LaggingSecondary:
+        async def find_one(self, *args, **kwargs):
+            return dict(stale)
+
+    monkeypatch.setattr(server.db, "get_collection", lambda name, **options: LaggingSecondary())
+    monkeypatch.setattr(server.snapshots, "output_dir", tmp_path)
+    api.put("/api/linkpage", json={"title": "Alice B"}, headers=headers)
+    path = tmp_path / "alice.html"
+    deadline = time.monotonic() + 2
+    while not path.exists():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert "Alice B" in path.read_text()
+
+    # The endpoint may serve the secondary's old page, but doesn't write it out.
+    assert "Alice B" not in api.get("/api/linkpage/alice/snapshot").text
+    assert "Alice B" in path.read_text()
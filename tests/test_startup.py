@@ -0,0 +1,56 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import server
+from fastapi.testclient import TestClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+# Generous multiples of a laptop's figures (~0.4s and ~3ms); see benchmarks/bench_startup.py
+IMPORT_BUDGET_SECONDS = float(os.environ.get("STARTUP_IMPORT_BUDGET", "1.5"))
+FIRST_RESPONSE_BUDGET_SECONDS = float(os.environ.get("STARTUP_FIRST_RESPONSE_BUDGET", "0.5"))
+# Only needed once the worker connects or hashes in a process pool.
+LAZY_MODULES = ("motor.motor_asyncio", "multiprocessing")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import server
+imported = time.perf_counter() - start
+loaded = [name for name in %r if name in sys.modules]
+
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+start = time.perf_counter()
+with TestClient(server.create_app(AsyncMongoMockClient()["startup"])) as client:
+    status = client.get("/api/linkpage/nobody").status_code
+first_response = time.perf_counter() - start
+print(json.dumps({"import": imported, "loaded": loaded, "first_response": first_response, "status": status}))
+""" % (LAZY_MODULES,)
+
+
+def test_cold_start_within_budget():
+    env = dict(os.environ, CHANGE_FEED="off", REDIRECT_WARM="off")
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    env.setdefault("DB_NAME", "test_database")
+    process = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env,
+                             capture_output=True, text=True, timeout=60)
+    assert process.returncode == 0, process.stderr
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+
+    assert result["loaded"] == []
+    assert result["status"] == 404
+    assert result["import"] < IMPORT_BUDGET_SECONDS
+    assert result["first_response"] < FIRST_RESPONSE_BUDGET_SECONDS
+
+
+def test_create_app_builds_a_new_app(mock_db):
+    app = server.create_app()
+    assert app is not server.app
+    with TestClient(app) as client:
+        assert client.get("/api/linkpage/nobody").status_code == 404
+        assert client.get("/metrics").status_code == 200